@@ -3,6 +3,7 @@ import random
 from abc import abstractmethod, ABC
 from collections import defaultdict
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import suppress
 from logging import Logger
 from logging import getLogger
@@ -25,8 +26,13 @@ from nucypher.crypto.api import encrypt_and_sign
 from nucypher.crypto.kits import UmbralMessageKit
 from nucypher.crypto.powers import CryptoPower, SigningPower, EncryptingPower, NoSigningPower, CryptoPowerUp
 from nucypher.crypto.signing import signature_splitter, StrangerStamp, SignatureStamp
+from nucypher.network.caching import BoundedCache
+from nucypher.network.metrics import MetricsRegistry
 from nucypher.network.middleware import RestMiddleware
-from nucypher.network.nodes import VerifiableNode
+from nucypher.network.nodes import VerifiableNode, KnownNodes
+from nucypher.network.routing import NodeRoutingIndex
+from nucypher.network.snapshot import LearnerSnapshot
+from nucypher.network.storage import NodeMetadataLog, CertificateStore
 from nucypher.network.server import TLSHostingPower
 
 
@@ -42,6 +48,14 @@ class Learner(ABC):
     _LONG_LEARNING_DELAY = 90
     _ROUNDS_WITHOUT_NODES_AFTER_WHICH_TO_SLOW_DOWN = 10
 
+    log = getLogger("characters")  # type: Logger
+
+    SNAPSHOT_MAX_AGE = 24 * 60 * 60              # Seconds after which a snapshot is too stale to restore from...
+    SNAPSHOT_VERIFICATION_MAX_AGE = 60 * 60      # ...and after which we check that its nodes are still up.
+
+    LOOKUP_PARALLELISM = 3          # Kademlia's alpha: how many nodes to ask at once during a lookup.
+    LOOKUP_NEIGHBORHOOD_SIZE = 20   # Kademlia's k: how many of the closest nodes a lookup keeps track of.
+
     class NotEnoughTeachers(RuntimeError):
         pass
 
@@ -51,9 +65,8 @@ class Learner(ABC):
                  known_nodes: tuple = None,
                  known_metadata_dir: str = None,
                  save_metadata: bool = False,
-                 abort_on_learning_error: bool = False) -> None:
-
-        self.log = getLogger("characters")                       # type: Logger
+                 abort_on_learning_error: bool = False,
+                 snapshot_filepath: str = None) -> None:
 
         self.save_metadata = save_metadata
         self.start_learning_now = start_learning_now
@@ -63,12 +76,14 @@ class Learner(ABC):
         self._learning_listeners = defaultdict(list)
         self._node_ids_to_learn_about_immediately = set()
 
-        self.__known_nodes = dict()
+        self.__known_nodes = KnownNodes()
+        self._routing_index = NodeRoutingIndex()
 
         # Read
         self.known_metadata_dir = known_metadata_dir
         if save_metadata and known_metadata_dir is None:
             raise ValueError("Cannot save nodes without a known_metadata_dir")
+        self._node_metadata_log = None  # type: NodeMetadataLog
 
         known_nodes = known_nodes or tuple()
         for node in known_nodes:
@@ -80,6 +95,19 @@ class Learner(ABC):
         self._learning_round = 0            # type: int
         self._rounds_without_new_nodes = 0  # type: int
 
+        self.metrics = MetricsRegistry()
+        self._learning_round_duration = self.metrics.histogram("nucypher_learning_round_seconds",
+                                                               "How long each round of the learning loop took.")
+        self.metrics.collect("nucypher_known_nodes", "Nodes we know about.", lambda: len(self.__known_nodes))
+
+        # Warm start
+        self.snapshot_filepath = snapshot_filepath
+        self._snapshot_at_shutdown = None  # The id of the reactor trigger that saves our snapshot, if there is one.
+        if snapshot_filepath:
+            if os.path.exists(snapshot_filepath):
+                self.restore_snapshot()
+            self._save_snapshot_at_shutdown()
+
         if self.start_learning_now:
             self.start_learning_loop(now=self.learn_on_same_thread)
 
@@ -92,10 +120,11 @@ class Learner(ABC):
         listeners = self._learning_listeners.pop(node.checksum_public_address, ())
         address = node.checksum_public_address
 
-        self.__known_nodes[address] = node
+        record = self.__known_nodes.add(node)
+        self._routing_index.add(record.canonical_public_address, record)
 
         if self.save_metadata:
-            node.write_node_metadata(node=node)
+            self.write_node_metadata(node=record)
 
         self.log.info("Remembering {}, popping {} listeners.".format(node.checksum_public_address, len(listeners)))
         for listener in listeners:
@@ -106,10 +135,28 @@ class Learner(ABC):
         if self._learning_task.running:
             return False
         else:
+            if self.snapshot_filepath:
+                self._save_snapshot_at_shutdown()  # Again, if the loop was stopped before.
             d = self._learning_task.start(interval=self._SHORT_LEARNING_DELAY, now=now)
             d.addErrback(self.handle_learning_errors)
             return d
 
+    def stop_learning_loop(self):
+        """
+        Stops the learning loop.  Our snapshot, if we keep one, is saved now rather than at shutdown,
+        so that a Learner that's done with doesn't linger in the reactor's shutdown triggers.
+        """
+        if self._learning_task.running:
+            self._learning_task.stop()
+        if self._snapshot_at_shutdown is not None:
+            reactor.removeSystemEventTrigger(self._snapshot_at_shutdown)
+            self._snapshot_at_shutdown = None
+            self.save_snapshot()
+
+    def _save_snapshot_at_shutdown(self):
+        if self._snapshot_at_shutdown is None:
+            self._snapshot_at_shutdown = reactor.addSystemEventTrigger("before", "shutdown", self.save_snapshot)
+
     def handle_learning_errors(self, *args, **kwargs):
         failure = args[0]
         if self._abort_on_learning_error:
@@ -127,23 +174,29 @@ class Learner(ABC):
         failure.raiseException()
 
     def shuffled_known_nodes(self):
-        nodes_we_know_about = list(self.__known_nodes.values())
-        random.shuffle(nodes_we_know_about)
-        return nodes_we_know_about
+        """
+        The nodes we know about, in random order, each built from its record only once it's reached -
+        so that whoever takes just the first few doesn't pay for the rest.
+        """
+        addresses_we_know_about = list(self.__known_nodes)
+        random.shuffle(addresses_we_know_about)
+        return (self.__known_nodes[address] for address in addresses_we_know_about
+                if address in self.__known_nodes)
 
     def select_teacher_nodes(self):
-        nodes_we_know_about = self.shuffled_known_nodes()
+        addresses_we_know_about = list(self.__known_nodes)
+        random.shuffle(addresses_we_know_about)
 
-        if not nodes_we_know_about:
+        if not addresses_we_know_about:
             raise self.NotEnoughTeachers("Need some nodes to start learning from.")
 
-        self.teacher_nodes.extend(nodes_we_know_about)
+        self.teacher_nodes.extend(addresses_we_know_about)
 
     def cycle_teacher_node(self):
         if not self.teacher_nodes:
             self.select_teacher_nodes()
         try:
-            self._current_teacher_node = self.teacher_nodes.pop()
+            self._current_teacher_node = self.__known_nodes[self.teacher_nodes.pop()]
         except IndexError:
             error = "Not enough nodes to select a good teacher, Check your network connection then node configuration"
             raise self.NotEnoughTeachers(error)
@@ -174,7 +227,8 @@ class Learner(ABC):
         """
         Continually learn about new nodes.
         """
-        self.learn_from_teacher_node(eager=False)  # TODO: Allow the user to set eagerness?
+        with self._learning_round_duration.time():
+            self.learn_from_teacher_node(eager=False)  # TODO: Allow the user to set eagerness?
 
     def learn_about_specific_nodes(self, canonical_addresses: Set):
         self._node_ids_to_learn_about_immediately.update(canonical_addresses)  # hmmmm
@@ -219,6 +273,13 @@ class Learner(ABC):
         start = maya.now()
         starting_round = self._learning_round
 
+        # Before waiting on the learning loop, go looking for them - for no longer than we'd wait.
+        for address in canonical_addresses.difference(self.__known_nodes):
+            time_left = timeout - (maya.now() - start).total_seconds()
+            if time_left <= 0:
+                break
+            self.lookup_node(address, timeout=time_left)
+
         while True:
             if self._crashed:
                 return self._crashed
@@ -277,37 +338,169 @@ class Learner(ABC):
     def network_bootstrap(self, node_list: list) -> None:
         for node_addr, port in node_list:
             new_nodes = self.learn_about_nodes_now(node_addr, port)
-            self.__known_nodes.update(new_nodes)
+            for node in new_nodes:
+                self.remember_node(node)
+
+    def nodes_closest_to(self, canonical_address: bytes, count: int = None) -> list:
+        """
+        The NodeRecords of the known nodes whose canonical addresses are nearest (by XOR distance)
+        to canonical_address, nearest first.
+        """
+        return self._routing_index.closest(canonical_address, count or self.LOOKUP_NEIGHBORHOOD_SIZE)
+
+    def lookup_node(self, checksum_address: str, timeout: float = None):
+        """
+        Finds the node with checksum_address, Kademlia-style: ask the known nodes nearest to its address
+        (LOOKUP_PARALLELISM of them at a time) for the nodes nearest to it that they know about, remember those,
+        and repeat with whichever nodes are now nearest, until it turns up or there's nobody nearer left to ask.
+
+        Since each round gets at least one bit closer, this takes O(log N) rounds rather than however many
+        rounds of the learning loop it takes to stumble across the node.
+
+        Given a timeout, no new round is started after that many seconds.
+
+        Returns the node, or None if it couldn't be found.
+        """
+        with suppress(KeyError):
+            return self.__known_nodes[checksum_address]
+
+        target = to_canonical_address(checksum_address)
+        already_asked = set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with ThreadPoolExecutor(max_workers=self.LOOKUP_PARALLELISM, thread_name_prefix="lookup") as executor:
+            while checksum_address not in self.__known_nodes:
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+                teachers = [node for node in self.nodes_closest_to(target)
+                            if node.checksum_public_address not in already_asked][:self.LOOKUP_PARALLELISM]
+                if not teachers:
+                    break
+
+                already_asked.update(teacher.checksum_public_address for teacher in teachers)
+                futures = [executor.submit(self.get_nodes_closest_to_via_teacher,
+                                           self.__known_nodes[teacher.checksum_public_address],
+                                           target)
+                           for teacher in teachers]
+
+                # Remember what we've heard here, rather than on the executor's threads.
+                for teacher, future in zip(teachers, futures):
+                    try:
+                        nodes = future.result()
+                    except (requests.exceptions.RequestException, RuntimeError, self.InvalidSignature) as e:
+                        self.log.info("Couldn't ask {} about {}: {}".format(teacher.checksum_public_address,
+                                                                              checksum_address, e))
+                        continue
+                    for node in nodes:
+                        if node.checksum_public_address not in self.__known_nodes:
+                            self.remember_node(node)
+
+        self.log.info("Looked up {} by asking {} nodes.".format(checksum_address, len(already_asked)))
+        return self.__known_nodes.get(checksum_address)
+
+    def get_nodes_by_ids(self, node_ids, allow_missing: int = 0) -> list:
+        """
+        Returns the nodes with these checksum addresses, looking up the ones we don't know about yet.
 
-    def get_nodes_by_ids(self, node_ids):
+        Raises NotEnoughTeachers if more than allow_missing of them couldn't be found.
+        """
+        nodes, missing = [], []
         for node_id in node_ids:
-            try:
-                # Scenario 1: We already know about this node.
-                return self.__known_nodes[node_id]
-            except KeyError:
-                raise NotImplementedError
-        # Scenario 2: We don't know about this node, but a nearby node does.
-        # TODO: Build a concurrent pool of lookups here.
+            node = self.lookup_node(node_id)
+            if node is None:
+                missing.append(node_id)
+            else:
+                nodes.append(node)
+
+        if len(missing) > allow_missing:
+            raise self.NotEnoughTeachers("Couldn't find these {} nodes: {}".format(len(missing), missing))
+        return nodes
+
+    def save_snapshot(self, filepath: str = None) -> str:
+        """
+        Saves our known nodes (and how far we've verified them), their latencies and our TreasureMaps
+        to filepath (by default, snapshot_filepath), for restore_snapshot to pick up after a restart.
+        """
+        filepath = filepath or self.snapshot_filepath
+        latencies = getattr(self.network_middleware, "latencies", None)
+
+        self.__known_nodes.refresh_records()
+        snapshot = LearnerSnapshot(node_records=self.__known_nodes.records(),
+                                   latencies=latencies.samples() if latencies else None,
+                                   treasure_maps=dict(self.treasure_maps))
+        snapshot.save(filepath)
+        self.log.info("Saved a snapshot of {} known nodes to {}.".format(len(snapshot.node_records), filepath))
+        return filepath
+
+    def restore_snapshot(self, filepath: str = None, max_age: float = None) -> bool:
+        """
+        Picks up what save_snapshot saved, unless it's more than max_age (by default, SNAPSHOT_MAX_AGE) seconds old.
+        Returns whether it did.
+        """
+        filepath = filepath or self.snapshot_filepath
+        max_age = self.SNAPSHOT_MAX_AGE if max_age is None else max_age
+
+        try:
+            snapshot = LearnerSnapshot.load(filepath, federated_only=self.federated_only)
+        except (OSError, LearnerSnapshot.Unreadable) as e:
+            self.log.warning("Can't restore from snapshot {}: {}".format(filepath, e))
+            return False
 
-        # Scenario 3: We don't know about this node, and neither does our friend.
+        if snapshot.age > max_age:
+            self.log.info("Snapshot {} is {:.0f} seconds old; not restoring from it.".format(filepath, snapshot.age))
+            return False
+
+        # Nodes' metadata stays as valid as it was, but they may have gone away since we last checked.
+        still_verified = snapshot.age <= self.SNAPSHOT_VERIFICATION_MAX_AGE
+
+        for record in snapshot.node_records:
+            if record.checksum_public_address in self.__known_nodes:
+                continue
+            record.verified_node = record.verified_node and still_verified
+            if record.certificate_filepath is not None:
+                with suppress(OSError):
+                    CertificateStore.written(record.certificate_filepath)
+                if not os.path.exists(record.certificate_filepath):
+                    record.certificate_filepath = None
+            self.remember_node(record)
+
+        latencies = getattr(self.network_middleware, "latencies", None)
+        if latencies:
+            latencies.restore(snapshot.latencies)
+
+        for map_id, treasure_map in snapshot.treasure_maps.items():
+            self.treasure_maps.setdefault(map_id, treasure_map)
+
+        self.log.info("Restored {} known nodes and {} TreasureMaps from {}.".format(len(snapshot.node_records),
+                                                                                   len(snapshot.treasure_maps),
+                                                                                   filepath))
+        return True
 
     def write_node_metadata(self, node, serializer=bytes) -> str:
+        """
+        Appends node's metadata to the known-node log in known_metadata_dir (unless it's there already);
+        returns the log's filepath.
+        """
+        if self._node_metadata_log is None:
+            log_filepath = os.path.join(self.known_metadata_dir, NodeMetadataLog.FILENAME)
+            self._node_metadata_log = NodeMetadataLog(log_filepath)
 
         try:
-            filename = "{}.node".format(node.checksum_public_address)  # TODO: Use common name
+            canonical_address = node.canonical_public_address
         except AttributeError:
             raise AttributeError("{} does not have a rest_interface attached".format(self))
 
-        metadata_filepath = os.path.join(self.known_metadata_dir, filename)
-
-        with open(metadata_filepath, "w") as f:
-            f.write(serializer(node).hex())
-        return metadata_filepath
+        self._node_metadata_log.write(canonical_address, serializer(node))
+        return self._node_metadata_log.filepath
 
     @abstractmethod
     def learn_from_teacher_node(self, eager: bool = True):
         raise NotImplementedError
 
+    @abstractmethod
+    def get_nodes_closest_to_via_teacher(self, teacher, canonical_address: bytes) -> list:
+        raise NotImplementedError
+
 
 class Character(Learner):
     """
@@ -317,6 +510,14 @@ class Character(Learner):
     _default_crypto_powerups = None
     _stamp = None
     _crashed = False
+    _canonical_address = None
+    __stamp_bytes = None
+
+    STRANGER_CACHE_SIZE = 1000
+
+    # The parsed keys (and address derived from them) of the strangers most recently made from nothing but
+    # public keys, by class, mode and key bytes.  Only these are shared; each stranger is a Character of its own.
+    __stranger_keys = BoundedCache(max_entries=STRANGER_CACHE_SIZE)
 
     from nucypher.network.protocols import SuspiciousActivity  # Ship this exception with every Character.
 
@@ -359,8 +560,6 @@ class Character(Learner):
             represented by zero Characters or by more than one Character.
 
         """
-        super().__init__(*args, **kwargs)
-
         self.federated_only = federated_only                     # type: bool
         self.known_certificates_dir = known_certificates_dir
 
@@ -418,11 +617,20 @@ class Character(Learner):
                     error = "Federated-only Characters derive their address from their Signing key; got {} instead."
                     raise self.SuspiciousActivity(error.format(checksum_address))
 
+        #
+        # Learning
+        #
+
+        # Strangers don't learn, so they skip the learning loop and everything that goes with it;
+        # we make them all the time (for every node we hear about, and in Ursula's request handlers).
+        if is_me:
+            super().__init__(*args, **kwargs)
+
     def __eq__(self, other) -> bool:
-        return bytes(self.stamp) == bytes(other.stamp)
+        return self._stamp_bytes == other._stamp_bytes
 
     def __hash__(self):
-        return int.from_bytes(bytes(self.stamp), byteorder="big")
+        return hash(self._stamp_bytes)
 
     def __repr__(self):
         class_name = self.__class__.__name__
@@ -447,13 +655,33 @@ class Character(Learner):
         else:
             return self._stamp
 
+    @property
+    def _stamp_bytes(self) -> bytes:
+        """Our stamp as bytes, which is what we're compared and hashed by."""
+        if self.__stamp_bytes is None:
+            self.__stamp_bytes = bytes(self.stamp)
+        return self.__stamp_bytes
+
+    @property
+    def _checksum_address(self):
+        return self.__checksum_address
+
+    @_checksum_address.setter
+    def _checksum_address(self, checksum_address):
+        # The canonical address we derived (if any) was from the old one.
+        self.__checksum_address = checksum_address
+        self._canonical_address = None
+
     @property
     def canonical_public_address(self):
-        return to_canonical_address(self.checksum_public_address)
+        if self._canonical_address is None:
+            self._canonical_address = to_canonical_address(self.checksum_public_address)
+        return self._canonical_address
 
     @canonical_public_address.setter
     def canonical_public_address(self, address_bytes):
         self._checksum_address = to_checksum_address(address_bytes)
+        self._canonical_address = to_canonical_address(address_bytes)
 
     @property
     def ether_address(self):
@@ -481,7 +709,32 @@ class Character(Learner):
         Each item in the collection will have the CryptoPowerUp instantiated
         with the public_material_bytes, and the resulting CryptoPowerUp instance
         consumed by the Character.
+
+        For Characters who are nothing but their public keys, the parsed keys and the address derived
+        from them are kept: asking again for the same keys gets a new Character, but without parsing
+        the keys or deriving the address again.
         """
+        if args or kwargs:
+            # There's more to this Character (eg, an Ursula's interface) than its keys.
+            return cls._from_public_keys(powers_and_material, federated_only, *args, **kwargs)
+
+        key_bytes = tuple((power_up.__name__, bytes(material))
+                          for power_up, material in sorted(powers_and_material.items(), key=lambda p: p[0].__name__))
+        stranger_id = (cls, federated_only, key_bytes)
+
+        stranger_keys = cls.__stranger_keys.get(stranger_id)
+        if stranger_keys is None:
+            stranger = cls._from_public_keys(powers_and_material, federated_only)
+            public_keys = {power_up: stranger.public_keys(power_up) for power_up in powers_and_material}
+            cls.__stranger_keys.put(stranger_id, (public_keys, stranger.checksum_public_address))
+        else:
+            public_keys, checksum_address = stranger_keys
+            stranger = cls._from_public_keys(public_keys, federated_only)
+            stranger._checksum_address = checksum_address
+        return stranger
+
+    @classmethod
+    def _from_public_keys(cls, powers_and_material: Dict, federated_only=True, *args, **kwargs) -> 'Character':
         crypto_power = CryptoPower()
 
         for power_up, public_key in powers_and_material.items():
@@ -518,8 +771,7 @@ class Character(Learner):
         unresponsive_nodes = set()
         try:
 
-            # TODO: Streamline path generation
-            certificate_filepath = os.path.join(self.known_certificates_dir, current_teacher.certificate_filename)
+            certificate_filepath = self._teacher_certificate_filepath(current_teacher)
             response = self.network_middleware.get_nodes_via_rest(url=rest_url,
                                                                   nodes_i_need=self._node_ids_to_learn_about_immediately,
                                                                   announce_nodes=announce_nodes,
@@ -533,10 +785,22 @@ class Character(Learner):
             self.cycle_teacher_node()
             return
 
+        if response.status_code == 429:
+            # The teacher is turning us away for asking too often; ask someone else, and ask less often.
+            self.log.info("Teacher {} is rate limiting us.".format(current_teacher.checksum_public_address))
+            self.cycle_teacher_node()
+            self._adjust_learning([])
+            return
         if response.status_code != 200:
             raise RuntimeError("Bad response from teacher: {} - {}".format(response, response.content))
 
         signature, nodes = signature_splitter(response.content, return_remainder=True)
+        try:
+            self._verify_teacher_signature(current_teacher, signature, nodes)
+        except self.InvalidSignature as e:
+            self.log.warning("Suspicious Activity: {}".format(e))
+            self.cycle_teacher_node()
+            return
 
         # TODO: This doesn't make sense - a decentralized node can still learn about a federated-only node.
         from nucypher.characters.lawful import Ursula
@@ -560,7 +824,8 @@ class Character(Learner):
                 self.log.warning(message)
             self.log.info("Previously unknown node: {}".format(node.checksum_public_address))
 
-            self.log.info("Previously unknown node: {}".format(node.checksum_public_address))
+            if self.known_certificates_dir:
+                node.save_certificate_to_disk(self.known_certificates_dir)
             self.remember_node(node)
             new_nodes.append(node)
 
@@ -571,12 +836,58 @@ class Character(Learner):
                                                         current_teacher.checksum_public_address,
                                                         len(node_list),
                                                         len(new_nodes)), )
-        if new_nodes and self.known_certificates_dir:
-            for node in new_nodes:
+        return new_nodes
+
+    def get_nodes_closest_to_via_teacher(self, teacher, canonical_address: bytes) -> list:
+        """
+        Asks teacher for the nodes it knows whose addresses are nearest to canonical_address;
+        returns the ones that check out and that we don't already know about.
+
+        Raises InvalidSignature if the teacher's answer isn't signed by the teacher.
+        """
+        response = self.network_middleware.get_nodes_closest_to(
+            node=teacher,
+            canonical_address=canonical_address,
+            certificate_filepath=self._teacher_certificate_filepath(teacher))
+        if response.status_code != 200:
+            raise RuntimeError("Bad response from teacher: {} - {}".format(response, response.content))
+
+        signature, nodes = signature_splitter(response.content, return_remainder=True)
+        self._verify_teacher_signature(teacher, signature, nodes)
+
+        from nucypher.characters.lawful import Ursula
+        node_list = Ursula.batch_from_bytes(nodes, federated_only=self.federated_only)
+
+        new_nodes = []
+        for node in node_list:
+            if node.checksum_public_address in self.known_nodes or node.checksum_public_address == self.checksum_public_address:
+                continue
+
+            try:
+                node.validate_metadata(accept_federated_only=self.federated_only)
+            except node.SuspiciousActivity:
+                message = "Suspicious Activity: Discovered node with bad signature: {}.  " \
+                          "Propagated by: {}".format(node.checksum_public_address, teacher.rest_interface)
+                self.log.warning(message)
+                continue
+
+            if self.known_certificates_dir:
                 node.save_certificate_to_disk(self.known_certificates_dir)
+            new_nodes.append(node)
 
         return new_nodes
 
+    def _teacher_certificate_filepath(self, teacher) -> str:
+        # TODO: Streamline path generation
+        if self.known_certificates_dir:
+            return os.path.join(self.known_certificates_dir, teacher.certificate_filename)
+        return teacher.certificate_filepath
+
+    def _verify_teacher_signature(self, teacher, signature, nodes_as_bytes: bytes) -> None:
+        if not signature.verify(nodes_as_bytes, teacher.stamp.as_umbral_pubkey()):
+            raise self.InvalidSignature("{} didn't sign the nodes it taught us about.".format(
+                teacher.checksum_public_address))
+
     def encrypt_for(self,
                     recipient: 'Character',
                     plaintext: bytes,
@@ -705,6 +1016,7 @@ class Character(Learner):
             without_prefix = uncompressed_bytes[1:]
             verifying_key_as_eth_key = EthKeyAPI.PublicKey(without_prefix)
             public_address = verifying_key_as_eth_key.to_checksum_address()
+            canonical_address = verifying_key_as_eth_key.to_canonical_address()
         else:
             try:
                 public_address = to_checksum_address(self.canonical_public_address)
@@ -713,5 +1025,7 @@ class Character(Learner):
             except NotImplementedError:
                 raise TypeError(
                     "You can't use a plain Character in federated mode - you need to implement ether_address.")
+            canonical_address = to_canonical_address(public_address)
 
         self._checksum_address = public_address
+        self._canonical_address = canonical_address
@@ -1,6 +1,7 @@
 import binascii
 import random
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 import maya
 import time
@@ -26,6 +27,8 @@ from nucypher.crypto.api import keccak_digest
 from nucypher.crypto.constants import PUBLIC_ADDRESS_LENGTH, PUBLIC_KEY_LENGTH
 from nucypher.crypto.powers import SigningPower, EncryptingPower, DelegatingPower, BlockchainPower
 from nucypher.keystore.keypairs import HostingKeypair
+from nucypher.keystore.keystore import NotFound
+from nucypher.keystore.threading import ThreadedSession
 from nucypher.network.middleware import RestMiddleware
 from nucypher.network.nodes import VerifiableNode
 from nucypher.network.protocols import InterfaceInfo
@@ -65,13 +68,27 @@ class Alice(Character, PolicyAuthor):
         delegating_power = self._crypto_power.power_ups(DelegatingPower)
         return delegating_power.generate_kfrags(bob_pubkey_enc, self.stamp, label, m, n)
 
+    def generate_kfrags_for_many(self, bobs: List['Bob'], label: bytes, m: int, n: int, max_workers: int = None) -> tuple:
+        """
+        Generates a set of KFrags for each of many Bobs under the same label,
+        splitting the re-encryption key for each Bob on a pool of worker threads.
+
+        :return: The policy public key and a list of KFrag lists, in the same order as bobs.
+        """
+        bob_pubkeys_enc = [bob.public_keys(EncryptingPower) for bob in bobs]
+        delegating_power = self._crypto_power.power_ups(DelegatingPower)
+        return delegating_power.generate_kfrags_for_many(bob_pubkeys_enc, self.stamp, label, m, n,
+                                                         max_workers=max_workers)
+
     def create_policy(self, bob: "Bob", label: bytes, m: int, n: int, federated=False):
         """
         Create a Policy to share uri with bob.
         Generates KFrags and attaches them.
         """
         public_key, kfrags = self.generate_kfrags(bob, label, m, n)
+        return self._policy_from_kfrags(bob, label, m, kfrags, public_key, federated=federated)
 
+    def _policy_from_kfrags(self, bob: "Bob", label: bytes, m: int, kfrags: List, public_key, federated=False):
         payload = dict(label=label,
                        bob=bob,
                        kfrags=kfrags,
@@ -89,7 +106,7 @@ class Alice(Character, PolicyAuthor):
 
         return policy
 
-    def grant(self, bob, uri, m=None, n=None, expiration=None, deposit=None, handpicked_ursulas=None):
+    def _check_grant_parameters(self, m, n, expiration, deposit):
         if not m:
             # TODO: get m from config  #176
             raise NotImplementedError
@@ -105,10 +122,121 @@ class Alice(Character, PolicyAuthor):
                 deposit = self.network_middleware.get_competitive_rate()
                 if deposit == NotImplemented:
                     deposit = constants.NON_PAYMENT(b"0000000")
-        if handpicked_ursulas is None:
-            handpicked_ursulas = set()
+        return deposit
 
+    def grant(self, bob, uri, m=None, n=None, expiration=None, deposit=None, handpicked_ursulas=None):
+        deposit = self._check_grant_parameters(m, n, expiration, deposit)
         policy = self.create_policy(bob, uri, m, n)
+        return self._arrange_and_enact(policy, n, expiration, deposit, handpicked_ursulas)
+
+    def grant_many(self,
+                   bobs,
+                   label,
+                   m=None,
+                   n=None,
+                   expiration=None,
+                   deposit=None,
+                   handpicked_ursulas=None,
+                   max_workers=None,
+                   enactment_batch_size=100):
+        """
+        Grants access to label to each of bobs.
+
+        Everything that can fail for all of the grants at once happens before this returns:
+        the parameters are checked, the Ursulas are found (once, for all of the grants) and verified,
+        and the label-derived key is derived once and split for every Bob on a pool of worker threads.
+        The grants themselves happen as the returned generator is iterated: the Policies are arranged and
+        enacted in batches of up to enactment_batch_size, concurrently on the pool, with one request per Ursula
+        per batch for the Arrangements and one for the KFrags, and their TreasureMaps are then published
+        concurrently.
+
+        :return: A generator of (bob, policy), yielded as each Bob's grant completes.  If a grant failed,
+            the exception which it raised takes the place of its Policy.
+        """
+        bobs = list(bobs)
+        deposit = self._check_grant_parameters(m, n, expiration, deposit)
+        ursulas = self._select_ursulas(n, handpicked_ursulas)
+
+        for ursula in ursulas:
+            ursula.verify_node(self.network_middleware, accept_federated_only=self.federated_only)
+
+        public_key, kfrag_sets = self.generate_kfrags_for_many(bobs, label, m, n, max_workers=max_workers)
+        policies = [self._policy_from_kfrags(bob, label, m, kfrags, public_key)
+                    for bob, kfrags in zip(bobs, kfrag_sets)]
+
+        return self._grant_policies(policies,
+                                    ursulas=ursulas,
+                                    expiration=expiration,
+                                    deposit=deposit,
+                                    max_workers=max_workers,
+                                    enactment_batch_size=enactment_batch_size)
+
+    def _grant_policies(self, policies, ursulas, expiration, deposit, max_workers=None, enactment_batch_size=100):
+        """
+        Arranges, enacts and publishes policies (see grant_many), yielding (bob, policy) as each is published.
+
+        Federated Policies are arranged and enacted in batches of up to enactment_batch_size, with one request
+        per Ursula per batch for the Arrangements and another for the KFrags; other Policies make their own
+        Arrangements, and are then enacted in batches.
+        """
+        from nucypher.policy.models import FederatedPolicy, Policy
+
+        def arrange_and_enact(batch):
+            if self.federated_only:
+                FederatedPolicy.arrange_many(batch,
+                                             ursulas=ursulas,
+                                             network_middleware=self.network_middleware,
+                                             deposit=deposit,
+                                             expiration=expiration)
+            else:
+                for policy in batch:
+                    policy.make_arrangements(network_middleware=self.network_middleware,
+                                             deposit=deposit,
+                                             expiration=expiration,
+                                             handpicked_ursulas=set(ursulas))
+            return Policy.enact_many(batch, network_middleware=self.network_middleware, publish=False)
+
+        def publish(policy):
+            policy.publish(network_middleware=self.network_middleware)
+            return policy
+
+        batches = [policies[i:i + enactment_batch_size] for i in range(0, len(policies), enactment_batch_size)]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            enacting = {executor.submit(arrange_and_enact, batch): batch for batch in batches}
+            publishing = {}  # type: dict
+
+            while enacting or publishing:
+                done, _not_done = wait(set(enacting) | set(publishing), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    if future in publishing:
+                        bob = publishing.pop(future)
+                        try:
+                            policy = future.result()
+                        except Exception as e:
+                            self.log.warning("Failed to publish a policy for {}: {}".format(bob, e))
+                            yield bob, e
+                        else:
+                            yield bob, policy
+                        continue
+
+                    batch = enacting.pop(future)
+                    try:
+                        failures = future.result()
+                    except Exception as e:
+                        self.log.warning("Failed to enact {} policies: {}".format(len(batch), e))
+                        failures = dict.fromkeys(batch, e)
+                    for policy in batch:
+                        if policy in failures:
+                            self.log.warning("Failed to enact a policy for {}: {}".format(policy.bob, failures[policy]))
+                            yield policy.bob, failures[policy]
+                        else:
+                            publishing[executor.submit(publish, policy)] = policy.bob
+
+    def _select_ursulas(self, n, handpicked_ursulas=None) -> set:
+        if handpicked_ursulas is None:
+            handpicked_ursulas = set()
 
         #
         # We'll find n Ursulas by default.  It's possible to "play the field" by trying different
@@ -125,12 +253,19 @@ class Alice(Character, PolicyAuthor):
                     "To make a Policy in federated mode, you need to know about\
                      all the Ursulas you need (in this case, {}); there's no other way to\
                       know which nodes to use.  Either pass them here or when you make\
-                       the Policy, or run the learning loop on a network with enough Ursulas.".format(self.n))
+                       the Policy, or run the learning loop on a network with enough Ursulas.".format(n))
 
-            if len(handpicked_ursulas) < n:
-                number_of_ursulas_needed = n - len(handpicked_ursulas)
-                new_ursulas = random.sample(list(self.known_nodes.values()), number_of_ursulas_needed)
-                handpicked_ursulas.update(new_ursulas)
+        if self.federated_only and len(handpicked_ursulas) < n:
+            number_of_ursulas_needed = n - len(handpicked_ursulas)
+            handpicked_addresses = {ursula.checksum_public_address for ursula in handpicked_ursulas}
+            candidate_addresses = [address for address in self.known_nodes if address not in handpicked_addresses]
+            new_addresses = random.sample(candidate_addresses, number_of_ursulas_needed)
+            handpicked_ursulas.update(self.known_nodes[address] for address in new_addresses)
+
+        return handpicked_ursulas
+
+    def _arrange_and_enact(self, policy, n, expiration, deposit, handpicked_ursulas=None):
+        handpicked_ursulas = self._select_ursulas(n, handpicked_ursulas)
 
         policy.make_arrangements(network_middleware=self.network_middleware,
                                  deposit=deposit,
@@ -146,11 +281,36 @@ class Alice(Character, PolicyAuthor):
 class Bob(Character):
     _default_crypto_powerups = [SigningPower, EncryptingPower]
 
-    def __init__(self, *args, **kwargs) -> None:
-        super().__init__(*args, **kwargs)
+    def __init__(self, is_me=True, *args, max_saved_work_orders: int = None, work_order_history_filepath: str = None,
+                 **kwargs) -> None:
+        super().__init__(is_me=is_me, *args, **kwargs)
+
+        if is_me:
+            from nucypher.policy.models import WorkOrderHistory  # Need a bigger strategy to avoid circulars.
+            self._saved_work_orders = WorkOrderHistory(max_entries=max_saved_work_orders,
+                                                       filepath=work_order_history_filepath,
+                                                       find_node=self.known_nodes.__getitem__)
 
-        from nucypher.policy.models import WorkOrderHistory  # Need a bigger strategy to avoid circulars.
-        self._saved_work_orders = WorkOrderHistory()
+    def restore_snapshot(self, filepath: str = None, max_age: float = None) -> bool:
+        """
+        As Learner.restore_snapshot; snapshots only keep TreasureMaps as they were published,
+        so Bob reads his again, and forgets any he no longer can.
+        """
+        restored = super().restore_snapshot(filepath=filepath, max_age=max_age)
+        for map_id, treasure_map in list(self.treasure_maps.items()):
+            if treasure_map.destinations != constants.NO_DECRYPTION_PERFORMED:
+                continue
+            alice = Alice.from_public_keys({SigningPower: treasure_map.message_kit.sender_pubkey_sig})
+            try:
+                treasure_map.orient(self.make_compass_for_alice(alice))
+            except Exception as e:
+                self.log.warning("Can't read restored TreasureMap {} again: {}".format(map_id, e))
+                del self.treasure_maps[map_id]
+        return restored
+
+    def close(self) -> None:
+        """Closes the file Bob's WorkOrder history is kept in, if there is one."""
+        self._saved_work_orders.close()
 
     def peek_at_treasure_map(self, treasure_map=None, map_id=None):
         """
@@ -269,7 +429,8 @@ class Bob(Character):
         Return the first one who has it.
         TODO: What if a node gives a bunk TreasureMap?
         """
-        for node in self.known_nodes.values():
+        # Our records of the nodes are enough to ask them; there's no need to build each one.
+        for node in self.known_nodes.records():
             response = networky_stuff.get_treasure_map_from_node(node, map_id)
 
             if response.status_code == 200 and response.content:
@@ -300,19 +461,20 @@ class Bob(Character):
                 "Bob doesn't have a TreasureMap to match any of these capsules: {}".format(
                     capsules))
 
+        capsules_and_digests = [(capsule, self._saved_work_orders.capsule_digest(capsule)) for capsule in capsules]
+
         for node_id, arrangement_id in treasure_map_to_use:
             ursula = self.known_nodes[node_id]
 
-            capsules_to_include = []
-            for capsule in capsules:
-                if not capsule in self._saved_work_orders[node_id]:
-                    capsules_to_include.append(capsule)
+            capsules_to_include = [(capsule, capsule_digest) for capsule, capsule_digest in capsules_and_digests
+                                   if not self._saved_work_orders.contains(node_id, capsule_digest)]
 
             if capsules_to_include:
                 work_order = WorkOrder.construct_by_bob(
-                    arrangement_id, capsules_to_include, ursula, self)
+                    arrangement_id, [capsule for capsule, _digest in capsules_to_include], ursula, self)
                 generated_work_orders[node_id] = work_order
-                self._saved_work_orders[node_id][capsule] = work_order
+                self._saved_work_orders.save_work_order(
+                    node_id, work_order, [capsule_digest for _capsule, capsule_digest in capsules_to_include])
 
             if num_ursulas is not None:
                 if num_ursulas == len(generated_work_orders):
@@ -321,15 +483,85 @@ class Bob(Character):
         return generated_work_orders
 
     def get_reencrypted_cfrags(self, work_order):
-        cfrags = self.network_middleware.reencrypt(work_order)
-        if not len(work_order) == len(cfrags):
-            raise ValueError("Ursula gave back the wrong number of cfrags.  She's up to something.")
-        for counter, capsule in enumerate(work_order.capsules):
-            # TODO: Ursula is actually supposed to sign this.  See #141.
-            # TODO: Maybe just update the work order here instead of setting it anew.
-            work_orders_by_ursula = self._saved_work_orders[work_order.ursula.checksum_public_address]
-            work_orders_by_ursula[capsule] = work_order
-        return cfrags
+        return [cfrag for _capsule, cfrag in self.iter_reencrypted_cfrags(work_order)]
+
+    def iter_reencrypted_cfrags(self, work_order):
+        """
+        Yields (capsule, CFrag) pairs as soon as each CFrag arrives from Ursula, so that
+        they can be attached (and used) before she has re-encrypted the rest.
+        """
+        wrong_number_of_cfrags = ValueError("Ursula gave back the wrong number of cfrags.  She's up to something.")
+        if work_order.ursula is None:
+            raise Ursula.NotEnoughUrsulas("Bob doesn't know the Ursula this WorkOrder is for yet.")
+        ursula_id = work_order.ursula.checksum_public_address
+        capsules = iter(work_order.capsules)
+        for cfrag in self.network_middleware.reencrypt_incrementally(work_order):
+            capsule = next(capsules, None)
+            if capsule is None:
+                raise wrong_number_of_cfrags
+            yield capsule, cfrag
+        if next(capsules, None) is not None:
+            raise wrong_number_of_cfrags
+        # TODO: Ursula is actually supposed to sign this.  See #141.
+        self._saved_work_orders.save_completed(ursula_id, work_order)
+
+    def get_cfrags_hedged(self, map_id, capsule, m, hedge_after: float = None):
+        """
+        Gets m CFrags for capsule from the Ursulas in the TreasureMap matching map_id.
+
+        Each request has a timeout set by how quickly its Ursula has answered before.  If none of the
+        Ursulas in flight has answered within the slowest one's 95th percentile latency (or hedge_after
+        seconds), the capsule also goes to another Ursula from the TreasureMap, so that one slow Ursula
+        can't hold Bob up.  Ursulas who fail or time out are replaced likewise.
+        """
+        latencies = self.network_middleware.latencies
+        executor = ThreadPoolExecutor()
+        in_flight = {}  # future -> (node_id, work_order)
+        cfrags = []
+
+        def ask_another_ursula():
+            work_orders = self.generate_work_orders(map_id, capsule, num_ursulas=1)
+            if not work_orders:
+                return False
+            node_id, work_order = list(work_orders.items())[0]
+            in_flight[executor.submit(self.network_middleware.reencrypt, work_order)] = (node_id, work_order)
+            return True
+
+        try:
+            for _ in range(m):
+                if not ask_another_ursula():
+                    break
+
+            while len(cfrags) < m:
+                if not in_flight:
+                    raise Ursula.NotEnoughUrsulas("Only got {} of the {} CFrags needed.".format(len(cfrags), m))
+
+                if hedge_after is None:
+                    delay = max(latencies.percentile(node_id, 95, default=latencies.default_hedge_delay)
+                                for node_id, _work_order in in_flight.values())
+                else:
+                    delay = hedge_after
+
+                done, _still_in_flight = wait(in_flight, timeout=delay, return_when=FIRST_COMPLETED)
+                if not done:
+                    ask_another_ursula()  # Hedge.
+                    continue
+
+                for future in done:
+                    node_id, work_order = in_flight.pop(future)
+                    try:
+                        cfrag, = future.result()
+                    except Exception as e:
+                        self.log.warning("Didn't get a CFrag from {}: {}".format(node_id, e))
+                        ask_another_ursula()
+                    else:
+                        # TODO: Ursula is actually supposed to sign this.  See #141.
+                        self._saved_work_orders.save(node_id, capsule, work_order)
+                        cfrags.append(cfrag)
+        finally:
+            executor.shutdown(wait=False)  # Don't wait on the stragglers.
+
+        return cfrags[:m]
 
     def get_ursula(self, ursula_id):
         return self._ursulas[ursula_id]
@@ -350,13 +582,11 @@ class Bob(Character):
         hrac, map_id = self.construct_hrac_and_map_id(alice_verifying_key, data_source.label)
         self.follow_treasure_map(map_id=map_id, block=True)
 
-        work_orders = self.generate_work_orders(map_id, message_kit.capsule)
-
+        m = self.treasure_maps[map_id].m
         cleartexts = []
 
-        for work_order in work_orders.values():
-            cfrags = self.get_reencrypted_cfrags(work_order)
-            message_kit.capsule.attach_cfrag(cfrags[0])
+        for cfrag in self.get_cfrags_hedged(map_id, message_kit.capsule, m=m):
+            message_kit.capsule.attach_cfrag(cfrag)
 
         delivered_cleartext = self.verify_from(data_source,
                                                message_kit,
@@ -403,6 +633,7 @@ class Ursula(Character, VerifiableNode, Miner):
                  db_filepath: str = None,
                  is_me: bool = True,
                  interface_signature=None,
+                 rate_limits: dict = None,
 
                  # Blockchain
                  miner_agent=None,
@@ -421,8 +652,6 @@ class Ursula(Character, VerifiableNode, Miner):
                  **character_kwargs
                  ) -> None:
 
-        self._work_orders = []
-
         Character.__init__(self,
                            is_me=is_me,
                            checksum_address=checksum_address,
@@ -464,12 +693,14 @@ class Ursula(Character, VerifiableNode, Miner):
                     treasure_map_tracker=self.treasure_maps,
                     node_tracker=self.known_nodes,
                     node_bytes_caster=self.__bytes__,
-                    work_order_tracker=self._work_orders,
                     node_recorder=self.remember_node,
                     stamp=self.stamp,
                     verifier=self.verify_from,
                     suspicious_activity_tracker=self.suspicious_activities_witnessed,
                     certificate_dir=self.known_certificates_dir,
+                    node_finder=self.nodes_closest_to,
+                    rate_limits=rate_limits,
+                    metrics=self.metrics,
                 )
 
                 rest_server = ProxyRESTServer(
@@ -479,6 +710,11 @@ class Ursula(Character, VerifiableNode, Miner):
                 )
                 self.rest_url = rest_server.rest_url
                 self.datastore = rest_routes.datastore  # TODO: Maybe organize this better?
+                self.kfrag_cache = rest_routes.kfrag_cache
+                self.cfrag_cache = rest_routes.cfrag_cache
+                self.node_verification_queue = rest_routes.node_verification_queue
+                self.admission_control = rest_routes.admission_control
+                self._work_order_writer = rest_routes.work_order_writer
 
                 tls_hosting_keypair = HostingKeypair(
                     common_name=self.checksum_public_address,
@@ -684,17 +920,16 @@ class Ursula(Character, VerifiableNode, Miner):
     #
 
     def work_orders(self, bob=None):
-        """
-        TODO: This is better written as a model method for Ursula's datastore.
-        """
-        if not bob:
-            return self._work_orders
-        else:
-            work_orders_from_bob = []
-            for work_order in self._work_orders:
-                if work_order.bob == bob:
-                    work_orders_from_bob.append(work_order)
-            return work_orders_from_bob
+        from nucypher.policy.models import WorkOrder  # Avoid circular import
+        self._work_order_writer.flush()
+        bob_pubkey_sig = bob.stamp.as_umbral_pubkey() if bob else None
+        with ThreadedSession(self.datastore.engine) as session:
+            try:
+                records = self.datastore.get_workorders(bob_pubkey_sig=bob_pubkey_sig, session=session)
+            except NotFound:
+                return []
+            # Rows saved before WorkOrders' capsules were have too little to rebuild them from.
+            return [WorkOrder.from_datastore_record(record) for record in records if record.capsules is not None]
 
     @only_me
     def stake(self,
@@ -10,6 +10,8 @@ from itertools import islice
 from nucypher.characters.base import Character
 from nucypher.config.constants import DEFAULT_CONFIG_ROOT, DEFAULT_CONFIG_FILE_LOCATION, TEMPLATE_CONFIG_FILE_LOCATION
 from nucypher.network.middleware import RestMiddleware
+from nucypher.network.nodes import NodeRecord
+from nucypher.network.storage import NodeMetadataLog
 
 
 class NodeConfiguration:
@@ -52,7 +54,8 @@ class NodeConfiguration:
                  known_nodes: set = None,
                  known_metadata_dir: str = None,
                  load_metadata: bool = False,
-                 save_metadata: bool = False
+                 save_metadata: bool = False,
+                 snapshot_filepath: str = None
 
                  ) -> None:
 
@@ -100,6 +103,7 @@ class NodeConfiguration:
         self.abort_on_learning_error = abort_on_learning_error
         self.start_learning_now = start_learning_now
         self.save_metadata = save_metadata
+        self.snapshot_filepath = snapshot_filepath
 
         #
         # Auto-Initialization
@@ -136,7 +140,8 @@ class NodeConfiguration:
                             known_nodes=self.known_nodes,
                             known_certificates_dir=self.known_certificates_dir,
                             known_metadata_dir=self.known_metadata_dir,
-                            save_metadata=self.save_metadata
+                            save_metadata=self.save_metadata,
+                            snapshot_filepath=self.snapshot_filepath
                             )
         return base_payload
 
@@ -223,6 +228,7 @@ class NodeConfiguration:
         if known_metadata_dir is None:
             known_metadata_dir = self.known_metadata_dir
 
+        # Nodes saved one to a file, as they were before the known-node log.
         glob_pattern = os.path.join(known_metadata_dir, '*.node')
         metadata_paths = sorted(glob(glob_pattern), key=os.path.getctime)
 
@@ -231,6 +237,14 @@ class NodeConfiguration:
             node = Ursula.from_metadata_file(filepath=abspath(metadata_path), federated_only=self.federated_only)
             self.known_nodes.add(node)
 
+        # The known-node log; the nodes themselves are only built once they're needed.
+        log_filepath = os.path.join(known_metadata_dir, NodeMetadataLog.FILENAME)
+        if os.path.exists(log_filepath):
+            node_metadata_log = NodeMetadataLog(log_filepath)
+            for _canonical_address, metadata in node_metadata_log:
+                self.known_nodes.add(NodeRecord.from_bytes(metadata, federated_only=self.federated_only))
+            node_metadata_log.close()
+
     def write_default_configuration_file(self, filepath: str = DEFAULT_CONFIG_FILE_LOCATION):
         with contextlib.ExitStack() as stack:
             template_file = stack.enter_context(open(TEMPLATE_CONFIG_FILE_LOCATION, 'r'))
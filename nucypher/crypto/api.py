@@ -1,4 +1,6 @@
 import os
+import threading
+import weakref
 from random import SystemRandom
 
 import datetime
@@ -24,9 +26,77 @@ from nucypher.crypto.kits import UmbralMessageKit
 SYSTEM_RAND = SystemRandom()
 
 
+class RandomPool:
+    """
+    A buffered source of randomness which draws from the OS's random device
+    (via `os.urandom`) in blocks of `block_size` bytes and hands out slices of
+    that block until it is exhausted.
+
+    Every byte is handed out exactly once.  The pool is guarded by a lock so
+    that it can be shared between threads, and it discards its buffer after a fork
+    so that a child process never repeats randomness handed out by its parent.
+    """
+
+    DEFAULT_BLOCK_SIZE = 4096
+
+    # Without fork hooks (Python < 3.7), we have to compare PIDs on every read.
+    _check_pid = not hasattr(os, 'register_at_fork')
+    _pools = weakref.WeakSet()  # type: weakref.WeakSet
+
+    def __init__(self, block_size: int = DEFAULT_BLOCK_SIZE) -> None:
+        if block_size <= 0:
+            raise ValueError("block_size must be a positive number of bytes.")
+        self.block_size = block_size
+        self.reseed()
+        self._pools.add(self)
+
+    def reseed(self) -> None:
+        """
+        Discards any buffered randomness.  Also replaces the lock, which may have been
+        held by another thread of the parent process at the moment of a fork.
+        """
+        self._lock = threading.Lock()
+        self._buffer = b''
+        self._offset = 0
+        self._pid = os.getpid()
+
+    @classmethod
+    def reseed_all(cls) -> None:
+        for pool in list(cls._pools):
+            pool.reseed()
+
+    def read(self, num_bytes: int) -> bytes:
+        """
+        Returns `num_bytes` of data which has never been returned before.
+        Requests at least as large as a block bypass the pool entirely.
+        """
+        if num_bytes >= self.block_size:
+            return os.urandom(num_bytes)
+
+        if self._check_pid and self._pid != os.getpid():
+            self.reseed()
+
+        with self._lock:
+            end = self._offset + num_bytes
+            if end > len(self._buffer):
+                self._buffer, self._offset, end = os.urandom(self.block_size), 0, num_bytes
+
+            random_bytes = self._buffer[self._offset:end]
+            self._offset = end
+
+        return random_bytes
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=RandomPool.reseed_all)
+
+SECURE_RANDOM_POOL = RandomPool()
+
+
 def secure_random(num_bytes: int) -> bytes:
     """
-    Returns an amount `num_bytes` of data from the OS's random device.
+    Returns an amount `num_bytes` of data from the OS's random device,
+    buffered through `SECURE_RANDOM_POOL`.
     If a randomness source isn't found, returns a `NotImplementedError`.
     In this case, a secure random source most likely doesn't exist and
     randomness will have to found elsewhere.
@@ -35,8 +105,7 @@ def secure_random(num_bytes: int) -> bytes:
 
     :return: bytes
     """
-    # TODO: Should we just use os.urandom or avoid the import w/ this?
-    return SYSTEM_RAND.getrandbits(num_bytes * 8).to_bytes(num_bytes, byteorder='big')
+    return SECURE_RANDOM_POOL.read(num_bytes)
 
 
 def secure_random_range(min: int, max: int) -> int:
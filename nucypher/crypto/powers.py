@@ -1,8 +1,11 @@
 import inspect
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from eth_keys.datatypes import PublicKey, Signature as EthSignature
 from eth_utils import keccak
-from typing import List, Union
+from typing import List, Union, Iterable, Tuple
 from umbral import pre
 from umbral.keys import UmbralPublicKey, UmbralPrivateKey, UmbralKeyingMaterial
 
@@ -195,8 +198,27 @@ class EncryptingPower(KeyPairBasedPower):
 
 class DelegatingPower(DerivedKeyBasedPower):
 
+    # Number of label-derived private keys to keep around for re-grants.
+    _DERIVED_KEY_CACHE_SIZE = 256
+
     def __init__(self) -> None:
         self.umbral_keying_material = UmbralKeyingMaterial()
+        self.__derived_keys = OrderedDict()  # type: OrderedDict
+        self.__derived_keys_lock = threading.Lock()
+
+    def _get_privkey_from_label(self, label: bytes) -> UmbralPrivateKey:
+        with self.__derived_keys_lock:
+            try:
+                private_key = self.__derived_keys.pop(label)
+            except KeyError:
+                private_key = self.umbral_keying_material.derive_privkey_by_label(label)
+                if len(self.__derived_keys) >= self._DERIVED_KEY_CACHE_SIZE:
+                    self.__derived_keys.popitem(last=False)  # Least recently used.
+            self.__derived_keys[label] = private_key
+        return private_key
+
+    def get_pubkey_from_label(self, label: bytes) -> UmbralPublicKey:
+        return self._get_privkey_from_label(label).get_pubkey()
 
     def generate_kfrags(self, bob_pubkey_enc, signer, label, m, n) -> Union[UmbralPublicKey, List]:
         """
@@ -210,6 +232,32 @@ class DelegatingPower(DerivedKeyBasedPower):
         """
         # TODO: salt?  #265
 
-        __private_key = self.umbral_keying_material.derive_privkey_by_label(label)
+        __private_key = self._get_privkey_from_label(label)
         kfrags = pre.split_rekey(__private_key, signer, bob_pubkey_enc, m, n)
         return __private_key.get_pubkey(), kfrags
+
+    def generate_kfrags_for_many(self,
+                                 bob_pubkeys_enc: Iterable[UmbralPublicKey],
+                                 signer,
+                                 label: bytes,
+                                 m: int,
+                                 n: int,
+                                 max_workers: int = None,
+                                 ) -> Tuple[UmbralPublicKey, List[List]]:
+        """
+        Like generate_kfrags, but for many Bobs at once under the same label.
+
+        The label-derived key is derived once, and the splits (each of which is
+        n EC multiplications) are spread over a pool of worker threads.
+
+        :return: The policy public key and a list of KFrag lists, in the same order as bob_pubkeys_enc.
+        """
+        __private_key = self._get_privkey_from_label(label)
+
+        def split_for(bob_pubkey_enc):
+            return pre.split_rekey(__private_key, signer, bob_pubkey_enc, m, n)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            kfrag_sets = list(executor.map(split_for, bob_pubkeys_enc))
+
+        return __private_key.get_pubkey(), kfrag_sets
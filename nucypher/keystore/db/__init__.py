@@ -10,3 +10,35 @@ def set_secure_delete_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA secure_delete=on")
     cursor.close()
+
+
+SCHEMA_VERSION = 1  # Kept in SQLite's user_version; bump it along with a migration in create_or_migrate_schema.
+
+
+class SchemaVersionError(Exception):
+    """Raised for a datastore written by a newer version of nucypher than this one."""
+
+
+def create_or_migrate_schema(sqlalchemy_engine) -> None:
+    """
+    Creates any tables the datastore doesn't have yet, first migrating the ones it has to SCHEMA_VERSION.
+
+    Version 1 saves whole WorkOrders: their receipts and capsules, which rows from before it don't have,
+    and Bob's signature, which needn't be unique any more, since he may resend a WorkOrder.  SQLite
+    can't drop a constraint in place, so the table is rebuilt and its rows copied over.
+    """
+    with sqlalchemy_engine.begin() as connection:
+        version = connection.execute("PRAGMA user_version").scalar()
+        if version > SCHEMA_VERSION:
+            raise SchemaVersionError("The datastore is at schema version {}, but this nucypher only knows up to {}."
+                                     .format(version, SCHEMA_VERSION))
+
+        if version < 1 and sqlalchemy_engine.dialect.has_table(connection, 'workorders'):
+            connection.execute("ALTER TABLE workorders RENAME TO workorders_v0")
+            Base.metadata.tables['workorders'].create(connection)
+            columns = "id, bob_pubkey_sig_id, bob_signature, arrangement_id, created_at"
+            connection.execute("INSERT INTO workorders ({0}) SELECT {0} FROM workorders_v0".format(columns))
+            connection.execute("DROP TABLE workorders_v0")
+
+        Base.metadata.create_all(connection)
+        connection.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
@@ -60,12 +60,18 @@ class Workorder(Base):
     __tablename__ = 'workorders'
 
     id = Column(Integer, primary_key=True)
-    bob_pubkey_sig_id = Column(Integer, ForeignKey('keys.id'))
-    bob_signature = Column(LargeBinary, unique=True)
-    arrangement_id = Column(LargeBinary, unique=False)
+    bob_pubkey_sig_id = Column(Integer, ForeignKey('keys.id'), index=True)
+    bob_pubkey_sig = relationship(Key, backref="workorders", lazy='joined')
+    bob_signature = Column(LargeBinary, unique=False)  # Bob may well resend the same WorkOrder.
+    arrangement_id = Column(LargeBinary, unique=False, index=True)
+    receipt_bytes = Column(LargeBinary, nullable=True)
+    capsules = Column(LargeBinary, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    def __init__(self, bob_pubkey_sig_id, bob_signature, arrangement_id) -> None:
+    def __init__(self, bob_pubkey_sig_id, bob_signature, arrangement_id,
+                 receipt_bytes=None, capsules=None) -> None:
         self.bob_pubkey_sig_id = bob_pubkey_sig_id
         self.bob_signature = bob_signature
         self.arrangement_id = arrangement_id
+        self.receipt_bytes = receipt_bytes
+        self.capsules = capsules
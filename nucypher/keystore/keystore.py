@@ -1,6 +1,6 @@
 from bytestring_splitter import BytestringSplitter
 from sqlalchemy.orm import sessionmaker
-from typing import Union
+from typing import List, Union
 from umbral.fragments import KFrag
 from umbral.keys import UmbralPublicKey
 
@@ -107,6 +107,28 @@ class KeyStore(object):
 
         return new_policy_arrangement
 
+    def add_policy_arrangements(self, alice_pubkey_sig, expirations_by_id: dict,
+                                session=None) -> List[PolicyArrangement]:
+        """
+        Creates many PolicyArrangements, without kfrags, for the same Alice in a single transaction.
+
+        :return: The newly added PolicyArrangement objects
+        """
+        session = session or self._session_on_init_thread
+
+        alice_key_instance = session.query(Key).filter_by(key_data=bytes(alice_pubkey_sig)).first()
+        if not alice_key_instance:
+            alice_key_instance = Key.from_umbral_key(alice_pubkey_sig, is_signing=True)
+
+        new_policy_arrangements = [PolicyArrangement(expiration, id, None, alice_pubkey_sig=alice_key_instance,
+                                                     alice_signature=None)
+                                   for id, expiration in expirations_by_id.items()]
+
+        session.add_all(new_policy_arrangements)
+        session.commit()
+
+        return new_policy_arrangements
+
     def get_policy_arrangement(self, arrangement_id: bytes, session=None) -> PolicyArrangement:
         """
         Returns the PolicyArrangement by its HRAC.
@@ -144,27 +166,97 @@ class KeyStore(object):
         policy_arrangement.k_frag = bytes(kfrag)
         session.commit()
 
-    def add_workorder(self, bob_pubkey_sig, bob_signature, arrangement_id, session=None) -> Workorder:
+    def attach_kfrags_to_saved_arrangements(self, alice, kfrags_by_id_as_hex: dict, session=None):
+        """
+        Attaches many kfrags to their saved arrangements in a single transaction.
+
+        Either all of the kfrags are attached or, if any of the arrangements don't exist
+        or weren't made with this Alice, none of them are.
+        """
+        session = session or self._session_on_init_thread
+
+        ids = [id_as_hex.encode() for id_as_hex in kfrags_by_id_as_hex]
+        policy_arrangements = session.query(PolicyArrangement).filter(PolicyArrangement.id.in_(ids)).all()
+        arrangements_by_id = {policy_arrangement.id: policy_arrangement for policy_arrangement in policy_arrangements}
+
+        missing = set(ids) - set(arrangements_by_id)
+        if missing:
+            raise NotFound("Can't attach kfrags to non-existent Arrangements {}".format(missing))
+
+        for policy_arrangement in policy_arrangements:
+            if policy_arrangement.alice_pubkey_sig.key_data != alice.stamp:
+                raise alice.SuspiciousActivity
+
+        for id_as_hex, kfrag in kfrags_by_id_as_hex.items():
+            arrangements_by_id[id_as_hex.encode()].k_frag = bytes(kfrag)
+        session.commit()
+
+    def _get_or_add_key(self, pubkey, is_signing=True, session=None) -> Key:
+        """
+        Returns the stored Key for pubkey, adding it (uncommitted) if we've never seen it.
+        """
+        session = session or self._session_on_init_thread
+        key = session.query(Key).filter_by(key_data=bytes(pubkey)).first()
+        if not key:
+            key = Key.from_umbral_key(pubkey, is_signing=is_signing)
+            session.add(key)
+            session.flush()
+        return key
+
+    def add_workorder(self, bob_pubkey_sig, bob_signature, arrangement_id,
+                      receipt_bytes=None, capsules=None, session=None) -> Workorder:
         """
         Adds a Workorder to the keystore.
         """
         session = session or self._session_on_init_thread
-        bob_pubkey_sig = self.add_key(bob_pubkey_sig)
-        new_workorder = Workorder(bob_pubkey_sig.id, bob_signature, arrangement_id)
+        bob_pubkey_sig = self._get_or_add_key(bob_pubkey_sig, session=session)
+        new_workorder = Workorder(bob_pubkey_sig.id, bob_signature, arrangement_id,
+                                  receipt_bytes=receipt_bytes, capsules=capsules)
 
         session.add(new_workorder)
         session.commit()
 
         return new_workorder
 
-    def get_workorders(self, arrangement_id: bytes, session=None) -> Workorder:
+    def add_workorders(self, work_orders, session=None) -> List[Workorder]:
         """
-        Returns a list of Workorders by HRAC.
+        Adds many WorkOrders to the keystore, in a single transaction.
         """
         session = session or self._session_on_init_thread
 
-        workorders = session.query(Workorder).filter_by(arrangement_id=arrangement_id)
+        keys_by_key_data = {}
+        new_workorders = []
+        for work_order in work_orders:
+            bob_pubkey_sig = work_order.bob.stamp.as_umbral_pubkey()
+            key_data = bytes(bob_pubkey_sig)
+            if key_data not in keys_by_key_data:
+                keys_by_key_data[key_data] = self._get_or_add_key(bob_pubkey_sig, session=session)
+
+            new_workorders.append(Workorder(keys_by_key_data[key_data].id,
+                                            bytes(work_order.receipt_signature),
+                                            work_order.arrangement_id.hex().encode(),
+                                            receipt_bytes=work_order.receipt_bytes,
+                                            capsules=work_order.packed_capsules()))
+
+        session.add_all(new_workorders)
+        session.commit()
+
+        return new_workorders
+
+    def get_workorders(self, arrangement_id: bytes = None, bob_pubkey_sig=None, session=None) -> List[Workorder]:
+        """
+        Returns a list of Workorders by HRAC, by Bob's signing key, or by both.
+        """
+        session = session or self._session_on_init_thread
+
+        workorders = session.query(Workorder)
+        if arrangement_id is not None:
+            workorders = workorders.filter(Workorder.arrangement_id == arrangement_id)
+        if bob_pubkey_sig is not None:
+            workorders = workorders.join(Key, Workorder.bob_pubkey_sig_id == Key.id)\
+                .filter(Key.key_data == bytes(bob_pubkey_sig))
 
+        workorders = workorders.all()
         if not workorders:
             raise NotFound("No Workorders with {} HRAC found.".format(arrangement_id))
         return workorders
@@ -1,3 +1,7 @@
+import queue
+import threading
+from logging import getLogger
+
 from sqlalchemy.orm import sessionmaker, scoped_session
 
 
@@ -12,4 +16,83 @@ class ThreadedSession:
         return self.session
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.session.remove()
\ No newline at end of file
+        self.session.remove()
+
+
+class ThreadedBatchWriter:
+    """
+    Writes items to the datastore from a background thread, so that callers don't wait on the database.
+
+    Whatever has queued up while the last batch was being written goes out with the next one (up to max_batch_size),
+    in one transaction, via write_batch(items, session=session).  Call flush() before reading back what was submitted;
+    it raises WriteFailed if any batch failed to be written since the last flush.
+
+    At most max_pending items wait at once.  Past that, submit() waits up to submit_timeout seconds for room,
+    and then raises Backlogged.
+    """
+    log = getLogger("keystore")
+
+    class Backlogged(Exception):
+        """Raised when there's no room to queue another item, because the database isn't keeping up."""
+
+    class WriteFailed(Exception):
+        """Raised by flush() when batches submitted since the last flush failed to be written."""
+
+    def __init__(self,
+                 sqlalchemy_engine,
+                 write_batch,
+                 max_batch_size: int = 500,
+                 max_pending: int = 10000,
+                 submit_timeout: float = 1,
+                 ) -> None:
+        self.engine = sqlalchemy_engine
+        self.max_batch_size = max_batch_size
+        self.submit_timeout = submit_timeout
+        self._write_batch = write_batch
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        self.__failures = []  # type: list
+        self.__failures_lock = threading.Lock()
+        self.failed_batches = 0
+
+    def submit(self, item) -> None:
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._write_forever, daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put(item, timeout=self.submit_timeout)
+        except queue.Full:
+            raise self.Backlogged("{} items are already waiting to be written.".format(self._queue.maxsize))
+
+    def flush(self) -> None:
+        """Blocks until everything submitted so far has been written, or has failed to be."""
+        self._queue.join()
+        with self.__failures_lock:
+            failures, self.__failures = self.__failures, []
+        if failures:
+            raise self.WriteFailed("{} batches failed to be written; the first because: {}".format(len(failures),
+                                                                                                 failures[0]))
+
+    def _write_forever(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with ThreadedSession(self.engine) as session:
+                    self._write_batch(batch, session=session)
+            except Exception as e:
+                self.log.error("Failed to write a batch of {} items: {}".format(len(batch), e))
+                with self.__failures_lock:
+                    self.__failures.append(e)
+                    self.failed_batches += 1
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
@@ -0,0 +1,190 @@
+import asyncio
+import ssl
+
+import aiohttp
+import time
+
+from nucypher.network.middleware import CFragStreamSplitter, LatencyTracker
+from nucypher.network.storage import CertificateStore
+
+
+class AsyncResponse:
+    """
+    The parts of a response that RestMiddleware's callers use, read in full before the connection goes back to the pool.
+    """
+
+    def __init__(self, status_code: int, content: bytes, headers) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+
+class AsyncRestMiddleware:
+    """
+    RestMiddleware's requests as coroutines, all sharing one pool of connections, so that a single
+    Alice or Bob can have thousands of them in flight.  Latencies are tracked as RestMiddleware tracks
+    them, and a re-encryption that runs past its timeout raises asyncio.TimeoutError.
+
+    Use it as an async context manager, or call close() when done with it.  It needs aiohttp,
+    which comes with the 'async' extra.
+    """
+
+    def __init__(self, connection_limit: int = 1000, connection_limit_per_host: int = 0) -> None:
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.latencies = LatencyTracker()
+        self._session = None
+        self._ssl_contexts = {}  # type: dict
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit,
+                                             limit_per_host=self.connection_limit_per_host)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _ssl_context(self, certificate_filepath):
+        if not certificate_filepath:
+            return False  # As with requests' verify=False.
+        try:
+            return self._ssl_contexts[certificate_filepath]
+        except KeyError:
+            context = ssl.create_default_context(cafile=CertificateStore.written(certificate_filepath))
+            # Ursulas' certificates are named for their checksum addresses, not their hosts.
+            context.check_hostname = False
+            self._ssl_contexts[certificate_filepath] = context
+            return context
+
+    async def _request(self, method, url, certificate_filepath, data=None) -> AsyncResponse:
+        async with self._get_session().request(method, url, data=data,
+                                               ssl=self._ssl_context(certificate_filepath)) as response:
+            content = await response.read()
+            return AsyncResponse(response.status, content, response.headers)
+
+    async def _stream(self, url, certificate_filepath, data, timeout: float):
+        """POSTs data to url, and yields the response's body in chunks as they arrive."""
+        async with self._get_session().post(url, data=data, ssl=self._ssl_context(certificate_filepath),
+                                            timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if not response.status == 200:
+                raise RuntimeError("Bad response: {}".format(await response.read()))
+            async for chunk in response.content.iter_any():
+                yield chunk
+
+    async def consider_arrangement(self, arrangement):
+        node = arrangement.ursula
+        response = await self._request("POST", "https://{}/consider_arrangement".format(node.rest_interface),
+                                       node.certificate_filepath, data=bytes(arrangement))
+        if not response.status_code == 200:
+            raise RuntimeError("Bad response: {}".format(response.content))
+        return response
+
+    async def offer_arrangement_with_kfrag(self, ursula, payload):
+        return await self._request("POST", "https://{}/consider_arrangement/kFrag".format(ursula.rest_interface),
+                                   ursula.certificate_filepath, data=payload)
+
+    async def consider_arrangements(self, ursula, payload):
+        return await self._request("POST", "https://{}/consider_arrangements".format(ursula.rest_interface),
+                                   ursula.certificate_filepath, data=payload)
+
+    async def enact_policy(self, ursula, id, payload):
+        response = await self._request("POST", "https://{}/kFrag/{}".format(ursula.rest_interface, id.hex()),
+                                       ursula.certificate_filepath, data=payload)
+        if not response.status_code == 200:
+            raise RuntimeError("Bad response: {}".format(response.content))
+        return True, ursula.stamp.as_umbral_pubkey()
+
+    async def enact_policies(self, ursula, payload):
+        return await self._request("POST", "https://{}/kFrags".format(ursula.rest_interface),
+                                   ursula.certificate_filepath, data=payload)
+
+    async def revoke_arrangement(self, ursula, arrangement_id, signature):
+        response = await self._request("DELETE",
+                                       "https://{}/kFrag/{}".format(ursula.rest_interface, arrangement_id.hex()),
+                                       ursula.certificate_filepath, data=signature)
+        if not response.status_code == 200:
+            raise RuntimeError("Bad response: {}".format(response.content))
+        return response
+
+    async def reencrypt(self, work_order, timeout: float = None):
+        cfrags = []
+        async for cfrag in self.reencrypt_incrementally(work_order, timeout=timeout):
+            cfrags.append(cfrag)
+        return cfrags
+
+    async def reencrypt_incrementally(self, work_order, timeout: float = None):
+        """
+        Yields CFrags as soon as they arrive from Ursula, rather than waiting for all of them.
+
+        If Ursula hasn't sent every CFrag within timeout seconds (by default, a timeout
+        based on how quickly she's answered before), raises asyncio.TimeoutError.
+        """
+        ursula = work_order.ursula
+        node_id = ursula.checksum_public_address
+        if timeout is None:
+            timeout = self.latencies.timeout_for(node_id)
+        started = time.monotonic()
+        deadline = started + timeout
+
+        endpoint = "https://{}/kFrag/{}/reencrypt".format(ursula.rest_interface, work_order.arrangement_id.hex())
+        splitter = CFragStreamSplitter()
+        cfrags = []
+        try:
+            async for chunk in self._stream(endpoint, ursula.certificate_filepath, work_order.payload(), timeout):
+                for cfrag in splitter.feed(chunk):
+                    if time.monotonic() > deadline:
+                        raise asyncio.TimeoutError("Ursula {} took more than {}s.".format(node_id, timeout))
+                    cfrags.append(cfrag)
+                    yield cfrag
+            splitter.close()
+        except asyncio.TimeoutError:
+            self.latencies.record(node_id, timeout)  # At least this long.
+            raise
+        self.latencies.record(node_id, time.monotonic() - started)
+        work_order.complete(cfrags)  # TODO: We'll do verification of Ursula's signature here.  #141
+
+    def get_competitive_rate(self):
+        return NotImplemented
+
+    async def get_treasure_map_from_node(self, node, map_id):
+        endpoint = "https://{}/treasure_map/{}".format(node.rest_interface, map_id)
+        return await self._request("GET", endpoint, node.certificate_filepath)
+
+    async def put_treasure_map_on_node(self, node, map_id, map_payload):
+        endpoint = "https://{}/treasure_map/{}".format(node.rest_interface, map_id)
+        return await self._request("POST", endpoint, node.certificate_filepath, data=map_payload)
+
+    async def send_work_order_payload_to_ursula(self, work_order):
+        ursula = work_order.ursula
+        endpoint = "https://{}/kFrag/{}/reencrypt".format(ursula.rest_interface, work_order.arrangement_id.hex())
+        return await self._request("POST", endpoint, ursula.certificate_filepath, data=work_order.payload())
+
+    async def node_information(self, host, port, certificate_filepath=None):
+        endpoint = "https://{}:{}/public_information".format(host, port)
+        return await self._request("GET", endpoint, certificate_filepath=None)
+
+    async def get_nodes_via_rest(self,
+                                 url,
+                                 certificate_filepath,
+                                 announce_nodes=None,
+                                 nodes_i_need=None):
+        if announce_nodes:
+            payload = bytes().join(bytes(n) for n in announce_nodes)
+            return await self._request("POST", "https://{}/node_metadata".format(url),
+                                       certificate_filepath, data=payload)
+        else:
+            return await self._request("GET", "https://{}/node_metadata".format(url), certificate_filepath)
+
+    async def get_nodes_closest_to(self, node, canonical_address, certificate_filepath):
+        endpoint = "https://{}/node_metadata/closest/{}".format(node.rest_interface, canonical_address.hex())
+        return await self._request("GET", endpoint, certificate_filepath)
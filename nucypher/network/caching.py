@@ -0,0 +1,149 @@
+import threading
+from collections import OrderedDict
+
+import time
+
+
+class BoundedCache:
+    """
+    A thread-safe, least-recently-used mapping which holds at most `max_entries` entries
+    and, if `max_bytes` is given, at most that many bytes of values (as measured by `sizeof`).
+
+    Entries can also be given an expiry, either for the whole cache (`ttl`, in seconds)
+    or per entry (`expires_at`, in seconds since the epoch); expired entries are never returned.
+
+    Hits, misses, evictions and expirations are counted, so that the cache can be sized.
+
+    Given `group_of`, a function of a key, entries can be invalidated a group at a time (see invalidate_group)
+    without looking at every other entry.
+    """
+
+    def __init__(self,
+                 max_entries: int = None,
+                 max_bytes: int = None,
+                 ttl: float = None,
+                 sizeof=len,
+                 clock=time.time,
+                 group_of=None,
+                 ) -> None:
+        if max_entries is None and max_bytes is None:
+            raise ValueError("A BoundedCache needs max_entries, max_bytes, or both.")
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof = sizeof
+        self._clock = clock
+        self._group_of = group_of
+
+        self.__entries = OrderedDict()  # type: OrderedDict
+        self.__groups = dict()          # type: dict
+        self.__lock = threading.Lock()
+        self.__size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def __contains__(self, key):
+        return self.get(key, count=False) is not None
+
+    @property
+    def size(self) -> int:
+        """The total size of the cached values, as measured by sizeof."""
+        return self.__size
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def metrics(self) -> dict:
+        return dict(entries=len(self),
+                    size=self.size,
+                    hits=self.hits,
+                    misses=self.misses,
+                    hit_rate=self.hit_rate,
+                    evictions=self.evictions,
+                    expirations=self.expirations)
+
+    def get(self, key, default=None, count=True):
+        with self.__lock:
+            try:
+                value, size, expires_at = self.__entries[key]
+            except KeyError:
+                if count:
+                    self.misses += 1
+                return default
+
+            if expires_at is not None and expires_at <= self._clock():
+                self.__remove(key)
+                self.expirations += 1
+                if count:
+                    self.misses += 1
+                return default
+
+            self.__entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return value
+
+    def put(self, key, value, expires_at: float = None) -> None:
+        if self.ttl is not None:
+            ttl_expiry = self._clock() + self.ttl
+            expires_at = ttl_expiry if expires_at is None else min(expires_at, ttl_expiry)
+
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # This will never fit; don't flush everything else trying.
+
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+            self.__entries[key] = (value, size, expires_at)
+            self.__size += size
+            if self._group_of is not None:
+                self.__groups.setdefault(self._group_of(key), set()).add(key)
+
+            while (self.max_entries is not None and len(self.__entries) > self.max_entries) or \
+                    (self.max_bytes is not None and self.__size > self.max_bytes):
+                oldest_key = next(iter(self.__entries))
+                self.__remove(oldest_key)
+                self.evictions += 1
+
+    def invalidate(self, key) -> bool:
+        with self.__lock:
+            if key in self.__entries:
+                self.__remove(key)
+                return True
+            return False
+
+    def invalidate_group(self, group) -> int:
+        """Invalidates every entry whose key is in group (by group_of); returns how many there were."""
+        if self._group_of is None:
+            raise TypeError("This BoundedCache wasn't given a group_of.")
+        with self.__lock:
+            doomed_keys = list(self.__groups.get(group, ()))
+            for key in doomed_keys:
+                self.__remove(key)
+            return len(doomed_keys)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+            self.__groups.clear()
+            self.__size = 0
+
+    def __remove(self, key):
+        _value, size, _expires_at = self.__entries.pop(key)
+        self.__size -= size
+        if self._group_of is not None:
+            group = self._group_of(key)
+            keys_in_group = self.__groups[group]
+            keys_in_group.discard(key)
+            if not keys_in_group:
+                del self.__groups[group]
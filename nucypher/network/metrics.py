@@ -0,0 +1,158 @@
+import bisect
+import threading
+from contextlib import contextmanager
+
+import time
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_sample(name: str, labels: tuple, value) -> str:
+    if labels:
+        label_text = ",".join('{}="{}"'.format(label, str(label_value).replace('\\', r'\\').replace('"', r'\"'))
+                              for label, label_value in labels)
+        name = "{}{{{}}}".format(name, label_text)
+    return "{} {}".format(name, repr(float(value)))
+
+
+class Counter:
+    """A count that only goes up, kept separately for each set of labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+        self.__values = dict()  # type: dict
+        self.__lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self.__lock:
+            self.__values[key] = self.__values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self.__values.get(_label_key(labels), 0)
+
+    def samples(self):
+        for labels, value in list(self.__values.items()):
+            yield self.name, labels, value
+
+
+class Histogram:
+    """
+    Observations (durations, say, or sizes) counted into cumulative buckets, with their sum and count,
+    kept separately for each set of labels.
+    """
+
+    kind = "histogram"
+
+    DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)  # Seconds
+
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.__series = dict()  # type: dict
+        self.__lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self.__lock:
+            try:
+                bucket_counts, total = self.__series[key]
+            except KeyError:
+                bucket_counts, total = [0] * (len(self.buckets) + 1), 0
+            bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.__series[key] = (bucket_counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def count(self, **labels) -> int:
+        bucket_counts, _total = self.__series.get(_label_key(labels), ((), 0))
+        return sum(bucket_counts)
+
+    def samples(self):
+        with self.__lock:
+            series = [(labels, list(bucket_counts), total) for labels, (bucket_counts, total) in self.__series.items()]
+        for labels, bucket_counts, total in series:
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                bound = "+Inf" if upper_bound == float("inf") else repr(float(upper_bound))
+                yield self.name + "_bucket", labels + (("le", bound),), cumulative
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+
+class Collected:
+    """A metric that's kept somewhere else, and read (by calling a function for each set of labels) when asked for."""
+
+    def __init__(self, name: str, help: str, kind: str = "gauge") -> None:
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.__functions = dict()  # type: dict
+
+    def add(self, function, **labels) -> None:
+        self.__functions[_label_key(labels)] = function
+
+    def samples(self):
+        for labels, function in list(self.__functions.items()):
+            yield self.name, labels, function()
+
+
+class MetricsRegistry:
+    """
+    The metrics one Character keeps about itself, rendered in Prometheus' text format for its /metrics route.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4"
+
+    def __init__(self) -> None:
+        self.__metrics = dict()  # type: dict
+        self.__lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.__metrics
+
+    def __getitem__(self, name):
+        return self.__metrics[name]
+
+    def __register(self, metric_class, name, *args, **kwargs):
+        with self.__lock:
+            try:
+                metric = self.__metrics[name]
+            except KeyError:
+                metric = self.__metrics[name] = metric_class(name, *args, **kwargs)
+        if not isinstance(metric, metric_class):
+            raise ValueError("{} is already a {}.".format(name, type(metric).__name__))
+        return metric
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self.__register(Counter, name, help)
+
+    def histogram(self, name: str, help: str, buckets: tuple = Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self.__register(Histogram, name, help, buckets=buckets)
+
+    def collect(self, name: str, help: str, function, kind: str = "gauge", **labels) -> Collected:
+        """Reports what function returns as name (a gauge, unless kind says otherwise) with these labels."""
+        metric = self.__register(Collected, name, help, kind=kind)
+        metric.add(function, **labels)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for name, metric in sorted(self.__metrics.items()):
+            lines.append("# HELP {} {}".format(name, metric.help))
+            lines.append("# TYPE {} {}".format(name, metric.kind))
+            lines.extend(_format_sample(*sample) for sample in metric.samples())
+        return "\n".join(lines) + "\n"
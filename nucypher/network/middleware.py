@@ -1,53 +1,200 @@
-import requests
+import threading
+from collections import deque, defaultdict
 
-from bytestring_splitter import BytestringSplitter, VariableLengthBytestring
+import requests
+import time
 
 from umbral.fragments import CapsuleFrag
 
+from nucypher.network.nodes import _LENGTH_PREFIX_SIZE
+from nucypher.network.storage import CertificateStore
+
+
+class CFragStreamSplitter:
+    """
+    Splits a stream of VariableLengthBytestring'd CFrags, fed to it in chunks of any size,
+    into CFrags, each as soon as all of its bytes are in.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> list:
+        self._buffer += chunk
+        cfrags = []
+        while len(self._buffer) >= _LENGTH_PREFIX_SIZE:
+            cfrag_length = int.from_bytes(self._buffer[:_LENGTH_PREFIX_SIZE], "big")
+            end = _LENGTH_PREFIX_SIZE + cfrag_length
+            if len(self._buffer) < end:
+                break
+            cfrags.append(CapsuleFrag.from_bytes(bytes(self._buffer[_LENGTH_PREFIX_SIZE:end])))
+            del self._buffer[:end]
+        return cfrags
+
+    def close(self) -> None:
+        if self._buffer:
+            raise ValueError("The CFrag stream ended partway through a CFrag.")
+
+
+def split_cfrags_incrementally(chunks):
+    splitter = CFragStreamSplitter()
+    for chunk in chunks:
+        yield from splitter.feed(chunk)
+    splitter.close()
+
+
+class LatencyTracker:
+    """
+    The latencies of recent requests to each node, from which to set each node's timeouts,
+    and to decide when a node is slow enough that it's worth asking another.
+    """
+
+    def __init__(self,
+                 window: int = 100,
+                 min_samples: int = 5,
+                 default_timeout: float = 30.0,
+                 default_hedge_delay: float = 2.0,
+                 min_timeout: float = 1.0,
+                 timeout_multiplier: float = 3.0,
+                 ) -> None:
+        self.min_samples = min_samples
+        self.default_timeout = default_timeout
+        self.default_hedge_delay = default_hedge_delay
+        self.min_timeout = min_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self._latencies = defaultdict(lambda: deque(maxlen=window))  # type: defaultdict
+        self._lock = threading.Lock()
+
+    def record(self, node_id, seconds: float) -> None:
+        with self._lock:
+            self._latencies[node_id].append(seconds)
+
+    def percentile(self, node_id, percent: float, default: float = None) -> float:
+        """
+        The given percentile of node_id's recent latencies, or default if we haven't seen enough of them.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(node_id, ()))
+        if len(latencies) < self.min_samples:
+            return default
+        index = min(len(latencies) - 1, int(len(latencies) * percent / 100))
+        return latencies[index]
+
+    def samples(self) -> dict:
+        """Each node's recent latencies, oldest first."""
+        with self._lock:
+            return {node_id: list(latencies) for node_id, latencies in self._latencies.items()}
+
+    def restore(self, samples: dict) -> None:
+        """Records latencies (as from samples()) seen before now, eg, by an earlier run of this process."""
+        with self._lock:
+            for node_id, latencies in samples.items():
+                self._latencies[node_id].extend(latencies)
+
+    def timeout_for(self, node_id) -> float:
+        p99 = self.percentile(node_id, 99)
+        if p99 is None:
+            return self.default_timeout
+        return min(self.default_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
+
 
 class RestMiddleware:
 
+    def __init__(self) -> None:
+        self.latencies = LatencyTracker()
+
     def consider_arrangement(self, arrangement):
         node = arrangement.ursula
         response = requests.post("https://{}/consider_arrangement".format(node.rest_interface),
                                  bytes(arrangement),
-                                 verify=node.certificate_filepath)
+                                 verify=CertificateStore.written(node.certificate_filepath))
 
         if not response.status_code == 200:
             raise RuntimeError("Bad response: {}".format(response.content))
         return response
 
+    def offer_arrangement_with_kfrag(self, ursula, payload):
+        response = requests.post("https://{}/consider_arrangement/kFrag".format(ursula.rest_interface),
+                                 payload,
+                                 verify=CertificateStore.written(ursula.certificate_filepath))
+        return response
+
+    def consider_arrangements(self, ursula, payload):
+        return requests.post("https://{}/consider_arrangements".format(ursula.rest_interface),
+                             payload,
+                             verify=CertificateStore.written(ursula.certificate_filepath))
+
     def enact_policy(self, ursula, id, payload):
         response = requests.post('https://{}/kFrag/{}'.format(ursula.rest_interface, id.hex()), payload,
-                                 verify=ursula.certificate_filepath)
+                                 verify=CertificateStore.written(ursula.certificate_filepath))
         if not response.status_code == 200:
             raise RuntimeError("Bad response: {}".format(response.content))
         return True, ursula.stamp.as_umbral_pubkey()
 
-    def reencrypt(self, work_order):
-        ursula_rest_response = self.send_work_order_payload_to_ursula(work_order)
-        cfrags = BytestringSplitter((CapsuleFrag, VariableLengthBytestring)).repeat(ursula_rest_response.content)
+    def enact_policies(self, ursula, payload):
+        return requests.post('https://{}/kFrags'.format(ursula.rest_interface), payload,
+                             verify=CertificateStore.written(ursula.certificate_filepath))
+
+    def revoke_arrangement(self, ursula, arrangement_id, signature):
+        response = requests.delete('https://{}/kFrag/{}'.format(ursula.rest_interface, arrangement_id.hex()),
+                                   data=signature,
+                                   verify=CertificateStore.written(ursula.certificate_filepath))
+        if not response.status_code == 200:
+            raise RuntimeError("Bad response: {}".format(response.content))
+        return response
+
+    def reencrypt(self, work_order, timeout: float = None):
+        return list(self.reencrypt_incrementally(work_order, timeout=timeout))
+
+    def reencrypt_incrementally(self, work_order, timeout: float = None):
+        """
+        Yields CFrags as soon as they arrive from Ursula, rather than waiting for all of them.
+
+        If Ursula hasn't sent every CFrag within timeout seconds (by default, a timeout
+        based on how quickly she's answered before), raises requests.exceptions.Timeout.
+        """
+        node_id = work_order.ursula.checksum_public_address
+        if timeout is None:
+            timeout = self.latencies.timeout_for(node_id)
+        started = time.monotonic()
+        deadline = started + timeout
+
+        try:
+            ursula_rest_response = self.send_work_order_payload_to_ursula(work_order, stream=True, timeout=timeout)
+            if not ursula_rest_response.status_code == 200:
+                raise RuntimeError("Bad response: {}".format(ursula_rest_response.content))
+
+            cfrags = []
+            for cfrag in split_cfrags_incrementally(ursula_rest_response.iter_content(chunk_size=None)):
+                if time.monotonic() > deadline:
+                    raise requests.exceptions.Timeout("Ursula {} took more than {}s.".format(node_id, timeout))
+                cfrags.append(cfrag)
+                yield cfrag
+        except requests.exceptions.Timeout:
+            self.latencies.record(node_id, timeout)  # At least this long.
+            raise
+        self.latencies.record(node_id, time.monotonic() - started)
         work_order.complete(cfrags)  # TODO: We'll do verification of Ursula's signature here.  #141
-        return cfrags
 
     def get_competitive_rate(self):
         return NotImplemented
 
     def get_treasure_map_from_node(self, node, map_id):
         endpoint = "https://{}/treasure_map/{}".format(node.rest_interface, map_id)
-        response = requests.get(endpoint, verify=node.certificate_filepath)
+        response = requests.get(endpoint, verify=CertificateStore.written(node.certificate_filepath))
         return response
 
     def put_treasure_map_on_node(self, node, map_id, map_payload):
         endpoint = "https://{}/treasure_map/{}".format(node.rest_interface, map_id)
-        response = requests.post(endpoint, data=map_payload, verify=node.certificate_filepath)
+        response = requests.post(endpoint, data=map_payload, verify=CertificateStore.written(node.certificate_filepath))
         return response
 
-    def send_work_order_payload_to_ursula(self, work_order):
+    def send_work_order_payload_to_ursula(self, work_order, stream=False, timeout=None):
         payload = work_order.payload()
         id_as_hex = work_order.arrangement_id.hex()
         endpoint = 'https://{}/kFrag/{}/reencrypt'.format(work_order.ursula.rest_interface, id_as_hex)
-        return requests.post(endpoint, payload, verify=work_order.ursula.certificate_filepath)
+        return requests.post(endpoint, payload, verify=CertificateStore.written(work_order.ursula.certificate_filepath),
+                             stream=stream, timeout=timeout)
 
     def node_information(self, host, port, certificate_filepath=None):
         endpoint = "https://{}:{}/public_information".format(host, port)
@@ -67,9 +214,13 @@ class RestMiddleware:
         if announce_nodes:
             payload = bytes().join(bytes(n) for n in announce_nodes)
             response = requests.post("https://{}/node_metadata".format(url),
-                                     verify=certificate_filepath,
+                                     verify=CertificateStore.written(certificate_filepath),
                                      data=payload)
         else:
             response = requests.get("https://{}/node_metadata".format(url),
-                                    verify=certificate_filepath)
+                                    verify=CertificateStore.written(certificate_filepath))
         return response
+
+    def get_nodes_closest_to(self, node, canonical_address, certificate_filepath):
+        endpoint = "https://{}/node_metadata/closest/{}".format(node.rest_interface, canonical_address.hex())
+        return requests.get(endpoint, verify=CertificateStore.written(certificate_filepath))
@@ -1,14 +1,23 @@
 import os
+import threading
+import weakref
+from collections.abc import Mapping
 
-import OpenSSL
+from bytestring_splitter import VariableLengthBytestring
 from constant_sorrow import constants
-from cryptography.x509 import Certificate
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509 import Certificate, load_pem_x509_certificate
 from eth_keys.datatypes import Signature as EthSignature
+from eth_utils import to_checksum_address
+from umbral.signing import Signature
 
-from nucypher.crypto.api import _save_tls_certificate
+from nucypher.crypto.constants import PUBLIC_ADDRESS_LENGTH, PUBLIC_KEY_LENGTH
 from nucypher.crypto.powers import BlockchainPower, SigningPower, EncryptingPower, NoSigningPower
-from nucypher.network.protocols import SuspiciousActivity
+from nucypher.network.caching import BoundedCache
+from nucypher.network.protocols import SuspiciousActivity, InterfaceInfo
 from nucypher.network.server import TLSHostingPower
+from nucypher.network.storage import CertificateStore
 from nucypher.utilities.sandbox.constants import TEST_URSULA_INSECURE_DEVELOPMENT_PASSWORD
 
 
@@ -18,6 +27,7 @@ class VerifiableNode:
     verified_stamp = False
     verified_interface = False
     _verified_node = False
+    _node_record = None  # The NodeRecord a Learner keeps of this node, if any, kept up to date as we verify it.
 
     def __init__(self,
                  certificate: Certificate,
@@ -62,6 +72,7 @@ class VerifiableNode:
         signature = self._evidence_of_decentralized_identity
         if self._stamp_has_valid_wallet_signature():
             self.verified_stamp = True
+            self._update_record()
             return True
         elif self.federated_only and signature is constants.NOT_SIGNED:
             message = "This node can't be verified in this manner, " \
@@ -78,6 +89,7 @@ class VerifiableNode:
         message = self._signable_interface_info_message()  # Contains canonical address.
         interface_is_valid = self._interface_signature.verify(message, self.public_keys(SigningPower))
         self.verified_interface = interface_is_valid
+        self._update_record()
         if interface_is_valid:
             return True
         else:
@@ -132,6 +144,13 @@ class VerifiableNode:
                 self.log.warning("Verifying key swapped out.  It appears that someone is impersonating this node.")
             raise self.InvalidNode("Wrong cryptographic material for this node - something fishy going on.")
 
+        self._verified_node = True
+        self._update_record()
+
+    def _update_record(self):
+        if self._node_record is not None:
+            self._node_record.update_from(self)
+
     def substantiate_stamp(self):
         blockchain_power = self._crypto_power.power_ups(BlockchainPower)
         blockchain_power.unlock_account(password=TEST_URSULA_INSECURE_DEVELOPMENT_PASSWORD)  # TODO: 349
@@ -157,26 +176,263 @@ class VerifiableNode:
 
     @property
     def common_name(self):
-        x509 = OpenSSL.crypto.X509.from_cryptography(self.certificate)
-        subject_components = x509.get_subject().get_components()
-        common_name_as_bytes = subject_components[0][1]
-        common_name_from_cert = common_name_as_bytes.decode()
-        return common_name_from_cert
+        return CertificateStore.common_name(self.certificate)
 
     @property
     def certificate_filename(self):
         return self.common_name + '.pem'  # TODO: use cert encoding..?
 
     def save_certificate_to_disk(self, directory):
-        x509 = OpenSSL.crypto.X509.from_cryptography(self.certificate)
-        subject_components = x509.get_subject().get_components()
-        common_name_as_bytes = subject_components[0][1]
-        common_name_from_cert = common_name_as_bytes.decode()
-
+        common_name_from_cert = self.common_name
         if not self.checksum_public_address == common_name_from_cert:
             # TODO: It's better for us to have checked this a while ago so that this situation is impossible.  #443
             raise ValueError("You passed a common_name that is not the same one as the cert.  Why?  FWIW, You don't even need to pass a common name here; the cert will be saved according to the name on the cert itself.")
 
-        certificate_filepath = os.path.join(directory, self.certificate_filename)
-        _save_tls_certificate(self.certificate, full_filepath=certificate_filepath)
-        self.certificate_filepath = certificate_filepath
\ No newline at end of file
+        certificate_filepath = CertificateStore.for_directory(directory).save(self.certificate,
+                                                                               common_name=common_name_from_cert)
+        self.certificate_filepath = certificate_filepath
+        self._update_record()
+
+
+_TIMESTAMP_LENGTH = 4
+_LENGTH_PREFIX_SIZE = len(bytes(VariableLengthBytestring(b"")))
+
+
+def _variable_length_span(data: bytes, position: int) -> tuple:
+    start = position + _LENGTH_PREFIX_SIZE
+    end = start + int.from_bytes(data[position:start], "big")
+    if end > len(data):
+        raise ValueError("Not enough bytes for a {}-byte VariableLengthBytestring.".format(end - start))
+    return start, end
+
+
+def _saved_certificate_filepath(node):
+    """node's certificate_filepath, or None if its certificate hasn't been saved (or there's no telling where)."""
+    certificate_filepath = node.certificate_filepath
+    if certificate_filepath is constants.CERTIFICATE_NOT_SAVED:
+        return None
+    return certificate_filepath
+
+
+class NodeRecord:
+    """
+    What we keep about a node we know of: its serialized metadata, with the fields we look at
+    often pulled out as plain bytes and strings, and its certificate parsed only when asked for.
+
+    A small fraction of the size of a stranger Ursula, which is built from it (by as_node)
+    only when we're actually going to talk to the node.
+    """
+
+    __slots__ = ('checksum_public_address',
+                 'canonical_public_address',
+                 'verifying_key',
+                 'encrypting_key',
+                 'rest_host',
+                 'rest_port',
+                 'federated_only',
+                 'certificate_filepath',
+                 'verified_stamp',
+                 'verified_interface',
+                 'verified_node',
+                 '_metadata',
+                 '_certificate_span',
+                 '_certificate')
+
+    def __init__(self,
+                 metadata: bytes,
+                 checksum_public_address: str,
+                 canonical_public_address: bytes,
+                 verifying_key: bytes,
+                 encrypting_key: bytes,
+                 rest_host: str,
+                 rest_port: int,
+                 certificate_span: tuple,
+                 federated_only: bool,
+                 certificate_filepath: str = None,
+                 verified_stamp: bool = False,
+                 verified_interface: bool = False,
+                 verified_node: bool = False,
+                 ) -> None:
+
+        self._metadata = metadata
+        self.checksum_public_address = checksum_public_address
+        self.canonical_public_address = canonical_public_address
+        self.verifying_key = verifying_key
+        self.encrypting_key = encrypting_key
+        self.rest_host = rest_host
+        self.rest_port = rest_port
+        self._certificate_span = certificate_span
+        self._certificate = None
+        self.federated_only = federated_only
+        self.certificate_filepath = certificate_filepath
+        self.verified_stamp = verified_stamp
+        self.verified_interface = verified_interface
+        self.verified_node = verified_node
+
+    @classmethod
+    def from_node(cls, node) -> 'NodeRecord':
+        metadata = bytes(node)
+        certificate_bytes = node.certificate.public_bytes(Encoding.PEM)
+        certificate_start = metadata.index(certificate_bytes)
+        rest_interface = node.rest_information()[0]
+
+        return cls(metadata=metadata,
+                   checksum_public_address=node.checksum_public_address,
+                   canonical_public_address=node.canonical_public_address,
+                   verifying_key=bytes(node.public_keys(SigningPower)),
+                   encrypting_key=bytes(node.public_keys(EncryptingPower)),
+                   rest_host=rest_interface.host,
+                   rest_port=rest_interface.port,
+                   certificate_span=(certificate_start, certificate_start + len(certificate_bytes)),
+                   federated_only=node.federated_only,
+                   certificate_filepath=_saved_certificate_filepath(node),
+                   verified_stamp=node.verified_stamp,
+                   verified_interface=node.verified_interface,
+                   verified_node=node._verified_node)
+
+    @classmethod
+    def from_bytes(cls, metadata: bytes, federated_only: bool = False) -> 'NodeRecord':
+        """
+        Reads a node's metadata (as serialized by Ursula) without parsing its keys or certificate,
+        which is left to as_node - and so without checking any of it, either.
+        """
+        position = _TIMESTAMP_LENGTH + Signature.expected_bytes_length()
+        _evidence_start, position = _variable_length_span(metadata, position)
+
+        verifying_key = metadata[position:position + PUBLIC_KEY_LENGTH]
+        position += PUBLIC_KEY_LENGTH
+        encrypting_key = metadata[position:position + PUBLIC_KEY_LENGTH]
+        position += PUBLIC_KEY_LENGTH
+        canonical_address = metadata[position:position + PUBLIC_ADDRESS_LENGTH]
+        position += PUBLIC_ADDRESS_LENGTH
+
+        certificate_span = _variable_length_span(metadata, position)
+        interface_start, interface_end = _variable_length_span(metadata, certificate_span[1])
+        if interface_end != len(metadata):
+            raise ValueError("{} extra bytes after this node's metadata.".format(len(metadata) - interface_end))
+        rest_interface = InterfaceInfo.from_bytes(metadata[interface_start:interface_end])
+
+        return cls(metadata=metadata,
+                   checksum_public_address=to_checksum_address(canonical_address),
+                   canonical_public_address=canonical_address,
+                   verifying_key=verifying_key,
+                   encrypting_key=encrypting_key,
+                   rest_host=rest_interface.host,
+                   rest_port=rest_interface.port,
+                   certificate_span=certificate_span,
+                   federated_only=federated_only)
+
+    def __bytes__(self):
+        return self._metadata
+
+    def __repr__(self):
+        return "{} {}".format(self.__class__.__name__, self.checksum_public_address)
+
+    @property
+    def rest_interface(self):
+        return "{}:{}".format(self.rest_host, self.rest_port)
+
+    def rest_information(self):
+        return (InterfaceInfo(self.rest_host, self.rest_port),)
+
+    @property
+    def certificate(self) -> Certificate:
+        if self._certificate is None:
+            start, end = self._certificate_span
+            self._certificate = load_pem_x509_certificate(self._metadata[start:end], default_backend())
+        return self._certificate
+
+    def as_node(self):
+        """
+        Builds the stranger Ursula that this is a record of, as verified as she was when we recorded her.
+        """
+        from nucypher.characters.lawful import Ursula  # Avoid circular import
+        node = Ursula.from_bytes(self._metadata, federated_only=self.federated_only)
+        if self.certificate_filepath is not None:
+            node.certificate_filepath = self.certificate_filepath
+        node.verified_stamp = self.verified_stamp
+        node.verified_interface = self.verified_interface
+        node._verified_node = self.verified_node
+        return node
+
+    def update_from(self, node) -> None:
+        """Brings this record up to date with what's happened to node since (eg, being verified)."""
+        certificate_filepath = _saved_certificate_filepath(node)
+        if certificate_filepath is not None:
+            self.certificate_filepath = certificate_filepath
+        self.verified_stamp = node.verified_stamp
+        self.verified_interface = node.verified_interface
+        self.verified_node = node._verified_node
+
+
+class KnownNodes(Mapping):
+    """
+    The nodes a Learner knows about, by checksum address, stored as NodeRecords.
+
+    Looking a node up builds it from its record - or, if somebody is still holding
+    the node from last time (or the one that was remembered), hands that one back.
+    The `max_recent_nodes` most recently looked up are held on to, so that they aren't built again
+    each time.  Whatever a node learns about itself (being verified, say) is written back to its record.
+    """
+
+    MAX_RECENT_NODES = 1000
+
+    def __init__(self, max_recent_nodes: int = MAX_RECENT_NODES) -> None:
+        self.__records = dict()
+        self.__nodes = weakref.WeakValueDictionary()
+        self.__recent_nodes = BoundedCache(max_entries=max_recent_nodes)
+        self.__lock = threading.Lock()
+
+    def __getitem__(self, checksum_address):
+        record = self.__records[checksum_address]
+        node = self.__nodes.get(checksum_address)
+        if node is None:
+            node = record.as_node()
+            node._node_record = record
+            node = self.__nodes.setdefault(checksum_address, node)
+        self.__recent_nodes.put(checksum_address, node)
+        return node
+
+    def __contains__(self, checksum_address):
+        return checksum_address in self.__records
+
+    def __iter__(self):
+        return iter(list(self.__records))
+
+    def __len__(self):
+        return len(self.__records)
+
+    def add(self, node) -> NodeRecord:
+        """
+        Records node (an Ursula or a NodeRecord), replacing whatever we had for its address; returns the record.
+        """
+        if isinstance(node, NodeRecord):
+            record = node
+        else:
+            record = NodeRecord.from_node(node)
+
+        with self.__lock:
+            self.__records[record.checksum_public_address] = record
+            self.__recent_nodes.invalidate(record.checksum_public_address)
+            if record is node:
+                self.__nodes.pop(record.checksum_public_address, None)
+            else:
+                node._node_record = record
+                self.__nodes[record.checksum_public_address] = node
+        return record
+
+    def refresh_records(self) -> None:
+        """
+        Brings records up to date with what's happened to their nodes since (eg, being verified).
+        """
+        for checksum_address, node in list(self.__nodes.items()):
+            record = self.__records.get(checksum_address)
+            if record is None or record is node:
+                continue
+            record.update_from(node)
+
+    def record(self, checksum_address) -> NodeRecord:
+        return self.__records[checksum_address]
+
+    def records(self) -> list:
+        return list(self.__records.values())
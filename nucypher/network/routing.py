@@ -1,3 +1,5 @@
+import threading
+
 from kademlia.routing import RoutingTable
 
 
@@ -10,3 +12,76 @@ class NucypherRoutingTable(RoutingTable):
             return super().addContact(node)
         else:
             return super().addContact(node)
+
+
+class NodeRoutingIndex:
+    """
+    Known nodes, by canonical address, in Kademlia-style buckets: bucket i holds the nodes whose
+    XOR distance from the origin address is exactly i bits long.
+
+    Since the XOR distance from any target to the nodes in a bucket is bounded by that bucket's,
+    the nodes closest to a target can be found by visiting the buckets in order of distance
+    rather than by sorting every node we know about.
+    """
+
+    ADDRESS_LENGTH = 20  # Bytes, as with canonical Ethereum addresses.
+
+    def __init__(self, origin: bytes = None) -> None:
+        self.origin = origin or bytes(self.ADDRESS_LENGTH)
+        self._origin_as_int = int.from_bytes(self.origin, byteorder="big")
+        self._buckets = [dict() for _ in range(self.ADDRESS_LENGTH * 8 + 1)]
+        self._lock = threading.Lock()
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, address):
+        return address in self._buckets[self._bucket_index(address)]
+
+    @staticmethod
+    def distance(address: bytes, other_address: bytes) -> int:
+        return int.from_bytes(address, byteorder="big") ^ int.from_bytes(other_address, byteorder="big")
+
+    def _bucket_index(self, address: bytes) -> int:
+        return (int.from_bytes(address, byteorder="big") ^ self._origin_as_int).bit_length()
+
+    def add(self, address: bytes, node) -> None:
+        with self._lock:
+            bucket = self._buckets[self._bucket_index(address)]
+            if address not in bucket:
+                self._size += 1
+            bucket[address] = node
+
+    def remove(self, address: bytes) -> bool:
+        with self._lock:
+            try:
+                del self._buckets[self._bucket_index(address)][address]
+            except KeyError:
+                return False
+            self._size -= 1
+            return True
+
+    def closest(self, target: bytes, count: int) -> list:
+        """
+        The (up to) count nodes whose addresses are nearest to target, nearest first.
+        """
+        target_bucket = self._bucket_index(target)
+
+        # Nodes in the target's own bucket are nearer to it than any others; all of the nearer buckets
+        # are then equally far (one bit, target_bucket, apart); after that, each further bucket is further.
+        groups = [(target_bucket,), range(target_bucket)]
+        groups.extend((index,) for index in range(target_bucket + 1, len(self._buckets)))
+
+        found = []
+        with self._lock:
+            for group in groups:
+                found.extend(self.__sorted_by_distance(target, group))
+                if len(found) >= count:
+                    break
+        return found[:count]
+
+    def __sorted_by_distance(self, target, bucket_indices):
+        entries = [entry for index in bucket_indices for entry in self._buckets[index].items()]
+        entries.sort(key=lambda entry: self.distance(target, entry[0]))
+        return [node for _address, node in entries]
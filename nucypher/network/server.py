@@ -1,20 +1,39 @@
 import binascii
+import calendar
+import operator
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
 
+import maya
 from apistar import Route, App
 from apistar.http import Response, Request, QueryParams
-from bytestring_splitter import VariableLengthBytestring
+from apistar.server.wsgi import WSGIEnviron
+from bytestring_splitter import BytestringSplitter, VariableLengthBytestring
 from constant_sorrow import constants
-from hendrix.experience import crosstown_traffic
+from cryptography.exceptions import InternalError
 from kademlia.utils import digest
+from sqlalchemy.exc import IntegrityError
+from twisted.internet import reactor
 from umbral import pre
 from umbral.fragments import KFrag
+from umbral.keys import UmbralPublicKey
 
+from nucypher.crypto.api import keccak_digest
 from nucypher.crypto.kits import UmbralMessageKit
 from nucypher.crypto.powers import SigningPower, KeyPairBasedPower, PowerUpError
+from nucypher.crypto.signing import Signature, signature_splitter
+from nucypher.crypto.splitters import key_splitter
 from nucypher.keystore.keypairs import HostingKeypair
-from nucypher.keystore.threading import ThreadedSession
+from nucypher.keystore.keystore import NotFound
+from nucypher.keystore.threading import ThreadedSession, ThreadedBatchWriter
+from nucypher.network.caching import BoundedCache
+from nucypher.network.metrics import MetricsRegistry
 from nucypher.network.protocols import InterfaceInfo
+from nucypher.network.routing import NodeRoutingIndex
+from nucypher.network.throttling import AdmissionControl
+from nucypher.network.verification import NodeVerificationQueue
 
 
 class ProxyRESTServer:
@@ -39,6 +58,23 @@ class ProxyRESTServer:
 class ProxyRESTRoutes:
     log = getLogger("characters")
 
+    KFRAG_CACHE_SIZE = 10000
+    KFRAG_CACHE_TTL = 60 * 60  # Seconds
+    CFRAG_CACHE_BYTES = 16 * 1024 * 1024
+
+    _reencryption_path = re.compile(r"^/kFrag/(?P<id_as_hex>[0-9a-fA-F]+)/reencrypt$")
+
+    # What parsing a malformed request body raises, somewhere between the splitters, Umbral and maya.
+    _MALFORMED_REQUEST_ERRORS = (ValueError, TypeError, InternalError)
+
+    # Which of AdmissionControl's limits apply to which requests, by path.
+    _rate_limited_paths = (
+        (_reencryption_path, 'reencrypt'),
+        (re.compile(r"^/node_metadata(/|$)"), 'node_metadata'),
+        (re.compile(r"^/treasure_map/"), 'treasure_map'),
+        (re.compile(r"^/consider_arrangements?(/|$)"), 'consider_arrangement'),
+    )
+
     def __init__(self,
                  db_name,
                  db_filepath,
@@ -47,19 +83,25 @@ class ProxyRESTRoutes:
                  treasure_map_tracker,
                  node_tracker,
                  node_bytes_caster,
-                 work_order_tracker,
                  node_recorder,
                  stamp,
                  verifier,
                  suspicious_activity_tracker,
                  certificate_dir,
+                 node_finder=None,
+                 kfrag_cache_size: int = KFRAG_CACHE_SIZE,
+                 kfrag_cache_ttl: float = KFRAG_CACHE_TTL,
+                 cfrag_cache_bytes: int = CFRAG_CACHE_BYTES,
+                 max_concurrent_verifications: int = NodeVerificationQueue.MAX_CONCURRENT,
+                 max_pending_verifications: int = NodeVerificationQueue.MAX_PENDING,
+                 rate_limits: dict = None,
+                 metrics: MetricsRegistry = None,
                  ) -> None:
 
         self.network_middleware = network_middleware
         self.federated_only = federated_only
 
         self._treasure_map_tracker = treasure_map_tracker
-        self._work_order_tracker = work_order_tracker
         self._node_tracker = node_tracker
         self._node_bytes_caster = node_bytes_caster
         self._node_recorder = node_recorder
@@ -67,12 +109,40 @@ class ProxyRESTRoutes:
         self._verifier = verifier
         self._suspicious_activity_tracker = suspicious_activity_tracker
         self._certificate_dir = certificate_dir
+        self._node_finder = node_finder
         self.datastore = None
 
+        # Parsed KFrags, by arrangement id as hex, so that hot policies skip the datastore and KFrag.from_bytes.
+        self.kfrag_cache = BoundedCache(max_entries=kfrag_cache_size, ttl=kfrag_cache_ttl)
+
+        # CFrags we've already made, by (arrangement id as hex, capsule digest), so that retried and
+        # duplicated WorkOrders cost a lookup rather than a re-encryption.  Pass cfrag_cache_bytes=0 to disable.
+        if cfrag_cache_bytes:
+            self.cfrag_cache = BoundedCache(max_bytes=cfrag_cache_bytes, group_of=operator.itemgetter(0))
+        else:
+            self.cfrag_cache = None
+
+        # Nodes announced to us via node_metadata_exchange, which we verify (by calling them back) in the background.
+        self.node_verification_queue = NodeVerificationQueue(verifier=self._learn_about_announced_node,
+                                                             max_concurrent=max_concurrent_verifications,
+                                                             max_pending=max_pending_verifications)
+
+        # Per-client (and, for WorkOrders, per-Bob) limits on how much we'll do; see AdmissionControl.DEFAULT_LIMITS.
+        self.admission_control = AdmissionControl(limits=rate_limits)
+
+        self.metrics = metrics or MetricsRegistry()
+        self.__register_metrics()
+
         routes = [
             Route('/kFrag/{id_as_hex}',
                   'POST',
                   self.set_policy),
+            Route('/kFrag/{id_as_hex}',
+                  'DELETE',
+                  self.revoke_arrangement),
+            Route('/kFrags',
+                  'POST',
+                  self.set_policies),
             Route('/kFrag/{id_as_hex}/reencrypt',
                   'POST',
                   self.reencrypt_via_rest),
@@ -82,35 +152,115 @@ class ProxyRESTRoutes:
                   self.all_known_nodes),
             Route('/node_metadata', 'POST',
                   self.node_metadata_exchange),
+            Route('/node_metadata/closest/{address_as_hex}', 'GET',
+                  self.nodes_closest_to),
             Route('/consider_arrangement',
                   'POST',
                   self.consider_arrangement),
+            Route('/consider_arrangement/kFrag',
+                  'POST',
+                  self.consider_arrangement_with_kfrag),
+            Route('/consider_arrangements',
+                  'POST',
+                  self.consider_arrangements),
             Route('/treasure_map/{treasure_map_id}',
                   'GET',
                   self.provide_treasure_map),
             Route('/treasure_map/{treasure_map_id}',
                   'POST',
                   self.receive_treasure_map),
+            Route('/metrics', 'GET',
+                  self.provide_metrics),
         ]
 
-        self.rest_app = App(routes=routes)
+        # To label per-route metrics with the route a request was for, rather than with its path.
+        self._route_patterns = [(re.compile("^{}$".format(re.sub(r"\{\w+\}", "[^/]+", route.url))),
+                                 route.method,
+                                 route.url)
+                                for route in routes]
+
+        self._apistar_app = App(routes=routes)
+        self.rest_app = self._streaming_rest_app
         self.db_name = db_name
         self.db_filepath = db_filepath
 
         from nucypher.keystore import keystore
-        from nucypher.keystore.db import Base
+        from nucypher.keystore.db import create_or_migrate_schema
+        from sqlalchemy import event
         from sqlalchemy.engine import create_engine
 
         self.log.info("Starting datastore {}".format(self.db_filepath))
         engine = create_engine('sqlite:///{}'.format(self.db_filepath))
-        Base.metadata.create_all(engine)
+        create_or_migrate_schema(engine)
         self.datastore = keystore.KeyStore(engine)
         self.db_engine = engine
+        event.listen(engine, "before_cursor_execute", self._start_query_timer)
+        event.listen(engine, "after_cursor_execute", self._observe_query_time)
+        self.work_order_writer = ThreadedBatchWriter(engine, self.datastore.add_workorders)
+        self._reencryption_pool = ThreadPoolExecutor(thread_name_prefix="reencryption")
+        self._kfrag_pool = ThreadPoolExecutor(thread_name_prefix="kfrags")
+        reactor.addSystemEventTrigger("before", "shutdown", self.shutdown)
 
         from nucypher.characters.lawful import Alice, Ursula
         self._alice_class = Alice
         self._node_class = Ursula
 
+    def shutdown(self) -> None:
+        """Lets our worker pools finish what they're doing, and stops their threads; called at reactor shutdown."""
+        self._reencryption_pool.shutdown(wait=True)
+        self._kfrag_pool.shutdown(wait=True)
+
+    def __register_metrics(self) -> None:
+        metrics = self.metrics
+        self._reencryptions = metrics.counter("nucypher_reencryptions_total",
+                                              "Capsules re-encrypted (not counting those answered from the CFrag cache).")
+        self._work_order_size = metrics.histogram("nucypher_work_order_capsules",
+                                                  "Capsules in each WorkOrder.",
+                                                  buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000))
+        self._request_duration = metrics.histogram("nucypher_http_request_seconds",
+                                                   "How long each REST request took, by route.")
+        self._responses = metrics.counter("nucypher_http_responses_total", "REST responses, by route and status.")
+        self._query_duration = metrics.histogram("nucypher_datastore_query_seconds",
+                                                 "How long each datastore query took, by kind of statement.")
+
+        metrics.collect("nucypher_treasure_maps", "TreasureMaps stored.", lambda: len(self._treasure_map_tracker))
+
+        for cache_name, cache in (("kfrag", self.kfrag_cache), ("cfrag", self.cfrag_cache)):
+            if cache is None:
+                continue
+            metrics.collect("nucypher_cache_hit_rate", "Hits per lookup.", lambda c=cache: c.hit_rate, cache=cache_name)
+            metrics.collect("nucypher_cache_entries", "Entries cached.", lambda c=cache: len(c), cache=cache_name)
+            metrics.collect("nucypher_cache_bytes", "Bytes cached.", lambda c=cache: c.size, cache=cache_name)
+            for stat in ("hits", "misses", "evictions", "expirations"):
+                metrics.collect("nucypher_cache_{}_total".format(stat), "Cache {}.".format(stat),
+                                lambda c=cache, s=stat: getattr(c, s), kind="counter", cache=cache_name)
+
+        for route in self.admission_control.rejections:
+            metrics.collect("nucypher_rate_limited_requests_total", "Requests turned away with a 429, by route.",
+                            lambda r=route: self.admission_control.rejections.get(r, 0), kind="counter", route=route)
+
+        verification_queue = self.node_verification_queue
+        metrics.collect("nucypher_node_verifications_pending", "Announced nodes waiting to be verified.",
+                        lambda: len(verification_queue))
+        metrics.collect("nucypher_node_verifications_throttled_total", "Announced nodes dropped as over their "
+                        "announcer's limit.", lambda: verification_queue.throttled, kind="counter")
+
+    def _start_query_timer(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.monotonic())
+
+    def _observe_query_time(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['query_started'].pop()
+        self._query_duration.observe(time.monotonic() - started, statement=statement.split(None, 1)[0].upper())
+
+    def _route_label(self, path: str, method: str) -> str:
+        for path_pattern, route_method, route_url in self._route_patterns:
+            if route_method == method and path_pattern.match(path):
+                return route_url
+        return "unmatched"
+
+    def provide_metrics(self):
+        return Response(content=self.metrics.render().encode(), headers={'Content-Type': MetricsRegistry.CONTENT_TYPE})
+
     def public_information(self):
         """
         REST endpoint for public keys and address..
@@ -124,40 +274,63 @@ class ProxyRESTRoutes:
 
     def all_known_nodes(self, request: Request):
         headers = {'Content-Type': 'application/octet-stream'}
-        ursulas_as_bytes = bytes().join(bytes(n) for n in self._node_tracker.values())
+        ursulas_as_bytes = bytes().join(bytes(n) for n in self._node_tracker.records())
         ursulas_as_bytes += self._node_bytes_caster()
         signature = self._stamp(ursulas_as_bytes)
         return Response(bytes(signature) + ursulas_as_bytes, headers=headers)
 
-    def node_metadata_exchange(self, request: Request, query_params: QueryParams):
+    def nodes_closest_to(self, address_as_hex):
+        """
+        Like all_known_nodes, but only the ones nearest (by XOR distance) to the given canonical address.
+        """
+        if self._node_finder is None:
+            return Response(b"This node doesn't look up nodes by address.", status_code=404)
+        try:
+            canonical_address = binascii.unhexlify(address_as_hex)
+        except binascii.Error:
+            return Response(status_code=400)
+        if len(canonical_address) != NodeRoutingIndex.ADDRESS_LENGTH:
+            return Response(status_code=400)
+
+        headers = {'Content-Type': 'application/octet-stream'}
+        ursulas_as_bytes = bytes().join(bytes(n) for n in self._node_finder(canonical_address))
+        ursulas_as_bytes += self._node_bytes_caster()
+        signature = self._stamp(ursulas_as_bytes)
+        return Response(bytes(signature) + ursulas_as_bytes, headers=headers)
+
+    def node_metadata_exchange(self, request: Request, query_params: QueryParams, environ: WSGIEnviron):
         nodes = self._node_class.batch_from_bytes(request.body,
                                                   federated_only=self.federated_only,
                                                   )
-        # TODO: This logic is basically repeated in learn_from_teacher_node.  Let's find a better way.
+        announcer = environ.get('REMOTE_ADDR')
         for node in nodes:
 
             if node.checksum_public_address in self._node_tracker:
                 continue  # TODO: 168 Check version and update if required.
 
-            @crosstown_traffic()
-            def learn_about_announced_nodes():
-                try:
-                    node.verify_node(self.network_middleware, accept_federated_only=self.federated_only)
-                except node.SuspiciousActivity:
-                    # TODO: Account for possibility that stamp, rather than interface, was bad.
-                    message = "Suspicious Activity: Discovered node with bad signature: {}.  " \
-                              " Announced via REST."  # TODO: Include data about caller?
-                    self.log.warning(message)
-                    self._suspicious_activity_tracker['vladimirs'].append(node)  # TODO: Maybe also record the bytes representation separately to disk?
-                else:
-                    self.log.info("Previously unknown node: {}".format(node.checksum_public_address))
-                    if self._certificate_dir:
-                        node.save_certificate_to_disk(self._certificate_dir)
-                    self._node_recorder(node)
+            self.node_verification_queue.submit(node, announcer=announcer)
 
         # TODO: What's the right status code here?  202?  Different if we already knew about the node?
         return self.all_known_nodes(request)
 
+    def _learn_about_announced_node(self, node):
+        # TODO: This logic is basically repeated in learn_from_teacher_node.  Let's find a better way.
+        if node.checksum_public_address in self._node_tracker:
+            return  # Someone else announced it, and we verified it, while this was waiting.
+        try:
+            node.verify_node(self.network_middleware, accept_federated_only=self.federated_only)
+        except node.SuspiciousActivity:
+            # TODO: Account for possibility that stamp, rather than interface, was bad.
+            message = "Suspicious Activity: Discovered node with bad signature: {}.  " \
+                      " Announced via REST."  # TODO: Include data about caller?
+            self.log.warning(message)
+            self._suspicious_activity_tracker['vladimirs'].append(node)  # TODO: Maybe also record the bytes representation separately to disk?
+        else:
+            self.log.info("Previously unknown node: {}".format(node.checksum_public_address))
+            if self._certificate_dir:
+                node.save_certificate_to_disk(self._certificate_dir)
+            self._node_recorder(node)
+
     def consider_arrangement(self, request: Request):
         from nucypher.policy.models import Arrangement
         arrangement = Arrangement.from_bytes(request.body)
@@ -176,6 +349,100 @@ class ProxyRESTRoutes:
         # TODO: Make this a legit response #234.
         return Response(b"This will eventually be an actual acceptance of the arrangement.", headers=headers)
 
+    def consider_arrangements(self, request: Request):
+        """
+        REST endpoint for many Arrangements, offered by the same Alice in one request (see Policy.arrange_many).
+
+        The body is Alice's signature and verifying key, followed by the Arrangements, each of which must be hers;
+        the signature covers our verifying key and all of the Arrangements, so that the batch can't be replayed to
+        another Ursula.  The Arrangements are stored in a single transaction, or not at all.
+        """
+        from nucypher.policy.models import Arrangement, Policy  # Avoid circular import
+        try:
+            alices_signature, alice_pubkey_sig, arrangements_payload = (signature_splitter + key_splitter)(
+                request.body, return_remainder=True)
+            offered = Arrangement.splitter.repeat(arrangements_payload)
+            expirations = [maya.parse(expiration_bytes.decode()) for _alice, _id, expiration_bytes in offered]
+        except self._MALFORMED_REQUEST_ERRORS:
+            return Response(status_code=400)
+
+        message = Policy.arrangements_message(bytes(self._stamp), arrangements_payload)
+        if not alices_signature.verify(message, alice_pubkey_sig):
+            return Response(status_code=400)
+        if any(arrangement_alice != alice_pubkey_sig for arrangement_alice, _id, _expiration in offered):
+            return Response(b"Some of these Arrangements weren't made by this Alice.", status_code=400)
+
+        # TODO: Make the rest of this logic actually work - do something here
+        # to decide if these Arrangements are worth accepting.
+        now = maya.now()
+        if any(expiration < now for expiration in expirations):
+            return Response(b"Some of these Arrangements have already expired.", status_code=403)
+
+        expirations_by_id = {arrangement_id.hex().encode(): expiration.datetime()
+                             for (_alice, arrangement_id, _expiration), expiration in zip(offered, expirations)}
+        with ThreadedSession(self.db_engine) as session:
+            try:
+                self.datastore.add_policy_arrangements(alice_pubkey_sig, expirations_by_id, session=session)
+            except IntegrityError:
+                session.rollback()
+                return Response(b"Some of these Arrangements were already offered.", status_code=409)
+
+        headers = {'Content-Type': 'application/octet-stream'}
+        return Response(b"These Arrangements were accepted.", headers=headers)
+
+    def consider_arrangement_with_kfrag(self, request: Request):
+        """
+        REST endpoint for an Arrangement which arrives together with its kFrag,
+        encrypted for us and signed by Alice.
+
+        The Arrangement and the kFrag are stored together in a single transaction,
+        or not at all.
+        """
+        from nucypher.policy.models import Arrangement
+        try:
+            offer_message_kit = UmbralMessageKit.from_bytes(request.body)
+            alice = self._alice_class.from_public_keys({SigningPower: offer_message_kit.sender_pubkey_sig})
+            cleartext = self._verifier(alice, offer_message_kit, decrypt=True)
+            alice_pubkey_sig, arrangement_id, expiration_bytes, kfrag_bytes = Arrangement.splitter(
+                cleartext, return_remainder=True)
+            kfrag = KFrag.from_bytes(kfrag_bytes)
+            expiration = maya.parse(expiration_bytes.decode())
+        except (self._alice_class.InvalidSignature,) + self._MALFORMED_REQUEST_ERRORS:
+            return Response(status_code=400)
+
+        if alice_pubkey_sig != offer_message_kit.sender_pubkey_sig:
+            return Response(status_code=400)
+
+        # TODO: Make the rest of this logic actually work - do something here
+        # to decide if this Arrangement is worth accepting.
+        if expiration < maya.now():
+            return Response(b"This Arrangement has already expired.", status_code=403)
+
+        already_offered = Response(b"An Arrangement with this ID was already offered.", status_code=409)
+        with ThreadedSession(self.db_engine) as session:
+            try:
+                self.datastore.get_policy_arrangement(arrangement_id.hex().encode(), session=session)
+            except NotFound:
+                pass
+            else:
+                return already_offered
+
+            try:
+                self.datastore.add_policy_arrangement(
+                    expiration.datetime(),
+                    id=arrangement_id.hex().encode(),
+                    kfrag=bytes(kfrag),
+                    alice_pubkey_sig=alice_pubkey_sig,
+                    session=session,
+                )
+            except IntegrityError:  # Offered again in the meantime.
+                session.rollback()
+                return already_offered
+        self._forget_kfrag(arrangement_id.hex())
+
+        headers = {'Content-Type': 'application/octet-stream'}
+        return Response(b"This Arrangement and its kFrag were accepted.", headers=headers)
+
     def set_policy(self, id_as_hex, request: Request):
         """
         REST endpoint for setting a kFrag.
@@ -196,39 +463,243 @@ class ProxyRESTRoutes:
 
         kfrag = KFrag.from_bytes(cleartext)
 
-        with ThreadedSession(self.db_engine) as session:
-            self.datastore.attach_kfrag_to_saved_arrangement(
-                alice,
-                id_as_hex,
-                kfrag,
-                session=session)
+        try:
+            with ThreadedSession(self.db_engine) as session:
+                self.datastore.attach_kfrag_to_saved_arrangement(
+                    alice,
+                    id_as_hex,
+                    kfrag,
+                    session=session)
+        except NotFound:
+            return Response(status_code=404)
+        except alice.SuspiciousActivity:
+            return Response(b"This Arrangement wasn't made with this Alice.", status_code=403)
+        self._forget_kfrag(id_as_hex)
 
         return  # TODO: Return A 200, with whatever policy metadata.
 
-    def reencrypt_via_rest(self, id_as_hex, request: Request):
-        from nucypher.policy.models import WorkOrder  # Avoid circular import
-        id = binascii.unhexlify(id_as_hex)
-        work_order = WorkOrder.from_rest_payload(id, request.body)
-        self.log.info("Work Order from {}, signed {}".format(work_order.bob, work_order.receipt_signature))
-        with ThreadedSession(self.db_engine) as session:
-            kfrag_bytes = self.datastore.get_policy_arrangement(id.hex().encode(),
-                                                                session=session).k_frag  # Careful!  :-)
-        # TODO: Push this to a lower level.
-        kfrag = KFrag.from_bytes(kfrag_bytes)
-        cfrag_byte_stream = b""
+    def set_policies(self, request: Request):
+        """
+        REST endpoint for setting many kFrags, for many arrangements, in one request.
+
+        The body is Alice's signature and verifying key, followed by any number of
+        (arrangement id, encrypted and signed kFrag) pairs; the signature covers our verifying key
+        and all of the pairs, so that the batch can't be replayed to another Ursula.
+        The kFrags are decrypted and verified on our pool of worker threads and attached
+        to their arrangements in a single transaction.
+        """
+        from nucypher.policy.models import Arrangement, Policy  # Avoid circular import
+        alices_signature, alice_pubkey_sig, kfrags_payload = (signature_splitter + key_splitter)(request.body,
+                                                                                                return_remainder=True)
+        if not alices_signature.verify(Policy.kfrags_message(bytes(self._stamp), kfrags_payload), alice_pubkey_sig):
+            return Response(status_code=400)
+
+        alice = self._alice_class.from_public_keys({SigningPower: alice_pubkey_sig})
+        kfrag_splitter = BytestringSplitter((bytes, Arrangement.ID_LENGTH),
+                                            (UmbralMessageKit, VariableLengthBytestring))
+        ids_and_message_kits = kfrag_splitter.repeat(kfrags_payload)
+
+        def decrypt_kfrag(message_kit):
+            return KFrag.from_bytes(self._verifier(alice, message_kit, decrypt=True))
+
+        try:
+            message_kits = (message_kit for _id, message_kit in ids_and_message_kits)
+            kfrags = list(self._kfrag_pool.map(decrypt_kfrag, message_kits))
+        except (alice.InvalidSignature, ValueError):
+            return Response(status_code=400)
+
+        kfrags_by_id_as_hex = {arrangement_id.hex(): kfrag
+                               for (arrangement_id, _message_kit), kfrag in zip(ids_and_message_kits, kfrags)}
+
+        try:
+            with ThreadedSession(self.db_engine) as session:
+                self.datastore.attach_kfrags_to_saved_arrangements(alice,
+                                                                   kfrags_by_id_as_hex,
+                                                                   session=session)
+        except NotFound:
+            return Response(status_code=404)
+        except alice.SuspiciousActivity:
+            return Response(b"Some of these Arrangements weren't made with this Alice.", status_code=403)
+        for id_as_hex in kfrags_by_id_as_hex:
+            self._forget_kfrag(id_as_hex)
+
+        return  # TODO: Return A 200, with whatever policy metadata.
+
+    def revoke_arrangement(self, id_as_hex, request: Request):
+        """
+        REST endpoint for revoking an Arrangement, and with it the kFrag, if any.
+
+        The body is the signature, by the Alice who made the Arrangement, of its revocation message.
+        """
+        from nucypher.policy.models import Arrangement  # Avoid circular import
+        try:
+            arrangement_id = binascii.unhexlify(id_as_hex)
+        except binascii.Error:
+            return Response(status_code=400)
 
-        for capsule in work_order.capsules:
+        with ThreadedSession(self.db_engine) as session:
+            try:
+                policy_arrangement = self.datastore.get_policy_arrangement(id_as_hex.encode(), session=session)
+            except NotFound:
+                return Response(status_code=404)
+
+            alice_pubkey_sig = UmbralPublicKey.from_bytes(policy_arrangement.alice_pubkey_sig.key_data)
+            try:
+                signature = Signature.from_bytes(request.body)
+            except (ValueError, TypeError):
+                return Response(status_code=400)
+            if not signature.verify(Arrangement.revocation_message(arrangement_id), alice_pubkey_sig):
+                return Response(status_code=400)
+
+            self.datastore.del_policy_arrangement(id_as_hex.encode(), session=session)
+        self._forget_kfrag(id_as_hex)
+
+        return Response(b"This Arrangement has been revoked.", status_code=200)
+
+    def _forget_kfrag(self, id_as_hex):
+        self.kfrag_cache.invalidate(id_as_hex)
+        if self.cfrag_cache is not None:
+            self.cfrag_cache.invalidate_group(id_as_hex)
+
+    def _get_kfrag(self, id_as_hex) -> tuple:
+        """The KFrag for this arrangement, and when the arrangement expires (in seconds since the epoch), if it does."""
+        kfrag_and_expiry = self.kfrag_cache.get(id_as_hex)
+        if kfrag_and_expiry is None:
+            with ThreadedSession(self.db_engine) as session:
+                policy_arrangement = self.datastore.get_policy_arrangement(id_as_hex.encode(), session=session)
+                kfrag_bytes = policy_arrangement.k_frag  # Careful!  :-)
+                expiration = policy_arrangement.expiration
+            # TODO: Push this to a lower level.
+            kfrag = KFrag.from_bytes(kfrag_bytes)
+            # The datastore keeps expirations as naive UTC datetimes.
+            expires_at = calendar.timegm(expiration.utctimetuple()) if expiration else None
+            kfrag_and_expiry = (kfrag, expires_at)
+            self.kfrag_cache.put(id_as_hex, kfrag_and_expiry, expires_at=expires_at)
+        return kfrag_and_expiry
+
+    def _reencrypt(self, id_as_hex, kfrag, capsule, expires_at=None):
+        cache_key = (id_as_hex, keccak_digest(bytes(capsule)))
+        cfrag_bytes = self.cfrag_cache.get(cache_key) if self.cfrag_cache is not None else None
+        if cfrag_bytes is None:
             # TODO: Sign the result of this.  See #141.
             cfrag = pre.reencrypt(kfrag, capsule)
-            self.log.info("Re-encrypting for Capsule {}, made CFrag {}.".format(capsule, cfrag))
-            cfrag_byte_stream += VariableLengthBytestring(cfrag)
+            self._reencryptions.inc()
+            cfrag_bytes = bytes(cfrag)
+            if self.cfrag_cache is not None:
+                # Served no longer than the arrangement it was made under lasts.
+                self.cfrag_cache.put(cache_key, cfrag_bytes, expires_at=expires_at)
+        return cfrag_bytes
+
+    def _start_reencryption(self, id_as_hex, work_order_payload):
+        """
+        Takes up a WorkOrder and sets its re-encryptions going, each as soon as its capsule is decoded.
+
+        Anything wrong with the WorkOrder (or its arrangement) is raised here; what's returned is the
+        WorkOrder and an iterator of VariableLengthBytestring'd CFrags, in capsule order, each ready as soon
+        as it and the ones before it have been made.
+        """
+        from nucypher.policy.models import WorkOrder  # Avoid circular import
+        id = binascii.unhexlify(id_as_hex)
+        id_as_hex = id.hex()  # Normalized, since it keys our caches.
+        kfrag, expires_at = self._get_kfrag(id_as_hex)
+
+        reencryptions = []
 
-        # TODO: Put this in Ursula's datastore
-        self._work_order_tracker.append(work_order)
+        def admit(bob_pubkey_sig, capsules):
+            if not self.admission_control.admit_work_order(bytes(bob_pubkey_sig), capsules):
+                raise AdmissionControl.Throttled("Too many capsules from Bob {}.".format(bob_pubkey_sig))
 
+        def reencrypt_when_decoded(capsule):
+            reencryptions.append(self._reencryption_pool.submit(self._reencrypt, id_as_hex, kfrag, capsule, expires_at))
+
+        work_order = WorkOrder.from_rest_payload(id, work_order_payload,
+                                                 executor=self._reencryption_pool,
+                                                 on_capsule=reencrypt_when_decoded,
+                                                 admit=admit)
+        self.log.info("Work Order from {}, signed {}".format(work_order.bob, work_order.receipt_signature))
+        self._work_order_size.observe(len(work_order.capsules))
+        self.work_order_writer.submit(work_order)
+
+        cfrag_chunks = (bytes(VariableLengthBytestring(reencryption.result())) for reencryption in reencryptions)
+        return work_order, cfrag_chunks
+
+    def reencrypt_via_rest(self, id_as_hex, request: Request):
+        """
+        REST endpoint for re-encryption, as a single response.  Requests that come through
+        our WSGI app get _streaming_rest_app's chunked response instead.
+        """
+        try:
+            _work_order, cfrag_chunks = self._start_reencryption(id_as_hex, request.body)
+        except AdmissionControl.Throttled:
+            return Response(status_code=429)
+        except ThreadedBatchWriter.Backlogged:
+            return Response(status_code=503)
         headers = {'Content-Type': 'application/octet-stream'}
+        return Response(content=b"".join(cfrag_chunks), headers=headers)
+
+    def _streaming_rest_app(self, environ, start_response):
+        """
+        Our WSGI app: _handle_request, timed (until the last chunk of the response is sent) and counted by route.
+        """
+        method = environ.get('REQUEST_METHOD')
+        route = self._route_label(environ.get('PATH_INFO', ''), method)
+        started = time.monotonic()
+
+        def start_counted_response(status, headers, *exc_info):
+            self._responses.inc(route=route, method=method, status=status.split(" ", 1)[0])
+            return start_response(status, headers, *exc_info)
+
+        chunks = self._handle_request(environ, start_counted_response)
+        return self._timed_response(chunks, route, method, started)
+
+    def _timed_response(self, chunks, route, method, started):
+        try:
+            yield from chunks
+        finally:
+            self._request_duration.observe(time.monotonic() - started, route=route, method=method)
+
+    def _handle_request(self, environ, start_response):
+        """
+        The apistar App, except that re-encryption responses are streamed, one
+        CFrag per chunk as soon as it's made, which apistar can't do.
 
-        return Response(content=cfrag_byte_stream, headers=headers)
+        Requests over AdmissionControl's limits are turned away here, with a 429, before any of them is parsed.
+        """
+        path = environ.get('PATH_INFO', '')
+        route = self._rate_limited_route(path)
+        if route and not self.admission_control.admit_request(route, environ.get('REMOTE_ADDR')):
+            start_response('429 Too Many Requests', [('Content-Type', 'application/octet-stream')])
+            return [b""]
+
+        match = self._reencryption_path.match(path)
+        if not (match and environ['REQUEST_METHOD'] == 'POST'):
+            return self._apistar_app(environ, start_response)
+
+        work_order_payload = environ['wsgi.input'].read(int(environ.get('CONTENT_LENGTH') or 0))
+        try:
+            _work_order, cfrag_chunks = self._start_reencryption(match.group('id_as_hex'), work_order_payload)
+        except NotFound:
+            start_response('404 Not Found', [('Content-Type', 'application/octet-stream')])
+            return [b""]
+        except AdmissionControl.Throttled:
+            start_response('429 Too Many Requests', [('Content-Type', 'application/octet-stream')])
+            return [b""]
+        except ThreadedBatchWriter.Backlogged:
+            start_response('503 Service Unavailable', [('Content-Type', 'application/octet-stream')])
+            return [b""]
+        except ValueError:
+            start_response('400 Bad Request', [('Content-Type', 'application/octet-stream')])
+            return [b""]
+
+        # Without a Content-Length, this goes out with chunked transfer encoding.
+        start_response('200 OK', [('Content-Type', 'application/octet-stream')])
+        return cfrag_chunks
+
+    def _rate_limited_route(self, path: str):
+        for path_pattern, route in self._rate_limited_paths:
+            if path_pattern.match(path):
+                return route
+        return None
 
     def provide_treasure_map(self, treasure_map_id):
         headers = {'Content-Type': 'application/octet-stream'}
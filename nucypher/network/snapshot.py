@@ -0,0 +1,171 @@
+import os
+import struct
+
+import time
+from cryptography.exceptions import InternalError
+
+from nucypher.network.nodes import NodeRecord
+
+
+class LearnerSnapshot:
+    """
+    What a Learner knows - its known nodes (and how far each has been verified), the latencies
+    it has seen from them, and its TreasureMaps - frozen into one file, so that a restarted
+    process can pick up where it left off instead of learning the network all over again.
+    """
+
+    MAGIC = b"NuLS"
+    VERSION = 2
+
+    _header = struct.Struct(">4sBd")   # Magic, version, and when the snapshot was taken.
+    _count = struct.Struct(">I")
+    _node_flags = struct.Struct(">B")
+    _latency = struct.Struct(">d")
+
+    _VERIFIED_STAMP, _VERIFIED_INTERFACE, _VERIFIED_NODE = 1, 2, 4
+    _BYTES_KEY, _TEXT_KEY = b"b", b"s"
+
+    class Unreadable(ValueError):
+        """Raised when a file isn't a snapshot we know how to read."""
+
+    def __init__(self,
+                 node_records: list,
+                 latencies: dict = None,
+                 treasure_maps: dict = None,
+                 taken_at: float = None,
+                 ) -> None:
+        self.node_records = node_records
+        self.latencies = latencies or {}
+        self.treasure_maps = treasure_maps or {}
+        self.taken_at = time.time() if taken_at is None else taken_at
+
+    @property
+    def age(self) -> float:
+        """Seconds since the snapshot was taken."""
+        return time.time() - self.taken_at
+
+    #
+    # Serialization
+    #
+
+    @classmethod
+    def _sized(cls, data: bytes) -> bytes:
+        return cls._count.pack(len(data)) + data
+
+    def __bytes__(self):
+        parts = [self._header.pack(self.MAGIC, self.VERSION, self.taken_at)]
+
+        parts.append(self._count.pack(len(self.node_records)))
+        for record in self.node_records:
+            flags = (self._VERIFIED_STAMP * record.verified_stamp
+                     | self._VERIFIED_INTERFACE * record.verified_interface
+                     | self._VERIFIED_NODE * record.verified_node)
+            parts.append(self._node_flags.pack(flags))
+            certificate_filepath = "" if record.certificate_filepath is None else record.certificate_filepath
+            parts.append(self._sized(certificate_filepath.encode()))
+            parts.append(self._sized(bytes(record)))
+
+        parts.append(self._count.pack(len(self.latencies)))
+        for node_id, latencies in self.latencies.items():
+            parts.append(self._sized(node_id.encode()))
+            parts.append(self._count.pack(len(latencies)))
+            parts.extend(self._latency.pack(latency) for latency in latencies)
+
+        parts.append(self._count.pack(len(self.treasure_maps)))
+        for map_key, treasure_map in self.treasure_maps.items():
+            if isinstance(map_key, bytes):
+                parts.append(self._BYTES_KEY + self._sized(map_key))
+            else:
+                parts.append(self._TEXT_KEY + self._sized(map_key.encode()))
+            # Only as published: what Bob reads from his maps isn't written to disk in the clear.
+            parts.append(self._sized(bytes(treasure_map)))
+
+        return bytes().join(parts)
+
+    @classmethod
+    def from_bytes(cls, snapshot_bytes: bytes, federated_only: bool = False) -> 'LearnerSnapshot':
+        from nucypher.policy.models import TreasureMap  # Avoid circular import
+
+        reader = _Reader(snapshot_bytes)
+        try:
+            magic, version, taken_at = reader.unpack(cls._header)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise cls.Unreadable("Not a version {} Learner snapshot.".format(cls.VERSION))
+
+            node_records = []
+            for _ in range(reader.count()):
+                flags, = reader.unpack(cls._node_flags)
+                certificate_filepath = reader.sized().decode() or None
+                record = NodeRecord.from_bytes(reader.sized(), federated_only=federated_only)
+                record.certificate_filepath = certificate_filepath
+                record.verified_stamp = bool(flags & cls._VERIFIED_STAMP)
+                record.verified_interface = bool(flags & cls._VERIFIED_INTERFACE)
+                record.verified_node = bool(flags & cls._VERIFIED_NODE)
+                node_records.append(record)
+
+            latencies = {}
+            for _ in range(reader.count()):
+                node_id = reader.sized().decode()
+                latencies[node_id] = [reader.unpack(cls._latency)[0] for _ in range(reader.count())]
+
+            treasure_maps = {}
+            for _ in range(reader.count()):
+                key_type = reader.take(1)
+                map_key = reader.sized() if key_type == cls._BYTES_KEY else reader.sized().decode()
+                treasure_maps[map_key] = TreasureMap.from_bytes(reader.sized(), verify=False)
+        except cls.Unreadable:
+            raise
+        except (struct.error, IndexError, ValueError, TypeError, InternalError) as e:
+            # Truncated, or garbled somewhere in a node's metadata or a TreasureMap.
+            raise cls.Unreadable("Corrupt Learner snapshot: {}".format(e))
+
+        if not reader.exhausted:
+            raise cls.Unreadable("{} unexpected bytes at the end of a Learner snapshot.".format(reader.remaining))
+
+        return cls(node_records=node_records, latencies=latencies, treasure_maps=treasure_maps, taken_at=taken_at)
+
+    def save(self, filepath: str) -> str:
+        """Writes the snapshot to filepath, replacing any earlier one only once it's complete."""
+        temporary_filepath = filepath + ".saving"
+        with open(temporary_filepath, "wb") as snapshot_file:
+            snapshot_file.write(bytes(self))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temporary_filepath, filepath)
+        return filepath
+
+    @classmethod
+    def load(cls, filepath: str, federated_only: bool = False) -> 'LearnerSnapshot':
+        with open(filepath, "rb") as snapshot_file:
+            return cls.from_bytes(snapshot_file.read(), federated_only=federated_only)
+
+
+class _Reader:
+
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+        self._position = 0
+
+    @property
+    def remaining(self) -> int:
+        return len(self._data) - self._position
+
+    @property
+    def exhausted(self) -> bool:
+        return not self.remaining
+
+    def take(self, length: int) -> bytes:
+        if length > self.remaining:
+            raise IndexError("Wanted {} bytes; only {} left.".format(length, self.remaining))
+        chunk = self._data[self._position:self._position + length]
+        self._position += length
+        return chunk
+
+    def unpack(self, structure: struct.Struct) -> tuple:
+        return structure.unpack(self.take(structure.size))
+
+    def count(self) -> int:
+        return self.unpack(LearnerSnapshot._count)[0]
+
+    def sized(self) -> bytes:
+        return self.take(self.count())
@@ -0,0 +1,333 @@
+import atexit
+import mmap
+import os
+import threading
+from contextlib import suppress
+from logging import getLogger
+
+from constant_sorrow import constants
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.serialization import Encoding
+from cryptography.x509 import Certificate
+from cryptography.x509.oid import NameOID
+
+from nucypher.crypto.api import load_tls_certificate
+from nucypher.crypto.constants import PUBLIC_ADDRESS_LENGTH
+
+
+class NodeMetadataLog:
+    """
+    Known nodes' metadata, by canonical address, in a single append-only file.
+
+    Each entry is an operation (add or remove), the node's canonical address, and (for adds) the length and
+    bytes of its metadata; the latest entry for an address wins.  Opening the log reads only those headers,
+    to build an index of where each node's metadata is, and the metadata itself is read through mmap
+    when it's asked for.  Once more of the file is superseded entries than live ones, it is compacted.
+    """
+
+    FILENAME = "known_nodes.log"
+
+    _ADD = b"+"
+    _REMOVE = b"-"
+    _LENGTH_SIZE = 4
+    _HEADER_SIZE = 1 + PUBLIC_ADDRESS_LENGTH + _LENGTH_SIZE
+
+    COMPACTION_THRESHOLD = 1024 * 1024  # Bytes of superseded entries below which we don't bother.
+
+    log = getLogger("characters")
+
+    def __init__(self, filepath: str, compaction_threshold: int = COMPACTION_THRESHOLD) -> None:
+        self.filepath = filepath
+        self.compaction_threshold = compaction_threshold
+
+        self.__index = dict()  # type: dict
+        self.__lock = threading.RLock()
+        self.__map = None
+        self.__live_bytes = 0
+        self.__file_size = 0
+
+        self.__load_index()
+        if self.__garbage_bytes > self.compaction_threshold:
+            self.compact()
+
+    def __len__(self):
+        return len(self.__index)
+
+    def __contains__(self, canonical_address):
+        return canonical_address in self.__index
+
+    def __iter__(self):
+        """Yields (canonical address, metadata) for each node, oldest first."""
+        for canonical_address in list(self.__index):
+            try:
+                yield canonical_address, self.read(canonical_address)
+            except KeyError:
+                continue  # Removed while we were iterating.
+
+    @property
+    def __garbage_bytes(self) -> int:
+        return self.__file_size - self.__live_bytes
+
+    def __load_index(self) -> None:
+        if not os.path.exists(self.filepath) or not os.path.getsize(self.filepath):
+            return
+
+        contents = self.__mapped(os.path.getsize(self.filepath))
+        position = 0
+        while position + self._HEADER_SIZE <= len(contents):
+            operation = contents[position:position + 1]
+            address = contents[position + 1:position + 1 + PUBLIC_ADDRESS_LENGTH]
+            length = int.from_bytes(contents[position + 1 + PUBLIC_ADDRESS_LENGTH:position + self._HEADER_SIZE],
+                                    "big")
+            metadata_start = position + self._HEADER_SIZE
+            if operation not in (self._ADD, self._REMOVE) or metadata_start + length > len(contents):
+                break
+
+            self.__forget(address)
+            if operation == self._ADD:
+                self.__index[address] = (metadata_start, length)
+                self.__live_bytes += self._HEADER_SIZE + length
+            position = metadata_start + length
+
+        if position != len(contents):
+            # We must have gone down halfway through writing something; drop the remains.
+            self.log.warning("Truncating {} bytes of garbage from {}.".format(len(contents) - position,
+                                                                             self.filepath))
+            self.close()
+            with open(self.filepath, "r+b") as log_file:
+                log_file.truncate(position)
+        self.__file_size = position
+
+    def __forget(self, canonical_address) -> None:
+        try:
+            _start, length = self.__index.pop(canonical_address)
+        except KeyError:
+            return
+        self.__live_bytes -= self._HEADER_SIZE + length
+
+    def __mapped(self, end: int):
+        if self.__map is None or len(self.__map) < end:
+            if self.__map is not None:
+                self.__map.close()
+            with open(self.filepath, "rb") as log_file:
+                self.__map = mmap.mmap(log_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.__map
+
+    def __append(self, entries: bytes) -> int:
+        with open(self.filepath, "ab") as log_file:
+            log_file.write(entries)
+        offset = self.__file_size
+        self.__file_size += len(entries)
+        return offset
+
+    def read(self, canonical_address: bytes) -> bytes:
+        with self.__lock:
+            start, length = self.__index[canonical_address]
+            return self.__mapped(start + length)[start:start + length]
+
+    def write(self, canonical_address: bytes, metadata: bytes) -> bool:
+        """
+        Records metadata for canonical_address, unless that's what we have already; returns whether it wrote.
+        """
+        with self.__lock:
+            if canonical_address in self.__index and self.read(canonical_address) == metadata:
+                return False
+
+            header = self._ADD + canonical_address + len(metadata).to_bytes(self._LENGTH_SIZE, "big")
+            offset = self.__append(header + metadata)
+            self.__forget(canonical_address)
+            self.__index[canonical_address] = (offset + self._HEADER_SIZE, len(metadata))
+            self.__live_bytes += self._HEADER_SIZE + len(metadata)
+            self.__compact_if_needed()
+            return True
+
+    def remove(self, canonical_address: bytes) -> bool:
+        with self.__lock:
+            if canonical_address not in self.__index:
+                return False
+            self.__append(self._REMOVE + canonical_address + bytes(self._LENGTH_SIZE))
+            self.__forget(canonical_address)
+            self.__compact_if_needed()
+            return True
+
+    def __compact_if_needed(self) -> None:
+        garbage = self.__garbage_bytes
+        if garbage > self.compaction_threshold and garbage > self.__live_bytes:
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Rewrites the log with only the latest metadata for each node, then swaps it in for the old one.
+        """
+        with self.__lock:
+            temporary_filepath = self.filepath + ".compacting"
+            new_index = dict()
+            position = 0
+            with open(temporary_filepath, "wb") as new_log:
+                for canonical_address, metadata in self:
+                    header = self._ADD + canonical_address + len(metadata).to_bytes(self._LENGTH_SIZE, "big")
+                    new_log.write(header + metadata)
+                    new_index[canonical_address] = (position + self._HEADER_SIZE, len(metadata))
+                    position += len(header) + len(metadata)
+                new_log.flush()
+                os.fsync(new_log.fileno())
+
+            self.close()
+            os.replace(temporary_filepath, self.filepath)
+            self.__index = new_index
+            self.__file_size = self.__live_bytes = position
+
+    def close(self) -> None:
+        with self.__lock:
+            if self.__map is not None:
+                self.__map.close()
+                self.__map = None
+
+
+class CertificateStore:
+    """
+    Nodes' TLS certificates, one PEM file per common name, in a single directory.
+
+    The store remembers the fingerprint of the certificate on disk for each common name, so saving a certificate
+    we already have costs a hash rather than a write.  Those that are new are written in batches by a timer thread,
+    FLUSH_DELAY seconds after the first of them comes in, so that learning about hundreds of nodes doesn't mean
+    hundreds of writes on the reactor thread; anything about to read one of those files calls written() first,
+    which writes it then and there if it's still waiting (and raises if it can't be).
+    """
+
+    FLUSH_DELAY = 0.5  # Seconds
+
+    _stores = dict()  # type: dict
+    _stores_lock = threading.Lock()
+
+    log = getLogger("characters")
+
+    def __init__(self, directory: str, flush_delay: float = FLUSH_DELAY) -> None:
+        self.directory = directory
+        self.flush_delay = flush_delay
+
+        self.__fingerprints = dict()  # type: dict
+        self.__pending = dict()       # type: dict
+        self.__lock = threading.RLock()
+        self.__flush_timer = None
+
+    @classmethod
+    def for_directory(cls, directory: str) -> 'CertificateStore':
+        """The one store for directory, so that everyone saving certificates there shares its index."""
+        directory = os.path.abspath(directory)
+        with cls._stores_lock:
+            try:
+                return cls._stores[directory]
+            except KeyError:
+                if not cls._stores:
+                    atexit.register(cls.flush_all)
+                store = cls._stores[directory] = cls(directory)
+                return store
+
+    @classmethod
+    def flush_all(cls) -> None:
+        for store in list(cls._stores.values()):
+            with suppress(OSError):  # Already logged.
+                store.flush()
+
+    @classmethod
+    def written(cls, certificate_filepath: str) -> str:
+        """
+        Makes sure any certificate waiting to be written to certificate_filepath is on disk; returns the filepath.
+        """
+        if certificate_filepath is not None and certificate_filepath is not constants.CERTIFICATE_NOT_SAVED:
+            directory = os.path.dirname(os.path.abspath(certificate_filepath))
+            store = cls._stores.get(directory)
+            if store is not None:
+                store.flush(certificate_filepath)
+        return certificate_filepath
+
+    @staticmethod
+    def common_name(certificate: Certificate) -> str:
+        return certificate.subject.get_attributes_for_oid(NameOID.COMMON_NAME)[0].value
+
+    def filepath_for(self, common_name: str) -> str:
+        return os.path.join(self.directory, common_name + '.pem')
+
+    def __fingerprint_on_disk(self, common_name: str):
+        try:
+            return self.__fingerprints[common_name]
+        except KeyError:
+            filepath = self.filepath_for(common_name)
+            if not os.path.isfile(filepath):
+                return None
+            try:
+                fingerprint = load_tls_certificate(filepath).fingerprint(hashes.SHA256())
+            except ValueError:
+                return None  # Whatever's there isn't a certificate; it'll be overwritten.
+            self.__fingerprints[common_name] = fingerprint
+            return fingerprint
+
+    def save(self, certificate: Certificate, common_name: str = None) -> str:
+        """
+        Queues certificate to be written under common_name (by default, the one on the certificate),
+        unless it's already there; returns the filepath it's (going to be) at.
+        """
+        common_name = common_name or self.common_name(certificate)
+        filepath = self.filepath_for(common_name)
+        fingerprint = certificate.fingerprint(hashes.SHA256())
+
+        with self.__lock:
+            try:
+                _common_name, _certificate, pending_fingerprint = self.__pending[filepath]
+            except KeyError:
+                if self.__fingerprint_on_disk(common_name) == fingerprint:
+                    return filepath
+            else:
+                if pending_fingerprint == fingerprint:
+                    return filepath
+            self.__pending[filepath] = (common_name, certificate, fingerprint)
+            if self.__flush_timer is None:
+                self.__flush_timer = threading.Timer(self.flush_delay, self.__flush_on_timer)
+                self.__flush_timer.daemon = True
+                self.__flush_timer.start()
+        return filepath
+
+    def __flush_on_timer(self) -> None:
+        with suppress(OSError):  # Already logged; the certificates stay queued for whoever needs them next.
+            self.flush()
+
+    def flush(self, filepath: str = None) -> int:
+        """
+        Writes the certificates waiting to be written (or only the one for filepath); returns how many it wrote.
+
+        A certificate is only indexed as being on disk once it's there.  Any that can't be written stay queued,
+        to be tried again by the next flush, and the first such error is raised once the rest are written.
+        """
+        with self.__lock:
+            if filepath is None:
+                pending, self.__pending = self.__pending, dict()
+                if self.__flush_timer is not None:
+                    self.__flush_timer.cancel()
+                    self.__flush_timer = None
+            elif filepath in self.__pending:
+                pending = {filepath: self.__pending.pop(filepath)}
+            else:
+                return 0
+
+            written, failure = 0, None
+            for certificate_filepath, (common_name, certificate, fingerprint) in pending.items():
+                temporary_filepath = certificate_filepath + ".saving"
+                try:
+                    os.makedirs(self.directory, exist_ok=True)
+                    with open(temporary_filepath, "wb") as certificate_file:
+                        certificate_file.write(certificate.public_bytes(Encoding.PEM))
+                    os.replace(temporary_filepath, certificate_filepath)
+                except OSError as e:
+                    self.log.error("Couldn't write certificate to {}: {}".format(certificate_filepath, e))
+                    self.__pending[certificate_filepath] = (common_name, certificate, fingerprint)
+                    failure = failure or e
+                else:
+                    self.__fingerprints[common_name] = fingerprint
+                    written += 1
+
+        if written > 1:
+            self.log.debug("Wrote {} certificates to {}.".format(written, self.directory))
+        if failure is not None:
+            raise failure
+        return written
@@ -0,0 +1,140 @@
+import threading
+
+import time
+
+from nucypher.network.caching import BoundedCache
+
+
+class TokenBucket:
+    """
+    Allows `rate` tokens' worth of work per second on average, and up to `capacity` tokens' worth at once.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+
+        self.__tokens = capacity
+        self.__updated = clock()
+        self.__lock = threading.Lock()
+
+    @property
+    def tokens(self) -> float:
+        with self.__lock:
+            self.__refill()
+            return self.__tokens
+
+    def __refill(self) -> None:
+        now = self._clock()
+        self.__tokens = min(self.capacity, self.__tokens + (now - self.__updated) * self.rate)
+        self.__updated = now
+
+    def take(self, tokens: float = 1) -> bool:
+        """Takes tokens from the bucket if there are that many in it; returns whether there were."""
+        with self.__lock:
+            self.__refill()
+            if tokens > self.__tokens:
+                return False
+            self.__tokens -= tokens
+            return True
+
+
+class RateLimiter:
+    """
+    A TokenBucket for each key (a client's IP, say, or verifying key), each filling at `rate` tokens
+    per second up to `burst`.  Only the `max_keys` most recently seen keys are kept track of.
+    """
+
+    MAX_KEYS = 10000
+
+    def __init__(self, rate: float, burst: float, max_keys: int = MAX_KEYS, clock=time.monotonic) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+
+        self.__buckets = BoundedCache(max_entries=max_keys)
+        self.__lock = threading.Lock()
+
+        self.allowed = 0
+        self.rejected = 0
+
+    def allow(self, key, cost: float = 1) -> bool:
+        """Charges key cost tokens, if it has them; returns whether it did."""
+        bucket = self.__buckets.get(key, count=False)
+        if bucket is None:
+            with self.__lock:
+                bucket = self.__buckets.get(key, count=False)
+                if bucket is None:
+                    bucket = TokenBucket(rate=self.rate, capacity=self.burst, clock=self._clock)
+                    self.__buckets.put(key, bucket)
+
+        if bucket.take(cost):
+            self.allowed += 1
+            return True
+        else:
+            self.rejected += 1
+            return False
+
+
+class AdmissionControl:
+    """
+    Rate limits on Ursula's REST routes: a RateLimiter per route, keyed by client IP, and one
+    for the capsules in WorkOrders, keyed by the verifying key of the Bob who signed them.
+
+    `limits` maps route names to (requests per second, burst) for each client IP; a route
+    that isn't in it isn't limited.  Rejections are counted by route.
+    """
+
+    DEFAULT_LIMITS = {
+        'reencrypt': (50, 200),
+        'node_metadata': (5, 20),
+        'treasure_map': (20, 100),
+        'consider_arrangement': (10, 50),
+    }
+
+    WORK_ORDER_ROUTE = 'reencrypt'
+    CAPSULES_PER_SECOND = 500   # For each Bob...
+    CAPSULE_BURST = 5000        # ...who may send this many at once.
+
+    class Throttled(Exception):
+        """Raised when a request is over its limit, and should be answered with a 429."""
+
+    def __init__(self,
+                 limits: dict = None,
+                 capsules_per_second: float = CAPSULES_PER_SECOND,
+                 capsule_burst: float = CAPSULE_BURST,
+                 clock=time.monotonic,
+                 ) -> None:
+        limits = self.DEFAULT_LIMITS if limits is None else limits
+        self._clients = {route: RateLimiter(rate=rate, burst=burst, clock=clock)
+                         for route, (rate, burst) in limits.items()}
+        self._bobs = RateLimiter(rate=capsules_per_second, burst=capsule_burst, clock=clock)
+
+        self.rejections = dict.fromkeys(self._clients, 0)
+        self.rejections.setdefault(self.WORK_ORDER_ROUTE, 0)
+        self.__lock = threading.Lock()
+
+    def __reject(self, route: str) -> bool:
+        with self.__lock:
+            self.rejections[route] = self.rejections.get(route, 0) + 1
+        return False
+
+    def admit_request(self, route: str, client_address: str) -> bool:
+        """Whether to take up a request to route from client_address."""
+        try:
+            limiter = self._clients[route]
+        except KeyError:
+            return True
+        return limiter.allow(client_address) or self.__reject(route)
+
+    def admit_work_order(self, bob_verifying_key: bytes, capsules: int) -> bool:
+        """
+        Whether to re-encrypt this many capsules for the Bob with this verifying key.
+
+        Only ask once Bob's signature on the WorkOrder is verified, lest anyone use up his allowance.
+        """
+        return self._bobs.allow(bob_verifying_key, cost=capsules) or self.__reject(self.WORK_ORDER_ROUTE)
+
+    def metrics(self) -> dict:
+        return dict(rejections=dict(self.rejections))
@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+
+from nucypher.network.throttling import RateLimiter
+
+
+class NodeVerificationQueue:
+    """
+    Nodes announced to us, waiting to be verified on a pool of at most `max_concurrent` threads.
+
+    A node that's already waiting (or being verified) isn't queued again, however many nodes announce it;
+    nor is anything once `max_pending` nodes are waiting.  Each announcer may have `announcement_burst`
+    nodes queued at once, and `announcements_per_second` more after that; the rest are dropped, to be
+    announced again later.
+    """
+
+    MAX_CONCURRENT = 4
+    MAX_PENDING = 1000
+    ANNOUNCEMENTS_PER_SECOND = 2
+    ANNOUNCEMENT_BURST = 50
+
+    log = getLogger("characters")
+
+    def __init__(self,
+                 verifier,
+                 max_concurrent: int = MAX_CONCURRENT,
+                 max_pending: int = MAX_PENDING,
+                 announcements_per_second: float = ANNOUNCEMENTS_PER_SECOND,
+                 announcement_burst: int = ANNOUNCEMENT_BURST,
+                 ) -> None:
+        self._verifier = verifier
+        self.max_pending = max_pending
+
+        self._announcers = RateLimiter(rate=announcements_per_second, burst=announcement_burst)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="node_verification")
+
+        self.__pending = set()  # type: set
+        self.__idle = threading.Condition()
+
+        self.queued = 0
+        self.duplicates = 0
+        self.throttled = 0
+        self.overflowed = 0
+
+    def __len__(self):
+        return len(self.__pending)
+
+    def __contains__(self, checksum_address):
+        return checksum_address in self.__pending
+
+    def submit(self, node, announcer=None) -> bool:
+        """Queues node, announced by announcer, to be verified; returns whether it was."""
+        checksum_address = node.checksum_public_address
+        with self.__idle:
+            if checksum_address in self.__pending:
+                self.duplicates += 1
+                return False
+            if len(self.__pending) >= self.max_pending:
+                self.overflowed += 1
+                return False
+            if not self._announcers.allow(announcer):
+                self.throttled += 1
+                return False
+            self.__pending.add(checksum_address)
+            self.queued += 1
+
+        self._executor.submit(self.__verify, node)
+        return True
+
+    def __verify(self, node) -> None:
+        try:
+            self._verifier(node)
+        except Exception as e:
+            self.log.warning("Couldn't verify announced node {}: {}".format(node.checksum_public_address, e))
+        finally:
+            with self.__idle:
+                self.__pending.discard(node.checksum_public_address)
+                if not self.__pending:
+                    self.__idle.notify_all()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Blocks until there's nothing left to verify; returns False if timeout ran out first."""
+        with self.__idle:
+            return self.__idle.wait_for(lambda: not self.__pending, timeout=timeout)
+
+    def metrics(self) -> dict:
+        return dict(pending=len(self),
+                    queued=self.queued,
+                    duplicates=self.duplicates,
+                    throttled=self.throttled,
+                    overflowed=self.overflowed)
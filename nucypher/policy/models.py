@@ -1,9 +1,13 @@
 import binascii
+import itertools
+import os
 from abc import abstractmethod
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
+from functools import partial
 
 import maya
 import msgpack
+import time
 import uuid
 from bytestring_splitter import BytestringSplitter, VariableLengthBytestring
 from constant_sorrow import constants
@@ -11,12 +15,13 @@ from eth_utils import to_canonical_address, to_checksum_address
 from typing import Generator, List, Set
 from umbral.config import default_params
 from umbral.fragments import KFrag
+from umbral.keys import UmbralPublicKey
 from umbral.pre import Capsule
 
 from nucypher.characters.lawful import Alice
 from nucypher.characters.lawful import Bob, Ursula, Character
 from nucypher.crypto.api import keccak_digest, encrypt_and_sign, secure_random
-from nucypher.crypto.constants import PUBLIC_ADDRESS_LENGTH, KECCAK_DIGEST_LENGTH
+from nucypher.crypto.constants import PUBLIC_ADDRESS_LENGTH, KECCAK_DIGEST_LENGTH, CAPSULE_LENGTH
 from nucypher.crypto.kits import UmbralMessageKit
 from nucypher.crypto.powers import SigningPower, EncryptingPower
 from nucypher.crypto.signing import Signature
@@ -72,6 +77,13 @@ class Arrangement:
         # We don't need the signature separately.
         return self.alice.encrypt_for(self.ursula, self.payload())[0]
 
+    def encrypt_offer_for_ursula(self):
+        """
+        Craft an offer which already carries the KFrag, for Ursulas who can accept
+        the Arrangement and the KFrag at once (see FederatedPolicy).
+        """
+        return self.alice.encrypt_for(self.ursula, bytes(self) + self.payload())[0]
+
     def payload(self):
         # TODO: Ship the expiration again?
         # Or some other way of alerting Ursula to
@@ -85,12 +97,16 @@ class Arrangement:
         """
         raise NotImplementedError
 
-    @abstractmethod
-    def revoke(self):
+    @staticmethod
+    def revocation_message(arrangement_id: bytes) -> bytes:
+        return b"REVOKE-" + arrangement_id
+
+    def revoke(self, network_middleware):
         """
-        Publish arrangement.
+        Ask this Arrangement's Ursula to forget it, and its KFrag.
         """
-        raise NotImplementedError
+        signature = self.alice.stamp(self.revocation_message(self.id))
+        return network_middleware.revoke_arrangement(self.ursula, self.id, bytes(signature))
 
 
 class Policy:
@@ -141,6 +157,11 @@ class Policy:
         such that we don't have enough KFrags to give to each Ursula.
         """
 
+    class NotEnacted(RuntimeError):
+        """
+        Why a Policy wasn't enacted (see enact_many), when an Ursula turned away its KFrags.
+        """
+
     @property
     def n(self) -> int:
         return len(self.kfrags)
@@ -172,7 +193,8 @@ class Policy:
             raise RuntimeError("Alice hasn't learned of any nodes.  Thus, she can't push the TreasureMap.")
 
         responses = dict()
-        for node in self.alice.known_nodes.values():
+        # Alice's records of the nodes are enough to reach them; there's no need to build each one.
+        for node in self.alice.known_nodes.records():
             # TODO: It's way overkill to push this to every node we know about.  Come up with a system.  342
             response = network_middleware.put_treasure_map_on_node(node,
                                                                    self.treasure_map.public_id(),
@@ -199,6 +221,8 @@ class Policy:
         #                                           "Call make_arrangements to make more.")
 
         for kfrag in self.kfrags:
+            if kfrag in self._enacted_arrangements:
+                continue  # This KFrag went out along with its Arrangement.
             for arrangement in self._accepted_arrangements:
                 if not arrangement in self._enacted_arrangements.values():
                     arrangement.kfrag = kfrag
@@ -234,6 +258,73 @@ class Policy:
             if publish is True:
                 return self.publish(network_middleware)
 
+    @classmethod
+    def enact_many(cls, policies, network_middleware, publish=True) -> dict:
+        """
+        Enact several Policies from the same Alice at once.
+
+        All of the KFrags bound for the same Ursula - typically one from each Policy -
+        are uploaded to her in a single request, signed once by Alice.
+
+        A Policy whose KFrags can't all be assigned, or which has a KFrag in a batch that an Ursula turned away,
+        isn't enacted: its TreasureMap is left as it was, and it isn't published.
+
+        :return: The Policies which weren't enacted, each with an exception saying why.
+        """
+        policies = list(policies)
+        alices = {policy.alice for policy in policies}
+        if len(alices) > 1:
+            raise ValueError("Policies can only be enacted together if they all have the same Alice.")
+
+        failures = dict()  # type: dict
+        arrangements_by_ursula = defaultdict(list)
+        for policy in policies:
+            try:
+                arrangements = list(policy.__assign_kfrags())
+            except cls.MoreKFragsThanArrangements as e:
+                failures[policy] = e
+                continue
+            for arrangement in arrangements:
+                arrangements_by_ursula[arrangement.ursula].append((policy, arrangement))
+
+        for ursula, policies_and_arrangements in arrangements_by_ursula.items():
+            kfrags_payload = bytes().join(
+                arrangement.id + bytes(VariableLengthBytestring(arrangement.encrypt_payload_for_ursula().to_bytes()))
+                for _policy, arrangement in policies_and_arrangements)
+            alice = policies_and_arrangements[0][1].alice
+            signature = alice.stamp(cls.kfrags_message(bytes(ursula.stamp), kfrags_payload))
+            payload = bytes(signature) + bytes(alice.stamp) + kfrags_payload
+
+            response = network_middleware.enact_policies(ursula, payload)
+
+            if response.status_code != 200:
+                error = cls.NotEnacted("Ursula {} turned away a batch of {} KFrags: {} - {}".format(
+                    ursula.checksum_public_address, len(policies_and_arrangements),
+                    response.status_code, response.content))
+                for policy, _arrangement in policies_and_arrangements:
+                    failures.setdefault(policy, error)
+
+        enacted = [policy for policy in policies if policy not in failures]
+        for policy in enacted:
+            for arrangement in policy._enacted_arrangements.values():
+                policy.treasure_map.add_arrangement(arrangement)
+
+        if publish is True:
+            for policy in enacted:
+                policy.publish(network_middleware)
+
+        return failures
+
+    @staticmethod
+    def kfrags_message(ursula_verifying_key: bytes, kfrags_payload: bytes) -> bytes:
+        """What Alice signs to send a batch of KFrags to the Ursula with this verifying key (and only her)."""
+        return ursula_verifying_key + kfrags_payload
+
+    @staticmethod
+    def arrangements_message(ursula_verifying_key: bytes, arrangements_payload: bytes) -> bytes:
+        """What Alice signs to offer a batch of Arrangements to the Ursula with this verifying key (and only her)."""
+        return b"ARRANGE-" + ursula_verifying_key + arrangements_payload
+
     def consider_arrangement(self, network_middleware, ursula, arrangement):
 
         try:
@@ -286,6 +377,12 @@ class Policy:
 
 
 class FederatedPolicy(Policy):
+    """
+    A Policy with Ursulas chosen by Alice herself, whom she trusts without a blockchain.
+
+    Since there is nothing to negotiate, each KFrag travels along with its Arrangement
+    in a single offer, and Ursula accepts (storing both) or rejects it in one go.
+    """
     _arrangement_class = Arrangement
 
     def __init__(self, ursulas: Set[Ursula], *args, **kwargs) -> None:
@@ -298,29 +395,108 @@ class FederatedPolicy(Policy):
                           expiration: maya.MayaDT,
                           handpicked_ursulas: Set[Ursula] = None) -> None:
 
-        if handpicked_ursulas is None:
-            ursulas = set()  # type: set
-        else:
-            ursulas = handpicked_ursulas
-        ursulas.update(self.ursulas)
-
-        if len(ursulas) < self.n:
-            raise ValueError(
-                "To make a Policy in federated mode, you need to designate *all* '  \
-                 the Ursulas you need (in this case, {}); there's no other way to ' \
-                 know which nodes to use.  Either pass them here or when you make ' \
-                 the Policy.".format(self.n))
+        # Handpicked Ursulas get the first offers; the rest are only drawn on (and so, if they're
+        # Alice's known nodes, built) as they're needed.
+        handpicked_ursulas = handpicked_ursulas or set()
+        ursulas = itertools.chain(handpicked_ursulas, (u for u in self.ursulas if u not in handpicked_ursulas))
 
         # TODO: One of these layers needs to add concurrency.
 
-        self._consider_arrangements(network_middleware,
-                                    candidate_ursulas=ursulas,
-                                    deposit=deposit,
-                                    expiration=expiration)
-
-        if len(self._accepted_arrangements) < self.n:
+        offers = self._offer_arrangements_with_kfrags(network_middleware,
+                                                      candidate_ursulas=ursulas,
+                                                      deposit=deposit,
+                                                      expiration=expiration)
+
+        if len(self._enacted_arrangements) < self.n:
+            if offers < self.n:
+                raise ValueError(
+                    "To make a Policy in federated mode, you need to designate *all* '  \
+                     the Ursulas you need (in this case, {}); there's no other way to ' \
+                     know which nodes to use.  Either pass them here or when you make ' \
+                     the Policy.".format(self.n))
             raise self.MoreKFragsThanArrangements
 
+    @classmethod
+    def arrange_many(cls,
+                     policies,
+                     ursulas: Set[Ursula],
+                     network_middleware: RestMiddleware,
+                     deposit: int,
+                     expiration: maya.MayaDT) -> None:
+        """
+        Arrange several Policies from the same Alice with the same Ursulas at once, leaving their KFrags
+        to be uploaded by enact_many.
+
+        Each Ursula is offered an Arrangement for every one of the Policies in a single request, signed once
+        by Alice.  If she turns the request away, all of its Arrangements are rejected, and the Policies
+        will be short of accepted Arrangements when enact_many comes to assign their KFrags.
+        """
+        policies = list(policies)
+        alices = {policy.alice for policy in policies}
+        if len(alices) > 1:
+            raise ValueError("Policies can only be arranged together if they all have the same Alice.")
+        alice = policies[0].alice
+
+        for ursula in ursulas:
+            arrangements = [(policy, policy._arrangement_class(alice=alice,
+                                                               ursula=ursula,
+                                                               value=deposit,
+                                                               expiration=expiration))
+                            for policy in policies]
+            arrangements_payload = bytes().join(bytes(arrangement) for _policy, arrangement in arrangements)
+            signature = alice.stamp(cls.arrangements_message(bytes(ursula.stamp), arrangements_payload))
+            payload = bytes(signature) + bytes(alice.stamp) + arrangements_payload
+
+            response = network_middleware.consider_arrangements(ursula, payload)
+
+            accepted = response.status_code == 200
+            for policy, arrangement in arrangements:
+                bucket = policy._accepted_arrangements if accepted else policy._rejected_arrangements
+                bucket.add(arrangement)
+
+    def _offer_arrangements_with_kfrags(self,
+                                        network_middleware: RestMiddleware,
+                                        candidate_ursulas: List[Ursula],
+                                        deposit: int,
+                                        expiration: maya.MayaDT) -> int:
+        """Offers candidate Ursulas Arrangements, each with a KFrag, until every KFrag is taken; returns how many."""
+        unassigned_kfrags = [kfrag for kfrag in self.kfrags if kfrag not in self._enacted_arrangements]
+
+        offers = 0
+        for selected_ursula in candidate_ursulas:
+            if not unassigned_kfrags:
+                break
+            offers += 1
+
+            kfrag = unassigned_kfrags[-1]
+            arrangement = self._arrangement_class(alice=self.alice,
+                                                  ursula=selected_ursula,
+                                                  value=deposit,
+                                                  expiration=expiration,
+                                                  kfrag=kfrag,
+                                                  )
+
+            # As in consider_arrangement; a node we've verified before isn't called back again.
+            # One that doesn't check out is passed over, as one that turns the offer down is.
+            try:
+                selected_ursula.verify_node(network_middleware, accept_federated_only=arrangement.federated)
+            except selected_ursula.SuspiciousActivity:  # Including InvalidNode
+                self._rejected_arrangements.add(arrangement)
+                continue
+
+            offer = arrangement.encrypt_offer_for_ursula()
+            response = network_middleware.offer_arrangement_with_kfrag(selected_ursula, offer.to_bytes())
+
+            if response.status_code == 200:
+                self._accepted_arrangements.add(arrangement)
+                self._enacted_arrangements[kfrag] = arrangement
+                self.treasure_map.add_arrangement(arrangement)
+                unassigned_kfrags.pop()
+            else:
+                self._rejected_arrangements.add(arrangement)
+
+        return offers
+
 
 class TreasureMap:
     splitter = BytestringSplitter(Signature,
@@ -467,6 +643,13 @@ class TreasureMap:
 
 
 class WorkOrder(object):
+    # On the wire: Bob's signature and verifying key, a version byte, the receipt, and then the capsules, back to back.
+    PAYLOAD_VERSION = b"\x01"
+    _LEGACY_MSGPACK_PAYLOAD = b"\x92"  # How a msgpack'd (receipt, capsules) pair begins.
+
+    _header_splitter = BytestringSplitter(Signature) + key_splitter
+    _receipt_splitter = BytestringSplitter((bytes, VariableLengthBytestring))
+
     def __init__(self, bob, arrangement_id, capsules, receipt_bytes,
                  receipt_signature, ursula=None) -> None:
         self.bob = bob
@@ -475,12 +658,13 @@ class WorkOrder(object):
         self.receipt_bytes = receipt_bytes
         self.receipt_signature = receipt_signature
         self.ursula = ursula  # TODO: We may still need a more elegant system for ID'ing Ursula.  See #136.
+        self.completed = None
 
     def __repr__(self):
         return "WorkOrder for hrac {hrac}: (capsules: {capsule_bytes}) for Ursula: {node}".format(
             hrac=self.arrangement_id.hex()[:6],
             capsule_bytes=[binascii.hexlify(bytes(cap))[:6] for cap in self.capsules],
-            node=binascii.hexlify(bytes(self.ursula.stamp))[:6])
+            node=binascii.hexlify(bytes(self.ursula.stamp))[:6] if self.ursula else None)
 
     def __eq__(self, other):
         return (self.receipt_bytes, self.receipt_signature) == (
@@ -497,54 +681,265 @@ class WorkOrder(object):
                    ursula)
 
     @classmethod
-    def from_rest_payload(cls, arrangement_id, rest_payload):
-        payload_splitter = BytestringSplitter(Signature) + key_splitter
-        signature, bob_pubkey_sig, (receipt_bytes, packed_capsules) = payload_splitter(rest_payload,
-                                                                                       msgpack_remainder=True)
-        capsules = [Capsule.from_bytes(p, params=default_params()) for p in msgpack.loads(packed_capsules)]
+    def from_rest_payload(cls, arrangement_id, rest_payload, executor=None, on_capsule=None, admit=None):
+        """
+        Bob's signature is checked before any capsules are decoded.  Given an executor, the capsules
+        are decoded on it, in parallel; on_capsule, if given, is called with each capsule, in order,
+        as soon as it's ready, so that work on the first capsules can start while the rest are decoded.
+
+        admit, if given, is called with Bob's verifying key and the number of capsules once his
+        signature checks out, and can raise to turn the WorkOrder away before any capsules are decoded.
+        """
+        signature, bob_pubkey_sig, body = cls._header_splitter(rest_payload, return_remainder=True)
+        version, body = body[:1], body[1:]
+        if version == cls.PAYLOAD_VERSION:
+            receipt_bytes, packed_capsules = cls._receipt_splitter(body, return_remainder=True)
+            capsules_as_bytes = cls._split_capsules(packed_capsules)
+        elif version == cls._LEGACY_MSGPACK_PAYLOAD:
+            # TODO: Stop accepting these once every Bob sends the current version.
+            receipt_bytes, packed_capsules = msgpack.loads(version + body)
+            capsules_as_bytes = msgpack.loads(packed_capsules)
+        else:
+            raise ValueError("Unknown WorkOrder payload version {}.".format(version))
+
         verified = signature.verify(receipt_bytes, bob_pubkey_sig)
         if not verified:
             raise ValueError("This doesn't appear to be from Bob.")
+
+        if admit is not None:
+            admit(bob_pubkey_sig, len(capsules_as_bytes))
+
+        capsules = []
+        for capsule in cls._decode_capsules(capsules_as_bytes, executor=executor):
+            capsules.append(capsule)
+            if on_capsule is not None:
+                on_capsule(capsule)
+
         bob = Bob.from_public_keys({SigningPower: bob_pubkey_sig})
         return cls(bob, arrangement_id, capsules, receipt_bytes, signature)
 
+    @staticmethod
+    def _split_capsules(packed_capsules: bytes) -> List[bytes]:
+        if len(packed_capsules) % CAPSULE_LENGTH:
+            raise ValueError("Capsules are {} bytes each; got {} bytes of them.".format(CAPSULE_LENGTH,
+                                                                                      len(packed_capsules)))
+        return [packed_capsules[i:i + CAPSULE_LENGTH] for i in range(0, len(packed_capsules), CAPSULE_LENGTH)]
+
+    @staticmethod
+    def _decode_capsules(capsules_as_bytes, executor=None):
+        params = default_params()  # Once, rather than once per capsule.
+        decode = partial(Capsule.from_bytes, params=params)
+        if executor is None:
+            return map(decode, capsules_as_bytes)
+        else:
+            return executor.map(decode, capsules_as_bytes)
+
+    @classmethod
+    def from_datastore_record(cls, record):
+        """
+        Rebuilds a WorkOrder from the Workorder row in which Ursula saved it.
+        """
+        bob_pubkey_sig = UmbralPublicKey.from_bytes(record.bob_pubkey_sig.key_data)
+        bob = Bob.from_public_keys({SigningPower: bob_pubkey_sig})
+        capsules = list(cls._decode_capsules(cls._split_capsules(record.capsules)))
+        return cls(bob, binascii.unhexlify(record.arrangement_id), capsules, record.receipt_bytes,
+                   Signature.from_bytes(record.bob_signature))
+
+    def packed_capsules(self) -> bytes:
+        return b"".join(bytes(capsule) for capsule in self.capsules)
+
     def payload(self):
-        capsules_as_bytes = [bytes(p) for p in self.capsules]
-        packed_receipt_and_capsules = msgpack.dumps(
-            (self.receipt_bytes, msgpack.dumps(capsules_as_bytes)))
-        return bytes(self.receipt_signature) + self.bob.stamp + packed_receipt_and_capsules
+        return bytes(self.receipt_signature) + self.bob.stamp + self.PAYLOAD_VERSION \
+               + bytes(VariableLengthBytestring(self.receipt_bytes)) + self.packed_capsules()
 
     def complete(self, cfrags):
         # TODO: Verify that this is in fact complete - right number of CFrags and properly signed.
-        # TODO: Mark it complete with datetime.
-        pass
+        self.completed = maya.now()
 
 
 class WorkOrderHistory:
+    """
+    Bob's record of the WorkOrders he has issued, indexed both by Ursula and by capsule digest,
+    so that checking or finding the WorkOrders for a capsule doesn't mean scanning all of them.
+
+    If max_entries is given, the oldest entries are evicted to make room for new ones; completed or
+    old entries can also be evicted on demand.  If filepath is given, the history is appended to that file
+    as it changes - one record per WorkOrder, however many capsules it has - and read back (and compacted)
+    when the history is made again; close() it when done.
+
+    WorkOrders read back from the file don't know their Ursulas; given find_node, a function of an
+    Ursula's checksum address, they're reunited with them when they're looked up.
+    """
 
-    def __init__(self) -> None:
-        self.by_ursula = {}  # type: dict
+    _record_splitter = BytestringSplitter((bytes, 1),
+                                          *[(bytes, VariableLengthBytestring)] * 6)
+    _SAVED = b"+"
+    _FORGOTTEN = b"-"
 
-    def __contains__(self, item):
-        assert False
+    def __init__(self, max_entries: int = None, filepath: str = None, find_node=None) -> None:
+        self.max_entries = max_entries
+        self.filepath = filepath
+        self._find_node = find_node
 
-    def __getitem__(self, item):
-        return self.by_ursula.setdefault(item, {})
+        self.by_ursula = {}  # type: dict  # ursula_id -> {capsule digest: WorkOrder}
+        self._by_capsule = {}  # type: dict  # capsule digest -> {ursula_id: WorkOrder}
+        self._saved_at = OrderedDict()  # type: OrderedDict  # (ursula_id, capsule digest) -> epoch, oldest first
 
-    def __setitem__(self, key, value):
-        assert False
+        self._file = None
+        if filepath:
+            self._load()
 
     def __len__(self):
-        return sum(len(work_orders) for work_orders in self.by_ursula.values())
+        return len(self._saved_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
 
     @property
     def ursulas(self):
         return self.by_ursula.keys()
 
+    @staticmethod
+    def capsule_digest(capsule) -> bytes:
+        return keccak_digest(bytes(capsule))
+
+    def contains(self, ursula_id, capsule_digest: bytes) -> bool:
+        return capsule_digest in self.by_ursula.get(ursula_id, ())
+
     def by_capsule(self, capsule):
-        ursulas_by_capsules = {}  # type: dict
-        for ursula, capsules in self.by_ursula.items():
-            for saved_capsule, work_order in capsules.items():
-                if saved_capsule == capsule:
-                    ursulas_by_capsules[ursula] = work_order
-        return ursulas_by_capsules
+        work_orders = dict(self._by_capsule.get(self.capsule_digest(capsule), {}))
+        for ursula_id, work_order in work_orders.items():
+            self._reunite(ursula_id, work_order)
+        return work_orders
+
+    def _reunite(self, ursula_id, work_order) -> None:
+        if work_order.ursula is None and self._find_node is not None:
+            try:
+                work_order.ursula = self._find_node(ursula_id)
+            except KeyError:
+                pass  # Not known yet; maybe next time.
+
+    def save(self, ursula_id, capsule, work_order, capsule_digest: bytes = None) -> None:
+        self.save_work_order(ursula_id, work_order, [capsule_digest or self.capsule_digest(capsule)])
+
+    def save_work_order(self, ursula_id, work_order, capsule_digests: List[bytes] = None) -> None:
+        """Saves work_order for each of capsule_digests (by default, all of its capsules), in a single record."""
+        if capsule_digests is None:
+            capsule_digests = [self.capsule_digest(capsule) for capsule in work_order.capsules]
+        if not capsule_digests:
+            return
+        saved_at = time.time()
+        for capsule_digest in capsule_digests:
+            self._add(ursula_id, capsule_digest, work_order, saved_at)
+        self._append_records([self._record(self._SAVED, ursula_id, b"".join(capsule_digests), work_order, saved_at)])
+
+        if self.max_entries is not None and len(self._saved_at) > self.max_entries:
+            self._forget_all(list(itertools.islice(self._saved_at, len(self._saved_at) - self.max_entries)))
+
+    def save_completed(self, ursula_id, work_order) -> None:
+        """Saves work_order again, now that it's complete, so that that's remembered too."""
+        capsule_digests = [capsule_digest for capsule_digest in map(self.capsule_digest, work_order.capsules)
+                           if self.contains(ursula_id, capsule_digest)]
+        self.save_work_order(ursula_id, work_order, capsule_digests)
+
+    def forget(self, ursula_id, capsule_digest: bytes) -> None:
+        self._forget_all([(ursula_id, capsule_digest)])
+
+    def forget_completed(self) -> int:
+        """Evicts the WorkOrders for which Bob already has his CFrags; returns how many entries went."""
+        return self._forget_where(lambda work_order, saved_at: work_order.completed is not None)
+
+    def forget_older_than(self, seconds: float) -> int:
+        """Evicts the entries saved more than this many seconds ago; returns how many went."""
+        cutoff = time.time() - seconds
+        return self._forget_where(lambda work_order, saved_at: saved_at < cutoff)
+
+    def _forget_where(self, predicate) -> int:
+        doomed = [(ursula_id, capsule_digest) for (ursula_id, capsule_digest), saved_at in self._saved_at.items()
+                  if predicate(self.by_ursula[ursula_id][capsule_digest], saved_at)]
+        self._forget_all(doomed)
+        return len(doomed)
+
+    def _forget_all(self, doomed) -> None:
+        for ursula_id, capsule_digest in doomed:
+            self._remove(ursula_id, capsule_digest)
+        self._append_records([self._record(self._FORGOTTEN, ursula_id, capsule_digest)
+                              for ursula_id, capsule_digest in doomed])
+
+    def _add(self, ursula_id, capsule_digest, work_order, saved_at):
+        self._saved_at.pop((ursula_id, capsule_digest), None)
+        self._saved_at[(ursula_id, capsule_digest)] = saved_at
+        self.by_ursula.setdefault(ursula_id, {})[capsule_digest] = work_order
+        self._by_capsule.setdefault(capsule_digest, {})[ursula_id] = work_order
+
+    def _remove(self, ursula_id, capsule_digest):
+        if self._saved_at.pop((ursula_id, capsule_digest), None) is None:
+            return
+        for index, outer, inner in ((self.by_ursula, ursula_id, capsule_digest),
+                                    (self._by_capsule, capsule_digest, ursula_id)):
+            del index[outer][inner]
+            if not index[outer]:
+                del index[outer]
+
+    def _record(self, kind, ursula_id, capsule_digests: bytes, work_order=None, saved_at=None):
+        if work_order is None:
+            arrangement_id = payload = saved_at_bytes = completed_bytes = b""
+        else:
+            arrangement_id, payload = work_order.arrangement_id, work_order.payload()
+            saved_at_bytes = repr(saved_at).encode()
+            completed_bytes = work_order.completed.iso8601().encode() if work_order.completed else b""
+        fields = (ursula_id.encode(), capsule_digests, arrangement_id, payload, saved_at_bytes, completed_bytes)
+        return kind + b"".join(bytes(VariableLengthBytestring(field)) for field in fields)
+
+    def _append_records(self, records: List[bytes]) -> None:
+        if self._file is not None and records:
+            self._file.write(b"".join(records))
+            self._file.flush()
+
+    def _load(self):
+        try:
+            with open(self.filepath, "rb") as history_file:
+                records = self._record_splitter.repeat(history_file.read())
+        except FileNotFoundError:
+            records = []
+
+        for kind, ursula_id, capsule_digests, arrangement_id, payload, saved_at, completed in records:
+            ursula_id = ursula_id.decode()
+            capsule_digests = [capsule_digests[i:i + KECCAK_DIGEST_LENGTH]
+                               for i in range(0, len(capsule_digests), KECCAK_DIGEST_LENGTH)]
+            if kind == self._FORGOTTEN:
+                for capsule_digest in capsule_digests:
+                    self._remove(ursula_id, capsule_digest)
+                continue
+            work_order = WorkOrder.from_rest_payload(arrangement_id, payload)
+            if completed:
+                work_order.completed = maya.parse(completed.decode())
+            for capsule_digest in capsule_digests:
+                self._add(ursula_id, capsule_digest, work_order, float(saved_at.decode()))
+
+        if self.max_entries is not None:
+            while len(self._saved_at) > self.max_entries:
+                self._remove(*next(iter(self._saved_at)))
+
+        # Compact: rewrite only what's still remembered, then append from there.
+        compacted_filepath = self.filepath + ".compacting"
+        def work_order_saved(entry):
+            (ursula_id, capsule_digest), saved_at = entry
+            return ursula_id, id(self.by_ursula[ursula_id][capsule_digest]), saved_at
+
+        with open(compacted_filepath, "wb") as compacted_file:
+            for (ursula_id, _, saved_at), entries in itertools.groupby(self._saved_at.items(), key=work_order_saved):
+                capsule_digests = [capsule_digest for (_ursula_id, capsule_digest), _saved_at in entries]
+                work_order = self.by_ursula[ursula_id][capsule_digests[0]]
+                compacted_file.write(self._record(self._SAVED, ursula_id, b"".join(capsule_digests),
+                                                  work_order, saved_at))
+        os.replace(compacted_filepath, self.filepath)
+        self._file = open(self.filepath, "ab")
@@ -0,0 +1,37 @@
+from urllib.parse import urlsplit
+
+from apistar import TestClient
+
+from nucypher.network.async_middleware import AsyncRestMiddleware, AsyncResponse
+from nucypher.utilities.sandbox.constants import TEST_KNOWN_URSULAS_CACHE
+
+
+class MockAsyncRestMiddleware(AsyncRestMiddleware):
+    """
+    AsyncRestMiddleware that sends its requests straight to the test Ursulas' REST apps, by port, as
+    MockRestMiddleware does; everything else (checking responses, splitting CFrags, timing) is as it would be.
+    """
+
+    def _get_mock_client_by_url(self, url):
+        port = urlsplit(url).port
+        try:
+            ursula = TEST_KNOWN_URSULAS_CACHE[port]
+        except KeyError:
+            raise RuntimeError(
+                "Can't find an Ursula with port {} - did you spin up the right test ursulas?".format(port))
+        return TestClient(ursula.rest_app)
+
+    @staticmethod
+    def _local_url(url):
+        return "http://localhost{}".format(urlsplit(url).path)
+
+    async def _request(self, method, url, certificate_filepath, data=None) -> AsyncResponse:
+        response = self._get_mock_client_by_url(url).request(method, self._local_url(url), data=data)
+        return AsyncResponse(response.status_code, response.content, response.headers)
+
+    async def _stream(self, url, certificate_filepath, data, timeout: float):
+        response = self._get_mock_client_by_url(url).post(self._local_url(url), data, stream=True, timeout=timeout)
+        if not response.status_code == 200:
+            raise RuntimeError("Bad response: {}".format(response.content))
+        for chunk in response.iter_content(chunk_size=None):
+            yield chunk
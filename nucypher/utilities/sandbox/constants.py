@@ -1,6 +1,7 @@
 import os
 
 from nucypher.blockchain.eth import constants
+from nucypher.network.throttling import AdmissionControl
 
 TEST_KNOWN_URSULAS_CACHE = {}
 
@@ -8,6 +9,10 @@ TEST_URSULA_STARTING_PORT = 7468
 
 DEFAULT_NUMBER_OF_URSULAS_IN_DEVELOPMENT_NETWORK = 10
 
+# Every test client has the same address, so the test Ursulas don't limit how often it learns from them.
+TEST_URSULA_RATE_LIMITS = {route: limit for route, limit in AdmissionControl.DEFAULT_LIMITS.items()
+                           if route != 'node_metadata'}
+
 DEVELOPMENT_TOKEN_AIRDROP_AMOUNT = 1000000 * int(constants.M)
 
 DEVELOPMENT_ETH_AIRDROP_AMOUNT = 10 ** 6 * 10 ** 18  # wei -> ether
@@ -35,17 +35,36 @@ class MockRestMiddleware(RestMiddleware):
         assert response.status_code == 200
         return response
 
+    def offer_arrangement_with_kfrag(self, ursula, payload):
+        mock_client = self._get_mock_client_by_ursula(ursula)
+        return mock_client.post("http://localhost/consider_arrangement/kFrag", payload)
+
+    def consider_arrangements(self, ursula, payload):
+        mock_client = self._get_mock_client_by_ursula(ursula)
+        return mock_client.post("http://localhost/consider_arrangements", payload)
+
     def enact_policy(self, ursula, id, payload):
         mock_client = self._get_mock_client_by_ursula(ursula)
         response = mock_client.post('http://localhost/kFrag/{}'.format(id.hex()), payload)
         assert response.status_code == 200
         return True, ursula.stamp.as_umbral_pubkey()
 
-    def send_work_order_payload_to_ursula(self, work_order):
+    def enact_policies(self, ursula, payload):
+        mock_client = self._get_mock_client_by_ursula(ursula)
+        return mock_client.post('http://localhost/kFrags', payload)
+
+    def revoke_arrangement(self, ursula, arrangement_id, signature):
+        mock_client = self._get_mock_client_by_ursula(ursula)
+        response = mock_client.delete('http://localhost/kFrag/{}'.format(arrangement_id.hex()), data=signature)
+        assert response.status_code == 200
+        return response
+
+    def send_work_order_payload_to_ursula(self, work_order, stream=False, timeout=None):
         mock_client = self._get_mock_client_by_ursula(work_order.ursula)
         payload = work_order.payload()
         id_as_hex = work_order.arrangement_id.hex()
-        return mock_client.post('http://localhost/kFrag/{}/reencrypt'.format(id_as_hex), payload)
+        return mock_client.post('http://localhost/kFrag/{}/reencrypt'.format(id_as_hex), payload,
+                                stream=stream, timeout=timeout)
 
     def get_treasure_map_from_node(self, node, map_id):
         mock_client = self._get_mock_client_by_ursula(node)
@@ -75,6 +94,11 @@ class MockRestMiddleware(RestMiddleware):
                                        verify=certificate_filepath)
         return response
 
+    def get_nodes_closest_to(self, node, canonical_address, certificate_filepath):
+        mock_client = self._get_mock_client_by_ursula(node)
+        return mock_client.get("http://localhost/node_metadata/closest/{}".format(canonical_address.hex()),
+                               verify=certificate_filepath)
+
     def put_treasure_map_on_node(self, node, map_id, map_payload):
         mock_client = self._get_mock_client_by_ursula(node)
         certificate_filepath = node.certificate_filepath
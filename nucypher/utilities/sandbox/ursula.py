@@ -10,6 +10,7 @@ from nucypher.config.characters import UrsulaConfiguration
 from nucypher.crypto.api import secure_random
 from nucypher.utilities.sandbox.constants import (DEFAULT_NUMBER_OF_URSULAS_IN_DEVELOPMENT_NETWORK,
                                                   TEST_URSULA_STARTING_PORT,
+                                                  TEST_URSULA_RATE_LIMITS,
                                                   TEST_KNOWN_URSULAS_CACHE)
 
 
@@ -18,6 +19,8 @@ def make_federated_ursulas(ursula_config: UrsulaConfiguration,
                            know_each_other: bool = True,
                            **ursula_overrides) -> Set[Ursula]:
 
+    ursula_overrides.setdefault('rate_limits', TEST_URSULA_RATE_LIMITS)
+
     if not TEST_KNOWN_URSULAS_CACHE:
         starting_port = TEST_URSULA_STARTING_PORT
     else:
@@ -53,6 +56,8 @@ def make_decentralized_ursulas(ursula_config: UrsulaConfiguration,
                                know_each_other: bool = True,
                                **ursula_overrides) -> Set[Ursula]:
 
+    ursula_overrides.setdefault('rate_limits', TEST_URSULA_RATE_LIMITS)
+
     if isinstance(ether_addresses, int):
         ether_addresses = [to_checksum_address(secure_random(20)) for _ in range(ether_addresses)]
 
@@ -6,12 +6,16 @@ VERSION = '0.1'
 # NOTE: Use Pipfile & Pipfile.lock to manage dependencies\
 INSTALL_REQUIRES = []
 TESTS_REQUIRE = []
+EXTRAS_REQUIRE = {
+    'testing': TESTS_REQUIRE,
+    'async': ['aiohttp'],  # For nucypher.network.async_middleware
+}
 
 setup(name='nucypher',
       version=VERSION,
       description='A proxy re-encryption network to empower privacy in decentralized systems.',
       install_requires=INSTALL_REQUIRES,
-      extras_require={'testing': TESTS_REQUIRE},
+      extras_require=EXTRAS_REQUIRE,
       packages=find_packages(),
       package_data={'nucypher': [
           'blockchain/eth/*', 'project/contracts/*',
@@ -1,9 +1,15 @@
 import datetime
+from collections import defaultdict
+
 import maya
 import pytest
+from bytestring_splitter import VariableLengthBytestring
 from umbral.fragments import KFrag
 
+from nucypher.characters.lawful import Ursula
 from nucypher.crypto.api import keccak_digest
+from nucypher.keystore.keystore import NotFound
+from nucypher.policy.models import Arrangement, Policy
 from nucypher.utilities.sandbox.policy import MockPolicyCreation
 
 
@@ -77,3 +83,254 @@ def test_federated_grant(federated_alice, federated_bob):
         retrieved_kfrag = KFrag.from_bytes(retrieved_policy.k_frag)
 
         assert kfrag == retrieved_kfrag
+
+
+@pytest.mark.usefixtures('federated_ursulas')
+def test_federated_grant_many(federated_alice, federated_bob, bob_federated_test_config):
+    another_bob = bob_federated_test_config.produce()
+    bobs = [federated_bob, another_bob]
+
+    n = 3
+    policy_end_datetime = maya.now() + datetime.timedelta(days=5)
+    label = b"this_is_the_path_to_which_access_is_being_granted_to_many"
+
+    grants = federated_alice.grant_many(bobs, label, m=2, n=n, expiration=policy_end_datetime)
+
+    # Each Bob's Policy comes out as soon as it's granted, rather than once they all are.
+    first_bob, first_policy = next(grants)
+    policies = dict(grants)
+    assert first_bob not in policies
+    policies[first_bob] = first_policy
+
+    # One Policy for each Bob.
+    assert set(policies.keys()) == set(bobs)
+
+    # All of them share the same label-derived public key, which is the one Alice would have derived anyway.
+    public_keys = {bytes(policy.public_key) for policy in policies.values()}
+    assert public_keys == {bytes(federated_alice.create_policy(federated_bob, label, m=2, n=n).public_key)}
+
+    # All of the grants were offered to the same Ursulas.
+    ursulas_per_policy = [{a.ursula for a in policy._enacted_arrangements.values()} for policy in policies.values()]
+    assert ursulas_per_policy[0] == ursulas_per_policy[1]
+
+    for bob, policy in policies.items():
+        assert policy.bob == bob
+        assert len(policy._enacted_arrangements) == n
+
+        # Each Bob got his own KFrags.
+        for kfrag in policy.kfrags:
+            arrangement = policy._enacted_arrangements[kfrag]
+            retrieved_policy = arrangement.ursula.datastore.get_policy_arrangement(arrangement.id.hex().encode())
+            assert kfrag == KFrag.from_bytes(retrieved_policy.k_frag)
+
+
+@pytest.mark.usefixtures('federated_ursulas')
+def test_grant_many_makes_one_request_per_ursula_per_batch(federated_alice, bob_federated_test_config, monkeypatch):
+    middleware = federated_alice.network_middleware
+    requests_per_ursula = defaultdict(list)
+
+    for method_name in ('consider_arrangement', 'offer_arrangement_with_kfrag', 'enact_policy',
+                        'consider_arrangements', 'enact_policies'):
+        method = getattr(middleware, method_name)
+
+        def record(ursula, *args, method_name=method_name, method=method, **kwargs):
+            requests_per_ursula[ursula].append(method_name)
+            return method(ursula, *args, **kwargs)
+
+        monkeypatch.setattr(middleware, method_name, record)
+
+    bobs = [bob_federated_test_config.produce() for _ in range(5)]
+    policy_end_datetime = maya.now() + datetime.timedelta(days=5)
+    label = b"this_is_the_path_to_which_access_is_being_granted_in_batches_of_bobs"
+    policies = dict(federated_alice.grant_many(bobs, label, m=2, n=3, expiration=policy_end_datetime,
+                                               enactment_batch_size=3))
+
+    assert all(not isinstance(policy, Exception) for policy in policies.values())
+    assert len(requests_per_ursula) == 3
+
+    # However many Bobs there are, each batch of them costs each Ursula one request for the Arrangements
+    # and one for the KFrags.
+    for requests_made in requests_per_ursula.values():
+        assert sorted(requests_made) == ['consider_arrangements'] * 2 + ['enact_policies'] * 2
+
+    for policy in policies.values():
+        for kfrag, arrangement in policy._enacted_arrangements.items():
+            retrieved_policy = arrangement.ursula.datastore.get_policy_arrangement(arrangement.id.hex().encode())
+            assert kfrag == KFrag.from_bytes(retrieved_policy.k_frag)
+
+    # A batch of Arrangements is only good for the Ursula it was signed for.
+    ursula, someone_else = list(requests_per_ursula)[:2]
+    arrangement = Arrangement(alice=federated_alice, ursula=ursula, expiration=policy_end_datetime)
+    arrangements_payload = bytes(arrangement)
+    signature = federated_alice.stamp(Policy.arrangements_message(bytes(ursula.stamp), arrangements_payload))
+    payload = bytes(signature) + bytes(federated_alice.stamp) + arrangements_payload
+    assert middleware.consider_arrangements(someone_else, payload).status_code == 400
+    assert middleware.consider_arrangements(ursula, payload).status_code == 200
+    assert middleware.consider_arrangements(ursula, payload).status_code == 409
+    assert middleware.consider_arrangements(ursula, b"not a batch of arrangements").status_code == 400
+
+
+def test_grant_many_checks_its_parameters_before_granting_anything(federated_alice, federated_bob):
+    label = b"this_is_the_path_to_which_access_is_never_granted"
+    with pytest.raises(NotImplementedError):
+        federated_alice.grant_many([federated_bob], label, m=2, n=3, expiration=None)
+
+
+@pytest.mark.usefixtures('federated_ursulas')
+def test_federated_grant_offers_each_kfrag_along_with_its_arrangement(federated_alice, federated_bob, monkeypatch):
+    middleware = federated_alice.network_middleware
+    requests_made = []
+
+    for method_name in ('consider_arrangement', 'enact_policy', 'offer_arrangement_with_kfrag'):
+        method = getattr(middleware, method_name)
+
+        def record(*args, method_name=method_name, method=method, **kwargs):
+            requests_made.append(method_name)
+            return method(*args, **kwargs)
+
+        monkeypatch.setattr(middleware, method_name, record)
+
+    n = 3
+    policy_end_datetime = maya.now() + datetime.timedelta(days=5)
+    label = b"this_is_the_path_to_which_access_is_being_granted_in_one_round_trip"
+    policy = federated_alice.grant(federated_bob, label, m=2, n=n, expiration=policy_end_datetime)
+
+    # Exactly one request for each Ursula, which carried both the Arrangement and the KFrag.
+    assert requests_made == ['offer_arrangement_with_kfrag'] * n
+    assert len(policy._enacted_arrangements) == n
+    assert len(policy.treasure_map) == n
+
+    # Offering the same Arrangement again is refused, rather than blowing up Ursula's datastore.
+    arrangement = list(policy._enacted_arrangements.values())[0]
+    offer = arrangement.encrypt_offer_for_ursula()
+    response = middleware.offer_arrangement_with_kfrag(arrangement.ursula, offer.to_bytes())
+    assert response.status_code == 409
+
+    # And offers that can't even be read are bad requests.
+    assert middleware.offer_arrangement_with_kfrag(arrangement.ursula, b"not an offer").status_code == 400
+    unreadable_kfrag = federated_alice.encrypt_for(arrangement.ursula, bytes(arrangement) + b"not a kfrag")[0]
+    response = middleware.offer_arrangement_with_kfrag(arrangement.ursula, unreadable_kfrag.to_bytes())
+    assert response.status_code == 400
+
+
+@pytest.mark.usefixtures('federated_ursulas')
+def test_federated_grant_passes_over_ursulas_who_dont_check_out(federated_alice, federated_bob, monkeypatch):
+    impostor = list(federated_alice.known_nodes.values())[0]
+    verify_node = Ursula.verify_node
+
+    def verify_node_unless_impostor(node, *args, **kwargs):
+        if node.checksum_public_address == impostor.checksum_public_address:
+            raise node.InvalidNode("Wrong cryptographic material for this node - something fishy going on.")
+        return verify_node(node, *args, **kwargs)
+
+    monkeypatch.setattr(Ursula, "verify_node", verify_node_unless_impostor)
+
+    n = 3
+    policy_end_datetime = maya.now() + datetime.timedelta(days=5)
+    label = b"this_is_the_path_to_which_access_is_granted_despite_an_impostor"
+    policy = federated_alice.create_policy(federated_bob, label, m=2, n=n)
+    policy.make_arrangements(network_middleware=federated_alice.network_middleware,
+                             deposit=b"0000000",
+                             expiration=policy_end_datetime,
+                             handpicked_ursulas={impostor})
+
+    # The impostor's Arrangement was rejected, and the KFrags went to others instead.
+    rejected_addresses = {a.ursula.checksum_public_address for a in policy._rejected_arrangements}
+    assert rejected_addresses == {impostor.checksum_public_address}
+    assert len(policy._enacted_arrangements) == n
+    enacted_addresses = {a.ursula.checksum_public_address for a in policy._enacted_arrangements.values()}
+    assert impostor.checksum_public_address not in enacted_addresses
+
+
+@pytest.mark.usefixtures('federated_ursulas')
+def test_kfrags_for_many_arrangements_are_uploaded_to_each_ursula_at_once(federated_alice, federated_bob):
+    middleware = federated_alice.network_middleware
+    policy_end_datetime = maya.now() + datetime.timedelta(days=5)
+    label = b"this_is_the_path_to_which_access_is_being_granted_in_batches"
+
+    # Arrangements without their KFrags, as blockchain Policies make them, so that there are KFrags left to upload.
+    policy = federated_alice.create_policy(federated_bob, label, m=2, n=3)
+    ursulas = list(federated_alice.known_nodes.values())[:3]
+    policy._consider_arrangements(middleware, candidate_ursulas=ursulas, deposit=b"0000000",
+                                  expiration=policy_end_datetime)
+    Policy.enact_many([policy], network_middleware=middleware, publish=False)
+
+    for kfrag, arrangement in policy._enacted_arrangements.items():
+        retrieved_policy = arrangement.ursula.datastore.get_policy_arrangement(arrangement.id.hex().encode())
+        assert kfrag == KFrag.from_bytes(retrieved_policy.k_frag)
+
+    # A batch is only good for the Ursula it was signed for...
+    kfrag, arrangement = list(policy._enacted_arrangements.items())[0]
+    message_kit = arrangement.encrypt_payload_for_ursula()
+    kfrags_payload = arrangement.id + bytes(VariableLengthBytestring(message_kit.to_bytes()))
+    someone_else = next(u for u in ursulas if u != arrangement.ursula)
+    signature = federated_alice.stamp(Policy.kfrags_message(bytes(arrangement.ursula.stamp), kfrags_payload))
+    replayed = middleware._get_mock_client_by_ursula(someone_else).post(
+        "http://localhost/kFrags", bytes(signature) + bytes(federated_alice.stamp) + kfrags_payload)
+    assert replayed.status_code == 400
+
+    # ...and for Arrangements she has.
+    unknown_id = b"\x00" * Arrangement.ID_LENGTH
+    kfrags_payload = unknown_id + kfrags_payload[Arrangement.ID_LENGTH:]
+    signature = federated_alice.stamp(Policy.kfrags_message(bytes(arrangement.ursula.stamp), kfrags_payload))
+    response = middleware._get_mock_client_by_ursula(arrangement.ursula).post(
+        "http://localhost/kFrags", bytes(signature) + bytes(federated_alice.stamp) + kfrags_payload)
+    assert response.status_code == 404
+
+
+@pytest.mark.usefixtures('federated_ursulas')
+def test_policies_whose_kfrags_are_turned_away_are_not_enacted(federated_alice, federated_bob):
+    middleware = federated_alice.network_middleware
+    policy_end_datetime = maya.now() + datetime.timedelta(days=5)
+    ursulas = list(federated_alice.known_nodes.values())[:3]
+
+    policies = []
+    for label in (b"this_path_shares_a_batch", b"this_path_is_turned_away"):
+        policy = federated_alice.create_policy(federated_bob, label, m=2, n=3)
+        policy._consider_arrangements(middleware, candidate_ursulas=ursulas, deposit=b"0000000",
+                                      expiration=policy_end_datetime)
+        policies.append(policy)
+    _other_policy, turned_away_policy = policies
+
+    # One of the Ursulas forgets an Arrangement, and so turns away the batch of KFrags that includes it.
+    forgotten = next(iter(turned_away_policy._accepted_arrangements))
+    forgotten.ursula.datastore.del_policy_arrangement(forgotten.id.hex().encode())
+
+    failures = Policy.enact_many(policies, network_middleware=middleware, publish=False)
+
+    # Both Policies had a KFrag in that batch, so neither is enacted, nor gets a TreasureMap pointing at her.
+    assert set(failures) == set(policies)
+    assert all(isinstance(error, Policy.NotEnacted) for error in failures.values())
+    assert all(len(policy.treasure_map) == 0 for policy in policies)
+
+
+@pytest.mark.usefixtures('federated_ursulas')
+def test_federated_revoke_arrangement_evicts_cached_frags(federated_alice, federated_bob):
+    policy_end_datetime = maya.now() + datetime.timedelta(days=5)
+    label = b"this_is_the_path_to_which_access_is_being_revoked"
+    policy = federated_alice.grant(federated_bob, label, m=2, n=3, expiration=policy_end_datetime)
+
+    kfrag, arrangement = list(policy._enacted_arrangements.items())[0]
+    ursula = arrangement.ursula
+    id_as_hex = arrangement.id.hex()
+    ursula.kfrag_cache.put(id_as_hex, (kfrag, None))
+    ursula.cfrag_cache.put((id_as_hex, b"a capsule digest"), b"a cfrag")
+    ursula.cfrag_cache.put(("another arrangement", b"a capsule digest"), b"another cfrag")
+
+    # A revocation that isn't even a signature is a bad request, and revokes nothing.
+    client = federated_alice.network_middleware._get_mock_client_by_ursula(ursula)
+    response = client.delete("http://localhost/kFrag/{}".format(id_as_hex), b"not a signature")
+    assert response.status_code == 400
+    assert id_as_hex in ursula.kfrag_cache
+
+    # Nor is one for an id that isn't even hex.
+    response = client.delete("http://localhost/kFrag/not-hex", b"not a signature")
+    assert response.status_code == 400
+
+    arrangement.revoke(federated_alice.network_middleware)
+
+    assert id_as_hex not in ursula.kfrag_cache
+    assert (id_as_hex, b"a capsule digest") not in ursula.cfrag_cache
+    assert ("another arrangement", b"a capsule digest") in ursula.cfrag_cache
+    with pytest.raises(NotFound):
+        ursula.datastore.get_policy_arrangement(id_as_hex.encode())
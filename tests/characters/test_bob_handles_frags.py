@@ -1,3 +1,4 @@
+import os
 from tempfile import TemporaryDirectory
 
 import pytest
@@ -6,6 +7,7 @@ from twisted.internet import threads
 from umbral import pre
 from umbral.fragments import KFrag, CapsuleFrag
 
+from nucypher.crypto.api import keccak_digest
 from nucypher.crypto.powers import EncryptingPower
 from nucypher.utilities.sandbox.middleware import MockRestMiddleware
 
@@ -235,6 +237,56 @@ def test_bob_remembers_that_he_has_cfrags_for_a_particular_capsule(enacted_feder
     capsule_side_channel[0].capsule.attach_cfrag(new_cfrag)
 
 
+def test_ursula_answers_repeated_work_orders_from_her_caches(federated_bob, federated_ursulas, capsule_side_channel,
+                                                             monkeypatch):
+    workorders_by_capsule = federated_bob._saved_work_orders.by_capsule(capsule_side_channel[0].capsule)
+    work_order = list(workorders_by_capsule.values())[0]
+    ursula = [u for u in federated_ursulas if u.rest_information()[0].port == work_order.ursula.rest_information()[0].port][0]
+    ursula.kfrag_cache.clear()
+    ursula.cfrag_cache.clear()
+    kfrag_misses, cfrag_hits = ursula.kfrag_cache.misses, ursula.cfrag_cache.hits
+
+    # Bob resends the same WorkOrder, as he would after a timeout.
+    first_cfrags = federated_bob.network_middleware.reencrypt(work_order)
+    second_cfrags = federated_bob.network_middleware.reencrypt(work_order)
+
+    # Ursula only went to her datastore for the KFrag, and only re-encrypted, the first time.
+    assert ursula.kfrag_cache.misses == kfrag_misses + 1
+    assert work_order.arrangement_id.hex() in ursula.kfrag_cache
+    assert ursula.cfrag_cache.hits == cfrag_hits + 1
+    assert len(first_cfrags) == len(second_cfrags) == 1
+    assert bytes(first_cfrags[0]) == bytes(second_cfrags[0])
+
+    # The CFrag is only served from the cache for as long as the arrangement it was made under lasts.
+    id_as_hex = work_order.arrangement_id.hex()
+    _kfrag, expires_at = ursula.kfrag_cache.get(id_as_hex)
+    assert expires_at is not None
+    cache_key = (id_as_hex, keccak_digest(bytes(work_order.capsules[0])))
+    assert cache_key in ursula.cfrag_cache
+    monkeypatch.setattr(ursula.cfrag_cache, "_clock", lambda: expires_at)
+    assert cache_key not in ursula.cfrag_cache
+
+
+def test_bob_gets_cfrags_as_ursula_streams_them(federated_bob, capsule_side_channel):
+    from bytestring_splitter import VariableLengthBytestring
+    from nucypher.network.middleware import split_cfrags_incrementally
+
+    capsule = capsule_side_channel[0].capsule
+    work_order = list(federated_bob._saved_work_orders.by_capsule(capsule).values())[0]
+
+    capsules_and_cfrags = list(federated_bob.iter_reencrypted_cfrags(work_order))
+    assert [c for c, _cfrag in capsules_and_cfrags] == work_order.capsules
+
+    # However the stream is chunked, each CFrag comes out once all of its bytes are in.
+    cfrags = [cfrag for _capsule, cfrag in capsules_and_cfrags]
+    stream = b"".join(bytes(VariableLengthBytestring(cfrag)) for cfrag in cfrags)
+    one_byte_chunks = (stream[i:i + 1] for i in range(len(stream)))
+    assert [bytes(cfrag) for cfrag in split_cfrags_incrementally(one_byte_chunks)] == [bytes(c) for c in cfrags]
+
+    with pytest.raises(ValueError):
+        list(split_cfrags_incrementally([stream[:-1]]))
+
+
 def test_bob_gathers_and_combines(enacted_federated_policy, federated_bob, federated_alice, capsule_side_channel):
     # The side channel is represented as a single MessageKit, which is all that Bob really needs.
     the_message_kit, the_data_source = capsule_side_channel
@@ -265,3 +317,159 @@ def test_bob_gathers_and_combines(enacted_federated_policy, federated_bob, feder
                                           decrypt=True,
                                           delegator_signing_key=federated_alice.stamp.as_umbral_pubkey())
     assert cleartext == b'Welcome to the flippering.'
+
+
+def test_work_order_history_persists_and_evicts(federated_bob, capsule_side_channel, certificates_tempdir):
+    from nucypher.policy.models import WorkOrderHistory
+    capsule = capsule_side_channel[0].capsule
+    history_filepath = os.path.join(certificates_tempdir, "work_orders")
+
+    with WorkOrderHistory(filepath=history_filepath) as history:
+        for ursula_id, work_order in federated_bob._saved_work_orders.by_capsule(capsule).items():
+            history.save(ursula_id, capsule, work_order)
+    assert len(history) == len(federated_bob._saved_work_orders.by_capsule(capsule))
+
+    # Another Bob process picks up where this one left off, with WorkOrders he can send again...
+    restored_history = WorkOrderHistory(filepath=history_filepath, find_node=federated_bob.known_nodes.__getitem__)
+    restored_work_orders = restored_history.by_capsule(capsule)
+    assert restored_work_orders == history.by_capsule(capsule)
+    for ursula_id, work_order in restored_work_orders.items():
+        assert work_order.ursula.checksum_public_address == ursula_id
+        assert work_order.completed is not None
+
+    # ...but Bob got his CFrags for all of these, so he can let them go - and they stay gone.
+    assert restored_history.forget_completed() == len(history)
+    assert len(restored_history) == 0
+    restored_history.close()
+    with WorkOrderHistory(filepath=history_filepath) as emptied_history:
+        assert len(emptied_history) == 0
+
+    # A bounded history keeps only the newest entries.
+    bounded_history = WorkOrderHistory(max_entries=1)
+    for ursula_id, work_order in history.by_capsule(capsule).items():
+        bounded_history.save(ursula_id, capsule, work_order)
+    assert len(bounded_history) == 1
+
+
+def test_work_order_history_remembers_completion(federated_bob, capsule_side_channel, certificates_tempdir):
+    from nucypher.policy.models import WorkOrder, WorkOrderHistory
+    capsule = capsule_side_channel[0].capsule
+    history_filepath = os.path.join(certificates_tempdir, "completed_work_orders")
+    receipt_bytes = b"wo:receipt"
+    work_order = WorkOrder(federated_bob, b"an arrangement id", [capsule], receipt_bytes,
+                           federated_bob.stamp(receipt_bytes))
+    ursula_id = "an Ursula"
+
+    with WorkOrderHistory(filepath=history_filepath) as history:
+        history.save(ursula_id, capsule, work_order)
+        work_order.complete(cfrags=[])
+        history.save_completed(ursula_id, work_order)
+
+    with WorkOrderHistory(filepath=history_filepath) as restored_history:
+        restored_work_order, = restored_history.by_capsule(capsule).values()
+        assert restored_work_order.completed is not None
+        assert restored_work_order.ursula is None  # No find_node to reunite it with its Ursula.
+
+
+def test_work_order_history_writes_one_record_per_work_order(federated_bob, certificates_tempdir):
+    from nucypher.policy.models import WorkOrder, WorkOrderHistory
+    capsules = [pre.encrypt(federated_bob.public_keys(EncryptingPower), message)[1]
+                for message in (b"one", b"two", b"three")]
+    history_filepath = os.path.join(certificates_tempdir, "many_capsuled_work_orders")
+    receipt_bytes = b"wo:receipt"
+    work_order = WorkOrder(federated_bob, b"an arrangement id", capsules, receipt_bytes,
+                           federated_bob.stamp(receipt_bytes))
+    ursula_id = "an Ursula"
+
+    with WorkOrderHistory(filepath=history_filepath) as history:
+        history.save_work_order(ursula_id, work_order)
+        work_order.complete(cfrags=[])
+        history.save_completed(ursula_id, work_order)
+    assert len(history) == len(capsules)
+
+    # However many capsules it has, saving (or completing) a WorkOrder is one record.
+    with open(history_filepath, "rb") as history_file:
+        assert len(WorkOrderHistory._record_splitter.repeat(history_file.read())) == 2
+
+    with WorkOrderHistory(filepath=history_filepath) as restored_history:
+        assert len(restored_history) == len(capsules)
+        for capsule in capsules:
+            restored_work_order, = restored_history.by_capsule(capsule).values()
+            assert restored_work_order.completed is not None
+
+    # Compacted, too: the restored history rewrote the file with one record for the lot.
+    with open(history_filepath, "rb") as history_file:
+        assert len(WorkOrderHistory._record_splitter.repeat(history_file.read())) == 1
+
+
+def test_work_order_capsules_are_decoded_on_a_pool_in_order(federated_bob, capsule_side_channel):
+    from concurrent.futures import ThreadPoolExecutor
+    from nucypher.policy.models import WorkOrder
+
+    capsules = [pre.encrypt(federated_bob.public_keys(EncryptingPower), message)[1]
+                for message in (b"one", b"two", b"three", b"four")]
+    receipt_bytes = b"wo:receipt"
+    work_order = WorkOrder(federated_bob, b"an arrangement id", capsules, receipt_bytes,
+                           federated_bob.stamp(receipt_bytes))
+
+    capsules_as_they_arrived = []
+    with ThreadPoolExecutor() as executor:
+        rebuilt_work_order = WorkOrder.from_rest_payload(work_order.arrangement_id,
+                                                         work_order.payload(),
+                                                         executor=executor,
+                                                         on_capsule=capsules_as_they_arrived.append)
+
+    assert rebuilt_work_order == work_order
+    assert capsules_as_they_arrived == rebuilt_work_order.capsules == capsules
+
+
+def test_ursula_still_accepts_msgpack_work_orders(federated_bob):
+    import msgpack
+    from nucypher.crypto.constants import CAPSULE_LENGTH
+    from nucypher.policy.models import WorkOrder
+
+    capsules = [pre.encrypt(federated_bob.public_keys(EncryptingPower), message)[1] for message in (b"one", b"two")]
+    receipt_bytes = b"wo:receipt"
+    work_order = WorkOrder(federated_bob, b"an arrangement id", capsules, receipt_bytes,
+                           federated_bob.stamp(receipt_bytes))
+
+    # The current payload carries the capsules back to back, without any framing.
+    assert work_order.payload().endswith(b"".join(bytes(capsule) for capsule in capsules))
+    assert len(work_order.packed_capsules()) == CAPSULE_LENGTH * len(capsules)
+
+    legacy_payload = bytes(work_order.receipt_signature) + federated_bob.stamp \
+                     + msgpack.dumps((receipt_bytes, msgpack.dumps([bytes(capsule) for capsule in capsules])))
+    for payload in (work_order.payload(), legacy_payload):
+        rebuilt_work_order = WorkOrder.from_rest_payload(work_order.arrangement_id, payload)
+        assert rebuilt_work_order == work_order
+        assert rebuilt_work_order.capsules == capsules
+
+
+def test_bob_hedges_against_a_slow_ursula(enacted_federated_policy, federated_bob, monkeypatch):
+    import threading
+
+    middleware = federated_bob.network_middleware
+    treasure_map = enacted_federated_policy.treasure_map
+    federated_bob.treasure_maps[treasure_map.public_id()] = treasure_map
+    _ciphertext, capsule = pre.encrypt(enacted_federated_policy.public_key, b"Hedge your bets.")
+
+    # The first Ursula Bob will ask is having a bad day.
+    slow_ursula_id, _arrangement_id = next(iter(treasure_map))
+    slow_ursula_is_done = threading.Event()
+    real_reencrypt = middleware.reencrypt
+
+    def reencrypt(work_order, timeout=None):
+        if work_order.ursula.checksum_public_address == slow_ursula_id:
+            slow_ursula_is_done.wait(5)
+        return real_reencrypt(work_order, timeout=timeout)
+
+    monkeypatch.setattr(middleware, 'reencrypt', reencrypt)
+
+    cfrags = federated_bob.get_cfrags_hedged(treasure_map.public_id(), capsule, m=1, hedge_after=0.1)
+    slow_ursula_is_done.set()
+
+    # Bob didn't wait for her; another Ursula gave him his CFrag.
+    assert len(cfrags) == 1
+    ursulas_who_answered = federated_bob._saved_work_orders.by_capsule(capsule)
+    assert len(ursulas_who_answered) == 1
+    assert slow_ursula_id not in ursulas_who_answered
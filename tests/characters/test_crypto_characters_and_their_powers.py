@@ -1,3 +1,5 @@
+import os
+
 import eth_utils
 import pytest
 from constant_sorrow import constants
@@ -75,6 +77,22 @@ def test_anybody_can_verify():
     assert cleartext is constants.NO_DECRYPTION_PERFORMED
 
 
+def test_strangers_do_not_get_learning_machinery(federated_alice, federated_bob):
+    """
+    Strangers don't learn about nodes, so they are made without a learning loop.
+    """
+    stranger_alice = Alice.from_public_keys({SigningPower: federated_alice.stamp.as_umbral_pubkey()})
+    stranger_bob = Bob.from_public_keys({SigningPower: federated_bob.stamp.as_umbral_pubkey()})
+
+    for stranger in (stranger_alice, stranger_bob):
+        assert not hasattr(stranger, "_learning_task")
+        assert not hasattr(stranger, "teacher_nodes")
+
+    assert not hasattr(stranger_bob, "_saved_work_orders")
+    cleartext = stranger_bob.verify_from(federated_bob, b"Hi.", federated_bob.stamp(b"Hi."), decrypt=False)
+    assert cleartext is constants.NO_DECRYPTION_PERFORMED
+
+
 def test_character_blockchain_power(testerchain):
 
     # TODO: Handle multiple providers
@@ -219,3 +237,40 @@ def test_encrypt_but_do_not_sign(federated_alice, federated_bob):
     # ...and thus, the message is not verified.
     with pytest.raises(Character.InvalidSignature):
         federated_bob.verify_from(federated_alice, message_kit, decrypt=True)
+
+
+def test_strangers_made_from_the_same_keys_share_only_their_keys(federated_alice, federated_bob):
+    verifying_key = federated_alice.stamp.as_umbral_pubkey()
+
+    stranger_alice = Alice.from_public_keys({SigningPower: verifying_key})
+    same_stranger_alice = Alice.from_public_keys({SigningPower: bytes(verifying_key)})
+    assert same_stranger_alice == stranger_alice
+    assert same_stranger_alice.public_keys(SigningPower) is stranger_alice.public_keys(SigningPower)
+    assert same_stranger_alice.checksum_public_address == federated_alice.checksum_public_address
+
+    # Each is a Character of her own, though, so what's done to one isn't done to the other.
+    assert same_stranger_alice is not stranger_alice
+    stranger_alice.something_only_she_has = True
+    assert not hasattr(same_stranger_alice, "something_only_she_has")
+
+    # Keys are only shared for the same keys and kind of Character.
+    assert Alice.from_public_keys({SigningPower: federated_bob.stamp.as_umbral_pubkey()}) != stranger_alice
+    assert type(Bob.from_public_keys({SigningPower: verifying_key})) is Bob
+
+
+def test_character_addresses_and_identity_are_derived_once(federated_alice):
+    stranger_alice = Alice.from_public_keys({SigningPower: federated_alice.stamp.as_umbral_pubkey()})
+
+    canonical_address = stranger_alice.canonical_public_address
+    assert canonical_address is stranger_alice.canonical_public_address
+    assert canonical_address == eth_utils.to_canonical_address(federated_alice.checksum_public_address)
+    assert stranger_alice.checksum_public_address == federated_alice.checksum_public_address
+
+    assert stranger_alice == federated_alice
+    assert hash(stranger_alice) == hash(federated_alice)
+    assert len({stranger_alice, federated_alice}) == 1
+
+    # A new checksum address means a new canonical address, too.
+    new_checksum_address = eth_utils.to_checksum_address(os.urandom(20))
+    stranger_alice._checksum_address = new_checksum_address
+    assert stranger_alice.canonical_public_address == eth_utils.to_canonical_address(new_checksum_address)
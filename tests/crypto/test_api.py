@@ -1,6 +1,9 @@
 
+import timeit
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
+import pytest
 import sha3
 
 from nucypher.crypto import api
@@ -18,6 +21,45 @@ class TestCrypto(unittest.TestCase):
         self.assertEqual(10, len(rand1))
         self.assertEqual(10, len(rand2))
 
+    def test_random_pool_never_repeats_bytes(self):
+        pool = api.RandomPool(block_size=64)
+
+        def draw(_):
+            return [pool.read(10) for _ in range(100)]
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            draws = [chunk for batch in executor.map(draw, range(4)) for chunk in batch]
+
+        self.assertEqual(400, len(draws))
+        self.assertTrue(all(len(chunk) == 10 for chunk in draws))
+        self.assertEqual(len(draws), len(set(draws)))
+
+        # Requests bigger than a block bypass the pool.
+        self.assertEqual(128, len(pool.read(128)))
+
+    def test_random_pool_discards_buffer_after_fork(self):
+        pool = api.RandomPool(block_size=64)
+        pool.read(10)
+        buffered_remainder = pool._buffer[pool._offset:]
+
+        # This is what runs in a child process just after a fork.
+        api.RandomPool.reseed_all()
+
+        self.assertEqual(b'', pool._buffer)
+        self.assertNotEqual(buffered_remainder[:10], pool.read(10))
+
+    @pytest.mark.slow
+    def test_random_pool_is_faster_than_system_random_for_arrangement_ids(self):
+        id_length = 32  # Arrangement.ID_LENGTH
+        pool = api.RandomPool()
+
+        def big_int_round_trip():
+            return api.SYSTEM_RAND.getrandbits(id_length * 8).to_bytes(id_length, byteorder='big')
+
+        unbuffered = min(timeit.repeat(big_int_round_trip, number=10000, repeat=3))
+        buffered = min(timeit.repeat(lambda: pool.read(id_length), number=10000, repeat=3))
+        self.assertLess(buffered, unbuffered)
+
     def test_secure_random_range(self):
         output = [api.secure_random_range(1, 3) for _ in range(20)]
 
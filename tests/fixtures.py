@@ -17,7 +17,7 @@ from nucypher.config.constants import TEST_CONTRACTS_DIR
 from nucypher.config.node import NodeConfiguration
 from nucypher.data_sources import DataSource
 from nucypher.keystore import keystore
-from nucypher.keystore.db import Base
+from nucypher.keystore.db import create_or_migrate_schema
 from nucypher.keystore.keypairs import SigningKeypair
 from nucypher.utilities.sandbox.blockchain import TesterBlockchain, token_airdrop
 from nucypher.utilities.sandbox.constants import (DEFAULT_NUMBER_OF_URSULAS_IN_DEVELOPMENT_NETWORK,
@@ -60,7 +60,7 @@ def temp_config_root(temp_dir_path):
 @pytest.fixture(scope="module")
 def test_keystore():
     engine = create_engine('sqlite:///:memory:')
-    Base.metadata.create_all(engine)
+    create_or_migrate_schema(engine)
     test_keystore = keystore.KeyStore(engine)
     yield test_keystore
 
@@ -1,7 +1,15 @@
+import threading
+
 import pytest
 from datetime import datetime
+from sqlalchemy import create_engine
+from umbral import pre
 
+from nucypher.characters.lawful import Alice
+from nucypher.crypto.powers import SigningPower, EncryptingPower
 from nucypher.keystore import keystore, keypairs
+from nucypher.keystore.db import create_or_migrate_schema, SCHEMA_VERSION, SchemaVersionError
+from nucypher.keystore.threading import ThreadedBatchWriter
 
 
 @pytest.mark.usefixtures('testerchain')
@@ -60,4 +68,91 @@ def test_workorder_sqlite_keystore(test_keystore):
     # Test del workorder
     deleted = test_keystore.del_workorders(arrangement_id)
     assert deleted > 0
-    assert test_keystore.get_workorders(arrangement_id).count() == 0
+    with pytest.raises(keystore.NotFound):
+        test_keystore.get_workorders(arrangement_id)
+
+
+def test_workorders_are_saved_in_batches_and_queried_by_bob(test_keystore, federated_bob):
+    from nucypher.policy.models import WorkOrder
+
+    _ciphertext, capsule = pre.encrypt(federated_bob.public_keys(EncryptingPower), b"a message for Bob")
+    receipt_bytes = b"wo:receipt"
+    work_orders = [WorkOrder(federated_bob, arrangement_id, [capsule], receipt_bytes, federated_bob.stamp(receipt_bytes))
+                   for arrangement_id in (b'first', b'second')]
+
+    # Two WorkOrders from the same Bob, in one transaction.
+    test_keystore.add_workorders(work_orders)
+
+    records = test_keystore.get_workorders(bob_pubkey_sig=federated_bob.stamp.as_umbral_pubkey())
+    assert [WorkOrder.from_datastore_record(record) for record in records] == work_orders
+
+    records = test_keystore.get_workorders(arrangement_id=b'second'.hex().encode())
+    assert len(records) == 1
+    assert WorkOrder.from_datastore_record(records[0]).capsules == [capsule]
+
+
+def test_attach_kfrags_to_saved_arrangements_in_one_transaction(test_keystore):
+    alice_keypair_sig = keypairs.SigningKeypair(generate_keys_if_needed=True)
+    alice = Alice.from_public_keys({SigningPower: alice_keypair_sig.pubkey})
+
+    ids_as_hex = [b'first'.hex(), b'second'.hex()]
+    for id_as_hex in ids_as_hex:
+        test_keystore.add_policy_arrangement(datetime.utcnow(), id_as_hex.encode(),
+                                             alice_pubkey_sig=alice_keypair_sig.pubkey)
+
+    # If any of the arrangements is unknown, none of the kfrags are attached.
+    with pytest.raises(keystore.NotFound):
+        test_keystore.attach_kfrags_to_saved_arrangements(alice, {ids_as_hex[0]: b'kfrag-0',
+                                                                  b'unknown'.hex(): b'kfrag-x'})
+    assert test_keystore.get_policy_arrangement(ids_as_hex[0].encode()).k_frag is None
+
+    test_keystore.attach_kfrags_to_saved_arrangements(alice, {ids_as_hex[0]: b'kfrag-0',
+                                                              ids_as_hex[1]: b'kfrag-1'})
+    assert test_keystore.get_policy_arrangement(ids_as_hex[0].encode()).k_frag == b'kfrag-0'
+    assert test_keystore.get_policy_arrangement(ids_as_hex[1].encode()).k_frag == b'kfrag-1'
+
+
+def test_workorders_saved_before_schema_version_1_are_migrated():
+    engine = create_engine('sqlite:///:memory:')
+    engine.execute("CREATE TABLE workorders (id INTEGER PRIMARY KEY, bob_pubkey_sig_id INTEGER, "
+                   "bob_signature BLOB UNIQUE, arrangement_id BLOB, created_at DATETIME)")
+    engine.execute("INSERT INTO workorders (bob_pubkey_sig_id, bob_signature, arrangement_id) "
+                   "VALUES (1, x'01', x'02')")
+
+    create_or_migrate_schema(engine)
+    assert engine.execute("PRAGMA user_version").scalar() == SCHEMA_VERSION
+
+    # The old row is still there, and Bob may now resend the same WorkOrder.
+    engine.execute("INSERT INTO workorders (bob_pubkey_sig_id, bob_signature, arrangement_id, capsules) "
+                   "VALUES (1, x'01', x'02', x'03')")
+    assert engine.execute("SELECT COUNT(*) FROM workorders WHERE bob_signature = x'01'").scalar() == 2
+
+    # A datastore from the future is refused.
+    engine.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION + 1))
+    with pytest.raises(SchemaVersionError):
+        create_or_migrate_schema(engine)
+
+
+def test_batch_writer_is_bounded_and_surfaces_failed_writes(test_keystore):
+    unblocked = threading.Event()
+
+    def write_batch(items, session):
+        unblocked.wait()
+        if "bad" in items:
+            raise ValueError("Can't write that.")
+
+    writer = ThreadedBatchWriter(test_keystore.engine, write_batch, max_batch_size=1, max_pending=1, submit_timeout=0)
+
+    # One item is being written and one is waiting, so there's no room for a third.
+    with pytest.raises(ThreadedBatchWriter.Backlogged):
+        for item in ("bad", "good", "good"):
+            writer.submit(item)
+
+    unblocked.set()
+    with pytest.raises(ThreadedBatchWriter.WriteFailed):
+        writer.flush()
+    assert writer.failed_batches == 1
+
+    # Failures are reported once.
+    writer.submit("good")
+    writer.flush()
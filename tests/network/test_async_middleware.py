@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from nucypher.utilities.sandbox.async_middleware import MockAsyncRestMiddleware
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_async_middleware_learns_about_nodes_from_federated_ursulas(federated_ursulas):
+    ursula = list(federated_ursulas)[0]
+
+    async def learn():
+        async with MockAsyncRestMiddleware() as middleware:
+            information = await middleware.node_information(ursula.rest_host, ursula.rest_port)
+            metadata = await middleware.get_nodes_via_rest(ursula.rest_interface, ursula.certificate_filepath)
+            return information, metadata
+
+    information, metadata = run(learn())
+    assert information.status_code == 200
+    assert information.content == bytes(ursula)
+    assert metadata.status_code == 200
+    assert metadata.content
+
+
+def test_async_middleware_reencrypts_and_tracks_latency(enacted_federated_policy, federated_ursulas,
+                                                        federated_bob, capsule_side_channel):
+    treasure_map = enacted_federated_policy.treasure_map
+    map_id = treasure_map.public_id()
+    federated_bob.treasure_maps[map_id] = treasure_map
+    for ursula in federated_ursulas:
+        federated_bob.remember_node(ursula)
+
+    capsule = capsule_side_channel[0].capsule
+    work_orders = federated_bob.generate_work_orders(map_id, capsule, num_ursulas=1)
+    (node_id, work_order), = work_orders.items()
+    middleware = MockAsyncRestMiddleware()
+
+    async def reencrypt():
+        async with middleware:
+            return await middleware.reencrypt(work_order)
+
+    cfrags = run(reencrypt())
+    assert len(cfrags) == len(work_order.capsules)
+    assert work_order.completed is not None
+    assert len(middleware.latencies.samples()[node_id]) == 1
+    assert middleware.get_competitive_rate() is NotImplemented
+
+
+def test_async_middleware_raises_for_bad_responses(federated_ursulas):
+    ursula = list(federated_ursulas)[0]
+
+    async def revoke_unknown_arrangement():
+        async with MockAsyncRestMiddleware() as middleware:
+            await middleware.revoke_arrangement(ursula, b"\x00" * 32, b"not a signature")
+
+    with pytest.raises(RuntimeError):
+        run(revoke_unknown_arrangement())
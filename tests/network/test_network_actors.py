@@ -1,11 +1,22 @@
+import gc
+import os
+import threading
+from types import SimpleNamespace
+
 import pytest
-from hendrix.experience import crosstown_traffic
-from hendrix.utils.test_utils import crosstownTaskListDecoratorFactory
+from constant_sorrow import constants
 from kademlia.utils import digest
 
 from nucypher.characters.unlawful import Vladimir
 from nucypher.crypto.api import keccak_digest
 from nucypher.crypto.powers import SigningPower
+from nucypher.crypto.signing import signature_splitter
+from nucypher.network.metrics import MetricsRegistry
+from nucypher.network.middleware import LatencyTracker
+from nucypher.network.nodes import KnownNodes, NodeRecord
+from nucypher.network.routing import NodeRoutingIndex
+from nucypher.network.throttling import TokenBucket, AdmissionControl
+from nucypher.network.verification import NodeVerificationQueue
 from nucypher.utilities.sandbox.middleware import MockRestMiddleware
 
 
@@ -128,22 +139,10 @@ def test_vladimir_illegal_interface_key_does_not_propagate(blockchain_ursulas):
     # ...until Vladimir sees her on the network and tries to use her public information.
     vladimir = Vladimir.from_target_ursula(ursula_whom_vladimir_will_imitate)
 
-    learning_callers = []
-    crosstown_traffic.decorator = crosstownTaskListDecoratorFactory(learning_callers)
-
     vladimir.network_middleware.propagate_shitty_interface_id(other_ursula, bytes(vladimir))
 
-    # So far, Ursula hasn't noticed any Vladimirs.
-    assert other_ursula.suspicious_activities_witnessed['vladimirs'] == []
-
-    # ...but now, Ursula will now try to learn about Vladimir on a different thread.
-    # We only passed one node (Vladimir)...
-    learn_about_vladimir = learning_callers.pop()
-    #  ...so there was only one learning caller in the queue (now none since we popped it just now).
-    assert len(learning_callers) == 0
-
-    # OK, so cool, let's see what happens when Ursula tries to learn about Vlad.
-    learn_about_vladimir()
+    # Ursula will now try to learn about Vladimir, on one of her verification threads.
+    assert other_ursula.node_verification_queue.wait(timeout=10)
 
     # And indeed, Ursula noticed the situation.
     # She didn't record Vladimir's address.
@@ -176,3 +175,236 @@ def test_alice_refuses_to_make_arrangement_unless_ursula_is_valid(blockchain_ali
         idle_blockchain_policy.consider_arrangement(network_middleware=blockchain_alice.network_middleware,
                                                     arrangement=FakeArrangement(),
                                                     ursula=vladimir)
+
+
+def test_latency_tracker_sets_timeouts_from_recent_latencies():
+    tracker = LatencyTracker(window=10, min_samples=3, default_timeout=30, min_timeout=1, timeout_multiplier=3)
+
+    # Until we've seen a few requests, we have nothing to go on.
+    tracker.record("fast", 0.5)
+    assert tracker.percentile("fast", 95) is None
+    assert tracker.timeout_for("fast") == 30
+
+    for latency in (0.1, 0.2, 0.3):
+        tracker.record("fast", latency)
+    assert tracker.percentile("fast", 50) == 0.3
+    assert tracker.timeout_for("fast") == 1.5
+
+    # Slow nodes get more time, but not forever - and only the recent past counts.
+    for _ in range(10):
+        tracker.record("slow", 20)
+    assert tracker.timeout_for("slow") == 30
+    for _ in range(10):
+        tracker.record("slow", 2)
+    assert tracker.timeout_for("slow") == 6
+
+
+def test_routing_index_finds_the_nodes_closest_to_an_address():
+    index = NodeRoutingIndex(origin=os.urandom(20))
+    addresses = [os.urandom(20) for _ in range(200)]
+    for address in addresses:
+        index.add(address, address)
+
+    for target in [os.urandom(20) for _ in range(10)] + addresses[:10]:
+        expected = sorted(addresses, key=lambda address: NodeRoutingIndex.distance(address, target))
+        assert index.closest(target, 20) == expected[:20]
+
+    assert index.remove(addresses[0])
+    assert addresses[0] not in index
+    assert len(index) == 199
+
+
+def test_bob_looks_up_an_unknown_ursula_through_a_teacher(bob_federated_test_config, federated_ursulas):
+    teacher, *other_ursulas = list(federated_ursulas)
+    sought_ursula = other_ursulas[0]
+
+    bob = bob_federated_test_config.produce(known_nodes=(teacher,))
+    assert sought_ursula.checksum_public_address not in bob.known_nodes
+
+    found = bob.get_nodes_by_ids([sought_ursula.checksum_public_address])
+    assert found == [sought_ursula]
+    assert sought_ursula.checksum_public_address in bob.known_nodes
+
+
+def test_known_nodes_are_kept_as_compact_records(federated_ursulas):
+    ursula, other_ursula = list(federated_ursulas)[:2]
+
+    record = ursula.known_nodes.record(other_ursula.checksum_public_address)
+    assert isinstance(record, NodeRecord)
+    assert not hasattr(record, "__dict__")
+    assert record.canonical_public_address == other_ursula.canonical_public_address
+    assert record.rest_interface == other_ursula.rest_interface
+    assert record.certificate == other_ursula.certificate
+
+    # Only when we need to talk to her is a stranger Ursula built from the record.
+    stranger = record.as_node()
+    assert stranger == other_ursula
+    assert stranger.rest_information()[0].port == other_ursula.rest_information()[0].port
+
+
+def test_known_nodes_keep_what_is_learned_about_their_nodes(federated_ursulas):
+    ursula, other_ursula = list(federated_ursulas)[:2]
+    known_nodes = KnownNodes(max_recent_nodes=1)
+    record = known_nodes.add(NodeRecord.from_bytes(bytes(ursula), federated_only=True))
+    address = ursula.checksum_public_address
+
+    # Looking a node up again doesn't build her again...
+    stranger = known_nodes[address]
+    assert known_nodes[address] is stranger
+
+    # ...and what we find out about her goes into her record.
+    stranger.validate_metadata(accept_federated_only=True)
+    assert record.verified_interface
+
+    # So it's still known once she's been let go, and has to be built again.
+    del stranger
+    known_nodes.add(NodeRecord.from_bytes(bytes(other_ursula), federated_only=True))
+    known_nodes[other_ursula.checksum_public_address]
+    gc.collect()
+    assert known_nodes[address].verified_interface
+
+    # A node whose certificate isn't saved anywhere is recorded as such.
+    unsaved = NodeRecord.from_bytes(bytes(ursula), federated_only=True).as_node()
+    unsaved.certificate_filepath = constants.CERTIFICATE_NOT_SAVED
+    assert NodeRecord.from_node(unsaved).certificate_filepath is None
+
+
+def test_token_bucket_allows_bursts_and_then_its_rate():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, capacity=4, clock=lambda: now[0])
+
+    assert bucket.take(3)
+    assert bucket.take(1)
+    assert not bucket.take(1)  # Empty.
+
+    now[0] += 1  # ...two tokens later.
+    assert bucket.take(2)
+    assert not bucket.take(1)
+
+    now[0] += 100
+    assert bucket.tokens == 4  # Never more than its capacity.
+
+
+def test_announced_nodes_are_verified_once_each_and_within_limits():
+    class AnnouncedNode:
+        def __init__(self, checksum_public_address):
+            self.checksum_public_address = checksum_public_address
+
+    release = threading.Event()
+    verified = []
+
+    def verifier(node):
+        release.wait()
+        verified.append(node.checksum_public_address)
+
+    queue = NodeVerificationQueue(verifier=verifier, max_concurrent=2, max_pending=3,
+                                  announcements_per_second=0, announcement_burst=2)
+
+    assert queue.submit(AnnouncedNode("0xA"), announcer="1.1.1.1")
+    assert not queue.submit(AnnouncedNode("0xA"), announcer="2.2.2.2")  # Already waiting.
+    assert queue.submit(AnnouncedNode("0xB"), announcer="1.1.1.1")
+    assert not queue.submit(AnnouncedNode("0xC"), announcer="1.1.1.1")  # This announcer has had its turn...
+    assert queue.submit(AnnouncedNode("0xC"), announcer="2.2.2.2")      # ...but others haven't.
+    assert not queue.submit(AnnouncedNode("0xD"), announcer="3.3.3.3")  # The queue's full.
+
+    release.set()
+    assert queue.wait(timeout=10)
+    assert sorted(verified) == ["0xA", "0xB", "0xC"]
+    assert queue.metrics() == dict(pending=0, queued=3, duplicates=1, throttled=1, overflowed=1)
+
+
+def test_ursula_turns_away_requests_over_her_limits(federated_ursulas):
+    ursula = list(federated_ursulas)[0]
+    rest_routes = ursula.rest_app.__self__
+    usual_admission_control = rest_routes.admission_control
+    rest_routes.admission_control = AdmissionControl(limits={'treasure_map': (0, 2)}, capsule_burst=10)
+    try:
+        mock_client = MockRestMiddleware()._get_mock_client_by_ursula(ursula)
+        responses = [mock_client.get("http://localhost/treasure_map/{}".format("00" * 32)) for _ in range(3)]
+        assert [r.status_code for r in responses] == [404, 404, 429]
+
+        # Routes without limits aren't affected.
+        assert mock_client.get("http://localhost/public_information").status_code == 200
+
+        # Nor is one Bob held up by another's WorkOrders.
+        admission_control = rest_routes.admission_control
+        assert admission_control.admit_work_order(b"first Bob", capsules=10)
+        assert not admission_control.admit_work_order(b"first Bob", capsules=1)
+        assert admission_control.admit_work_order(b"second Bob", capsules=1)
+
+        assert admission_control.metrics() == dict(rejections=dict(treasure_map=1, reencrypt=1))
+    finally:
+        rest_routes.admission_control = usual_admission_control
+
+
+def test_metrics_are_rendered_for_prometheus():
+    metrics = MetricsRegistry()
+    metrics.counter("things_total", "Things.").inc(2, kind="good")
+    latency = metrics.histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+    for seconds in (0.05, 0.5, 5):
+        latency.observe(seconds)
+    metrics.collect("queue_length", "Queue length.", lambda: 7)
+
+    assert metrics.render().splitlines() == [
+        '# HELP latency_seconds Latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{le="0.1"} 1.0',
+        'latency_seconds_bucket{le="1.0"} 2.0',
+        'latency_seconds_bucket{le="+Inf"} 3.0',
+        'latency_seconds_sum 5.55',
+        'latency_seconds_count 3.0',
+        '# HELP queue_length Queue length.',
+        '# TYPE queue_length gauge',
+        'queue_length 7.0',
+        '# HELP things_total Things.',
+        '# TYPE things_total counter',
+        'things_total{kind="good"} 2.0',
+    ]
+
+
+def test_ursula_serves_her_metrics(federated_ursulas):
+    ursula = list(federated_ursulas)[0]
+    mock_client = MockRestMiddleware()._get_mock_client_by_ursula(ursula)
+    assert mock_client.get("http://localhost/public_information").status_code == 200
+
+    response = mock_client.get("http://localhost/metrics")
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith("text/plain")
+
+    samples = response.content.decode().splitlines()
+    assert 'nucypher_known_nodes {}'.format(float(len(ursula.known_nodes))) in samples
+    assert any(sample.startswith('nucypher_http_responses_total{method="GET",route="/public_information",status="200"}')
+               for sample in samples)
+    assert any(sample.startswith('nucypher_cache_hit_rate{cache="kfrag"}') for sample in samples)
+
+
+def test_nodes_taught_by_lookup_must_be_signed_by_the_teacher(federated_alice, federated_ursulas, monkeypatch):
+    teacher, impostor = list(federated_ursulas)[:2]
+    target = os.urandom(NodeRoutingIndex.ADDRESS_LENGTH)
+    middleware = federated_alice.network_middleware
+
+    # The teacher's own answer checks out.
+    federated_alice.get_nodes_closest_to_via_teacher(teacher, target)
+
+    # But one signed by anybody else doesn't.
+    honest_get_nodes_closest_to = middleware.get_nodes_closest_to
+
+    def get_nodes_closest_to_signed_by_the_impostor(node, canonical_address, certificate_filepath):
+        response = honest_get_nodes_closest_to(node, canonical_address, certificate_filepath)
+        _signature, nodes = signature_splitter(response.content, return_remainder=True)
+        return SimpleNamespace(status_code=200, content=bytes(impostor.stamp(nodes)) + nodes)
+
+    monkeypatch.setattr(middleware, "get_nodes_closest_to", get_nodes_closest_to_signed_by_the_impostor)
+    with pytest.raises(federated_alice.InvalidSignature):
+        federated_alice.get_nodes_closest_to_via_teacher(teacher, target)
+
+
+def test_learner_backs_off_from_a_teacher_who_rate_limits_it(federated_alice, monkeypatch):
+    rounds_without_new_nodes = federated_alice._rounds_without_new_nodes
+
+    def get_nodes_via_rest(*args, **kwargs):
+        return SimpleNamespace(status_code=429, content=b"")
+
+    monkeypatch.setattr(federated_alice.network_middleware, "get_nodes_via_rest", get_nodes_via_rest)
+    assert federated_alice.learn_from_teacher_node() is None  # Rather than raising.
+    assert federated_alice._rounds_without_new_nodes == rounds_without_new_nodes + 1
@@ -1,6 +1,176 @@
+import os
+
 import pytest
+import time
+
+from nucypher.network.nodes import NodeRecord
+from nucypher.network.snapshot import LearnerSnapshot
+from nucypher.network.storage import NodeMetadataLog, CertificateStore
 
 
 @pytest.mark.skip("To be implemented.")
 def test_eager_learn_from_teacher():
-    assert False
\ No newline at end of file
+    assert False
+
+
+def test_node_metadata_log_keeps_the_latest_metadata_for_each_node(tmpdir):
+    filepath = os.path.join(str(tmpdir), NodeMetadataLog.FILENAME)
+    first_address, second_address = b"\x01" * 20, b"\x02" * 20
+
+    node_log = NodeMetadataLog(filepath)
+    assert node_log.write(first_address, b"old")
+    assert node_log.write(second_address, b"second")
+    assert node_log.write(first_address, b"new")
+    assert not node_log.write(first_address, b"new")  # Nothing's changed; nothing's written.
+    assert node_log.remove(second_address)
+    node_log.close()
+
+    # A half-written entry at the end (as if we'd crashed) is dropped.
+    with open(filepath, "ab") as log_file:
+        log_file.write(b"+" + first_address)
+
+    reopened_log = NodeMetadataLog(filepath)
+    assert dict(reopened_log) == {first_address: b"new"}
+
+    # Compacting leaves only what's live.
+    reopened_log.compact()
+    assert dict(reopened_log) == {first_address: b"new"}
+    assert os.path.getsize(filepath) == NodeMetadataLog._HEADER_SIZE + len(b"new")
+
+
+def test_node_records_are_read_from_logged_metadata(federated_ursulas, tmpdir):
+    ursula = list(federated_ursulas)[0]
+    filepath = os.path.join(str(tmpdir), NodeMetadataLog.FILENAME)
+
+    node_log = NodeMetadataLog(filepath)
+    node_log.write(ursula.canonical_public_address, bytes(ursula))
+    node_log.close()
+
+    metadata = NodeMetadataLog(filepath).read(ursula.canonical_public_address)
+    record = NodeRecord.from_bytes(metadata, federated_only=True)
+    assert record.checksum_public_address == ursula.checksum_public_address
+    assert record.rest_interface == ursula.rest_interface
+    assert record.certificate == ursula.certificate
+    assert record.as_node() == ursula
+
+
+def test_learner_restores_known_nodes_from_snapshot(federated_ursulas, bob_federated_test_config, tmpdir):
+    filepath = os.path.join(str(tmpdir), "learner.snapshot")
+
+    bob = bob_federated_test_config.produce(known_nodes=federated_ursulas)
+    bob.save_snapshot(filepath)
+
+    snapshot = LearnerSnapshot.load(filepath, federated_only=True)
+    assert {r.checksum_public_address for r in snapshot.node_records} == set(bob.known_nodes)
+
+    restarted_bob = bob_federated_test_config.produce(snapshot_filepath=filepath)
+    for ursula in federated_ursulas:
+        assert restarted_bob.known_nodes[ursula.checksum_public_address] == ursula
+
+    # A snapshot that's too old is ignored.
+    another_bob = bob_federated_test_config.produce()
+    assert not another_bob.restore_snapshot(filepath, max_age=-1)
+    assert not len(another_bob.known_nodes)
+
+
+def test_a_corrupt_snapshot_is_skipped_rather_than_stopping_the_learner(bob_federated_test_config, tmpdir):
+    filepath = os.path.join(str(tmpdir), "corrupt.snapshot")
+    garbled_node = b"not a node's metadata"
+    with open(filepath, "wb") as snapshot_file:
+        snapshot_file.write(LearnerSnapshot._header.pack(LearnerSnapshot.MAGIC, LearnerSnapshot.VERSION, time.time())
+                            + LearnerSnapshot._count.pack(1)
+                            + LearnerSnapshot._node_flags.pack(0)
+                            + LearnerSnapshot._count.pack(0)
+                            + LearnerSnapshot._count.pack(len(garbled_node)) + garbled_node)
+
+    with pytest.raises(LearnerSnapshot.Unreadable):
+        LearnerSnapshot.load(filepath, federated_only=True)
+
+    bob = bob_federated_test_config.produce(snapshot_filepath=filepath)
+    assert not bob.restore_snapshot(filepath)
+    bob.stop_learning_loop()
+
+
+def test_snapshots_keep_treasure_maps_only_as_published(enacted_federated_policy, federated_bob, tmpdir):
+    filepath = os.path.join(str(tmpdir), "treasure.snapshot")
+    treasure_map = enacted_federated_policy.treasure_map
+    map_id = treasure_map.public_id()
+    federated_bob.treasure_maps[map_id] = treasure_map
+    federated_bob.save_snapshot(filepath)
+
+    # Where the map leads isn't on disk...
+    with open(filepath, "rb") as snapshot_file:
+        assert treasure_map.nodes_as_bytes() not in snapshot_file.read()
+
+    # ...but Bob can read it again once it's restored.
+    del federated_bob.treasure_maps[map_id]
+    assert federated_bob.restore_snapshot(filepath)
+    assert dict(federated_bob.treasure_maps[map_id]) == dict(treasure_map)
+
+
+def test_learner_saves_its_snapshot_when_it_stops_learning(federated_ursulas, bob_federated_test_config, tmpdir):
+    from twisted.internet import reactor
+    filepath = os.path.join(str(tmpdir), "stopped_learner.snapshot")
+
+    bob = bob_federated_test_config.produce(known_nodes=federated_ursulas, snapshot_filepath=filepath)
+    trigger = bob._snapshot_at_shutdown
+    assert trigger is not None
+
+    bob.stop_learning_loop()
+
+    # The snapshot is saved now, and the reactor no longer holds on to this Bob to save it at shutdown.
+    assert bob._snapshot_at_shutdown is None
+    with pytest.raises(ValueError):
+        reactor.removeSystemEventTrigger(trigger)
+    snapshot = LearnerSnapshot.load(filepath, federated_only=True)
+    assert {r.checksum_public_address for r in snapshot.node_records} == set(bob.known_nodes)
+
+
+def test_certificate_store_writes_each_certificate_once(federated_ursulas, tmpdir):
+    ursula = list(federated_ursulas)[0]
+    directory = str(tmpdir)
+
+    store = CertificateStore(directory, flush_delay=60)
+    filepath = store.save(ursula.certificate)
+    assert filepath == os.path.join(directory, ursula.certificate_filename)
+    assert not os.path.exists(filepath)  # Not yet; it's waiting for the next flush.
+
+    assert store.save(ursula.certificate) == filepath
+    assert store.flush() == 1
+    assert os.path.exists(filepath)
+    assert store.save(ursula.certificate) == filepath
+    assert store.flush() == 0  # Nothing new to write.
+
+    # A fresh store finds what's already on disk, and doesn't write it again.
+    modified = os.path.getmtime(filepath)
+    another_store = CertificateStore(directory, flush_delay=60)
+    another_store.save(ursula.certificate)
+    assert another_store.flush() == 0
+    assert os.path.getmtime(filepath) == modified
+
+    # Anything about to use a certificate makes sure it's been written first.
+    shared_store = CertificateStore.for_directory(os.path.join(directory, "shared"))
+    shared_filepath = shared_store.save(ursula.certificate)
+    assert CertificateStore.written(shared_filepath) == shared_filepath
+    assert os.path.exists(shared_filepath)
+
+
+def test_certificate_store_only_indexes_certificates_once_they_are_written(federated_ursulas, tmpdir, monkeypatch):
+    ursula = list(federated_ursulas)[0]
+    store = CertificateStore.for_directory(os.path.join(str(tmpdir), "failing"))
+    filepath = store.save(ursula.certificate)
+
+    def disk_full(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(os, "replace", disk_full)
+    with pytest.raises(OSError):
+        CertificateStore.written(filepath)
+    assert not os.path.exists(filepath)
+
+    # It isn't taken to be on disk, so it's still waiting to be written, and the next reader writes it.
+    assert store.save(ursula.certificate) == filepath
+    monkeypatch.undo()
+    assert CertificateStore.written(filepath) == filepath
+    assert os.path.exists(filepath)
+    assert store.flush() == 0